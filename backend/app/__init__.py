@@ -1,19 +1,52 @@
+import logging
+import time
+
+# Measured from here, so the boot report shows how long importing the app took
+IMPORT_STARTED = time.perf_counter()
+
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
-from app.api.v1 import auth, decisions, stats, user
-from app.db import prepare_database_startup
-from app.settings import get_settings
+from app.api.v1 import auth, decisions, events, stats, user
+from app.cache import close_cache
+from app.compression import CompressionMiddleware
+from app.db import PrimaryPinMiddleware, get_pool_stats, prepare_database_startup
+from app.events import close_events, start_events
+from app.metrics import MetricsMiddleware, render_metrics
+from app.querycount import RepeatedQueryMiddleware
+from app.settings import Settings, get_settings, install_reload_signal_handler, reload_settings
+from app.statistics import close_stats_refresher, start_stats_refresher
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await prepare_database_startup()
+    started = time.perf_counter()
+    install_reload_signal_handler()
+    migrated = await prepare_database_startup()
+    database_ready = time.perf_counter()
+    await start_events()
+    await start_stats_refresher()
+    ready = time.perf_counter()
+    logger.info(
+        "Worker ready in %.3fs: app imports %.3fs, database %.3fs (%s), background tasks %.3fs",
+        IMPORT_SECONDS + ready - started,
+        IMPORT_SECONDS,
+        database_ready - started,
+        "migrated" if migrated else "schema up to date",
+        ready - database_ready,
+    )
     yield
+    await close_stats_refresher()
+    await close_events()
+    await close_cache()
 
 
 def create_app() -> FastAPI:
@@ -37,14 +70,45 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Clients read from the primary for a while after they write, whichever worker serves them
+    app.add_middleware(PrimaryPinMiddleware)
+
+    if settings.query_repeat_warning_threshold:
+        app.add_middleware(RepeatedQueryMiddleware, threshold=settings.query_repeat_warning_threshold)
+
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        max_in_flight=settings.compression_max_in_flight,
+    )
+
+    # Added last so it is outermost and times the whole middleware stack
+    app.add_middleware(MetricsMiddleware)
+
     app.include_router(auth.router, prefix="/api/v1")
     app.include_router(decisions.router, prefix="/api/v1")
+    app.include_router(events.router, prefix="/api/v1")
     app.include_router(stats.router, prefix="/api/v1")
     app.include_router(user.router, prefix="/api/v1")
 
     @app.get("/api/health")
     async def health_check():
-        return {"status": "ok", "service": "aleator"}
+        return {"status": "ok", "service": "aleator", "db_pool": get_pool_stats()}
+
+    # Not under /api, so the public reverse proxy doesn't expose it
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    # Same as SIGHUP, for the worker that serves the request; also kept away from the public proxy
+    @app.post("/admin/reload-settings", include_in_schema=False)
+    async def reload_settings_endpoint():
+        previous = get_settings()
+        reloaded = reload_settings()
+        if reloaded is previous:
+            raise HTTPException(status_code=500, detail="Settings reload failed, keeping the current settings")
+        changed = [name for name in Settings.model_fields if getattr(reloaded, name) != getattr(previous, name)]
+        return {"changed": changed}
 
     return app
 
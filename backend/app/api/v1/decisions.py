@@ -1,14 +1,23 @@
-from typing import List
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from pydantic import BaseModel
+from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.auth import get_current_active_user
-from app.db import get_db_session
+from app.cache import Cache, get_cache
+from app.db import get_db_session, get_read_db_session
+from app.events import EventBroker, get_event_broker
+from app.idempotency import Handled, idempotency_key_header, idempotent_response
+from app.metrics import response_cache_requests_total, roll_confirmations_total, rolls_total
 from app.models import Roll, User
+from app.responses import TrustedJSONResponse, render_trusted
 from app.schemas import (
+    DecisionChangesResponse,
     DecisionCreate,
+    DecisionOrderResponse,
     DecisionResponse,
     DecisionUpdate,
     DecisionWithRollsResponse,
@@ -17,53 +26,128 @@ from app.schemas import (
     RollResult,
 )
 from app.services import (
+    as_utc,
     check_cooldown,
     confirm_roll,
     create_decision,
-    get_decision_by_id,
+    delete_decision,
+    get_decision_for_update,
     get_pending_roll,
-    get_user_decisions,
+    get_user_decision,
+    read_data_version,
+    read_decision_changes,
+    read_user_decisions,
+    reorder_user_decisions,
     roll_decision,
     update_decision,
 )
+from app.settings import Settings, get_settings
 
 router = APIRouter(prefix="/decisions", tags=["decisions"])
 
 
+async def cached_body(
+    cache: Cache, key: str, endpoint: str, ttl: float, load: Callable[[], Awaitable[Any]]
+) -> bytes | None:
+    """The encoded result of load, cached under key for ttl seconds (0 disables), or None if load returns None.
+
+    Keys include the user's data version, so a write makes the next request miss instead of getting
+    stale data, and superseded entries just age out of the cache.
+    """
+    rendered = False
+
+    async def render() -> bytes | None:
+        nonlocal rendered
+        rendered = True
+        content = await load()
+        return None if content is None else render_trusted(content)
+
+    if ttl <= 0:
+        return await render()
+    body = await cache.get_or_load(key, render, ttl=ttl, raw=True)
+    response_cache_requests_total.inc(endpoint=endpoint, result="miss" if rendered else "hit")
+    return body
+
+
 @router.post("/", response_model=DecisionResponse, status_code=status.HTTP_201_CREATED)
 async def create_new_decision(
     decision_data: DecisionCreate,
     current_user: User = Depends(get_current_active_user),
     session: AsyncSession = Depends(get_db_session),
+    broker: EventBroker = Depends(get_event_broker),
 ):
     """Create a new decision."""
     try:
         decision = await create_decision(current_user, decision_data, session)
-        return decision
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    await broker.publish(current_user.id, "decision_created", decision_id=decision.id)
+    return decision
 
 
 @router.get("/", response_model=List[DecisionWithRollsResponse])
 async def get_decisions(
-    current_user: User = Depends(get_current_active_user), session: AsyncSession = Depends(get_db_session)
+    current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_read_db_session),
+    cache: Cache = Depends(get_cache),
+    settings: Settings = Depends(get_settings),
+):
+    """Get all decisions for the current user.
+
+    The X-Changes-Cursor header is the cursor to pass to /decisions/changes to get what changes next.
+    """
+    assert current_user.id is not None
+    version = await read_data_version(current_user.id, session)
+    body = await cached_body(
+        cache,
+        f"decisions:{current_user.id}:{version}",
+        "decisions",
+        settings.response_cache_ttl_seconds,
+        lambda: read_user_decisions(current_user, session),
+    )
+    return Response(body, media_type="application/json", headers={"X-Changes-Cursor": str(version)})
+
+
+@router.get("/changes", response_model=DecisionChangesResponse)
+async def get_decision_changes(
+    since: str = Query(description="Cursor from X-Changes-Cursor or a previous response"),
+    current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_read_db_session),
 ):
-    """Get all decisions for the current user."""
-    decisions = await get_user_decisions(current_user, session)
-    return decisions
+    """Get the decisions, rolls and deletions that changed since a cursor, and the next cursor."""
+    try:
+        changes = await read_decision_changes(current_user, since, session)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return TrustedJSONResponse(changes)
 
 
 @router.get("/{decision_id}", response_model=DecisionWithRollsResponse)
 async def get_decision(
     decision_id: int,
     current_user: User = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_session),
+    session: AsyncSession = Depends(get_read_db_session),
+    cache: Cache = Depends(get_cache),
+    settings: Settings = Depends(get_settings),
 ):
     """Get a specific decision."""
-    decision = await get_decision_by_id(decision_id, current_user, session)
-    if not decision:
+    assert current_user.id is not None
+    version = await read_data_version(current_user.id, session)
+
+    async def load():
+        decisions = await read_user_decisions(current_user, session, decision_id)
+        return decisions[0] if decisions else None
+
+    body = await cached_body(
+        cache,
+        f"decision:{current_user.id}:{decision_id}:{version}",
+        "decision",
+        settings.response_cache_ttl_seconds,
+        load,
+    )
+    if body is None:
         raise HTTPException(status_code=404, detail="Decision not found")
-    return decision
+    return Response(body, media_type="application/json")
 
 
 @router.put("/{decision_id}", response_model=DecisionResponse)
@@ -72,18 +156,27 @@ async def update_decision_endpoint(
     update_data: DecisionUpdate,
     current_user: User = Depends(get_current_active_user),
     session: AsyncSession = Depends(get_db_session),
+    settings: Settings = Depends(get_settings),
+    broker: EventBroker = Depends(get_event_broker),
 ):
     """Update a decision."""
-    decision = await get_decision_by_id(decision_id, current_user, session)
+    decision = await get_decision_for_update(decision_id, current_user, session)
     if not decision:
         raise HTTPException(status_code=404, detail="Decision not found")
 
     try:
-        updated_decision = await update_decision(decision, update_data, session)
-        return updated_decision
+        response = await update_decision(
+            decision, update_data, session, coalesce_window=timedelta(seconds=settings.history_coalesce_seconds)
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    changes = {}
+    if update_data.cooldown_hours is not None:
+        _, changes["cooldown_ends_at"] = await check_cooldown(decision, current_user, session)
+    await broker.publish(current_user.id, "decision_updated", decision_id=decision_id, **changes)
+    return response
+
 
 @router.get("/{decision_id}/pending-roll", response_model=RollResult)
 async def get_decision_pending_roll(
@@ -92,7 +185,7 @@ async def get_decision_pending_roll(
     session: AsyncSession = Depends(get_db_session),
 ):
     """Get the pending roll for a decision, if any."""
-    decision = await get_decision_by_id(decision_id, current_user, session)
+    decision = await get_user_decision(decision_id, current_user, session)
     if not decision:
         raise HTTPException(status_code=404, detail="Decision not found")
 
@@ -106,33 +199,50 @@ async def get_decision_pending_roll(
 @router.post("/{decision_id}/roll", response_model=RollResult)
 async def roll_decision_endpoint(
     decision_id: int,
+    request: Request,
     roll_request: RollRequest | None = None,
+    idempotency_key: str | None = Depends(idempotency_key_header),
     current_user: User = Depends(get_current_active_user),
     session: AsyncSession = Depends(get_db_session),
+    broker: EventBroker = Depends(get_event_broker),
+    settings: Settings = Depends(get_settings),
 ):
-    """Roll a decision to get a result."""
-    decision = await get_decision_by_id(decision_id, current_user, session)
-    if not decision:
-        raise HTTPException(status_code=404, detail="Decision not found")
+    """Roll a decision to get a result.
 
-    # Check if there's already a pending roll
-    pending_roll = await get_pending_roll(decision_id, current_user, session)
-    if pending_roll:
-        raise HTTPException(status_code=400, detail="You have a pending roll that must be confirmed first")
-
-    # Check if decision is on cooldown
-    is_on_cooldown, cooldown_ends_at = await check_cooldown(decision, current_user, session)
-    if is_on_cooldown:
-        assert cooldown_ends_at is not None, "Cooldown end time should be set if on cooldown"
-        raise HTTPException(
-            status_code=400, detail=f"Decision is on cooldown. You can roll again at {cooldown_ends_at.isoformat()}"
-        )
+    A retry with the same Idempotency-Key gets the original roll back instead of a pending roll error.
+    """
 
-    try:
-        roll = await roll_decision(decision, session, roll_request)
-        return roll
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    async def roll() -> Handled:
+        decision = await get_user_decision(decision_id, current_user, session)
+        if not decision:
+            raise HTTPException(status_code=404, detail="Decision not found")
+
+        # Check if decision is on cooldown (a pending roll is refused by roll_decision)
+        is_on_cooldown, cooldown_ends_at = await check_cooldown(decision, current_user, session)
+        if is_on_cooldown:
+            assert cooldown_ends_at is not None, "Cooldown end time should be set if on cooldown"
+            raise HTTPException(
+                status_code=400,
+                detail=f"Decision is on cooldown. You can roll again at {cooldown_ends_at.isoformat()}",
+            )
+
+        try:
+            roll = await roll_decision(decision, session, roll_request)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        async def committed() -> None:
+            rolls_total.inc(type=decision.type)
+            await broker.publish(
+                current_user.id, "roll_created", decision_id=decision_id, roll_id=roll.id, result=roll.result
+            )
+
+        return RollResult.model_validate(roll, from_attributes=True).model_dump_json().encode(), committed
+
+    assert current_user.id is not None
+    return await idempotent_response(
+        request, idempotency_key, current_user.id, session, settings.idempotency_ttl_seconds, "roll", roll
+    )
 
 
 @router.post("/{decision_id}/rolls/{roll_id}/confirm")
@@ -140,48 +250,77 @@ async def confirm_decision_roll(
     decision_id: int,
     roll_id: int,
     confirmation: RollConfirmation,
+    request: Request,
+    idempotency_key: str | None = Depends(idempotency_key_header),
     current_user: User = Depends(get_current_active_user),
     session: AsyncSession = Depends(get_db_session),
+    broker: EventBroker = Depends(get_event_broker),
+    settings: Settings = Depends(get_settings),
 ):
-    """Confirm whether the user followed through on a roll."""
-    # Verify the decision belongs to the user
-    decision = await get_decision_by_id(decision_id, current_user, session)
-    if not decision:
-        raise HTTPException(status_code=404, detail="Decision not found")
+    """Confirm whether the user followed through on a roll.
 
-    # Get the specific roll
-    from sqlmodel import select
+    A retry with the same Idempotency-Key gets the original confirmation back instead of an error.
+    """
 
-    roll_statement = select(Roll).where(Roll.id == roll_id, Roll.decision_id == decision_id)
-    roll_result = await session.exec(roll_statement)
-    roll = roll_result.first()
+    async def confirm() -> Handled:
+        # Verify the decision belongs to the user
+        decision = await get_user_decision(decision_id, current_user, session)
+        if not decision:
+            raise HTTPException(status_code=404, detail="Decision not found")
 
-    if not roll:
-        raise HTTPException(status_code=404, detail="Roll not found")
+        # Get the specific roll
+        roll_statement = select(Roll).where(Roll.id == roll_id, Roll.decision_id == decision_id)
+        roll_result = await session.exec(roll_statement)
+        roll = roll_result.first()
 
-    if roll.followed is not None:
-        raise HTTPException(status_code=400, detail="Roll already confirmed")
+        if not roll:
+            raise HTTPException(status_code=404, detail="Roll not found")
 
-    try:
-        updated_roll = await confirm_roll(roll, confirmation.followed, session)
-        return {"message": "Roll confirmed", "followed": updated_roll.followed}
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        if roll.followed is not None:
+            raise HTTPException(status_code=400, detail="Roll already confirmed")
+
+        try:
+            updated_roll = await confirm_roll(roll, confirmation.followed, session)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        cooldown_ends_at = None
+        if decision.cooldown_hours:
+            cooldown_ends_at = as_utc(updated_roll.created_at) + timedelta(hours=decision.cooldown_hours)
+
+        async def committed() -> None:
+            roll_confirmations_total.inc(followed=str(confirmation.followed).lower())
+            await broker.publish(
+                current_user.id,
+                "roll_confirmed",
+                decision_id=decision_id,
+                roll_id=roll_id,
+                followed=updated_roll.followed,
+                cooldown_ends_at=cooldown_ends_at,
+            )
+
+        return render_trusted({"message": "Roll confirmed", "followed": updated_roll.followed}), committed
+
+    assert current_user.id is not None
+    return await idempotent_response(
+        request, idempotency_key, current_user.id, session, settings.idempotency_ttl_seconds, "confirm", confirm
+    )
 
 
 @router.delete("/{decision_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_decision(
+async def delete_decision_endpoint(
     decision_id: int,
     current_user: User = Depends(get_current_active_user),
     session: AsyncSession = Depends(get_db_session),
+    broker: EventBroker = Depends(get_event_broker),
 ):
     """Delete a decision."""
-    decision = await get_decision_by_id(decision_id, current_user, session)
+    decision = await get_user_decision(decision_id, current_user, session)
     if not decision:
         raise HTTPException(status_code=404, detail="Decision not found")
 
-    await session.delete(decision)
-    await session.commit()
+    await delete_decision(decision, session)
+    await broker.publish(current_user.id, "decision_deleted", decision_id=decision_id)
     return None
 
 
@@ -189,23 +328,23 @@ class ReorderRequest(BaseModel):
     decision_orders: list[dict[str, int]]  # [{"id": 1, "order": 0}, {"id": 2, "order": 1}]
 
 
-@router.post("/reorder", response_model=List[DecisionWithRollsResponse])
+@router.post("/reorder", response_model=List[DecisionOrderResponse])
 async def reorder_decisions(
     reorder_data: ReorderRequest,
     current_user: User = Depends(get_current_active_user),
     session: AsyncSession = Depends(get_db_session),
+    broker: EventBroker = Depends(get_event_broker),
 ):
     """Reorder decisions by updating display_order."""
-    # Verify all decisions belong to the user and update their order
-    for item in reorder_data.decision_orders:
-        decision = await get_decision_by_id(item["id"], current_user, session)
-        if not decision:
-            raise HTTPException(status_code=404, detail=f"Decision {item['id']} not found")
-
-        decision.display_order = item["order"]
-
-    await session.commit()
-
-    # Return updated decisions list
-    decisions = await get_user_decisions(current_user, session)
-    return decisions
+    orders = {item["id"]: item["order"] for item in reorder_data.decision_orders}
+    try:
+        updated = await reorder_user_decisions(current_user, orders, session)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    await broker.publish(
+        current_user.id,
+        "decisions_reordered",
+        display_orders=[{"id": decision_id, "display_order": order} for decision_id, order in updated],
+    )
+
+    return [DecisionOrderResponse(id=decision_id, display_order=order) for decision_id, order in updated]
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.auth import create_stream_ticket, get_current_active_user, get_stream_user
+from app.db import get_db_session
+from app.events import Event, EventBroker, get_event_broker
+from app.models import User
+from app.schemas import StreamTicket
+from app.services import get_cooldown_ends
+from app.settings import Settings, get_settings
+
+router = APIRouter(tags=["events"])
+
+# How long browsers wait before reconnecting a dropped stream
+RETRY_MILLISECONDS = 5000
+
+
+def track_cooldown(event: Event, cooldown_ends: dict[int, datetime]) -> None:
+    """Keep the stream's cooldown end times in line with the events passing through it."""
+    decision_id = event.data.get("decision_id")
+    if event.type == "decision_deleted":
+        cooldown_ends.pop(decision_id, None)
+    elif event.type in ("roll_confirmed", "decision_updated") and "cooldown_ends_at" in event.data:
+        ends_at = event.data["cooldown_ends_at"]
+        if ends_at is None:
+            cooldown_ends.pop(decision_id, None)
+        else:
+            cooldown_ends[decision_id] = datetime.fromisoformat(ends_at)
+
+
+async def event_stream(
+    broker: EventBroker, user_id: int, cooldown_ends: dict[int, datetime], keepalive_seconds: float
+) -> AsyncIterator[bytes]:
+    """The user's events in text/event-stream format, plus cooldown_ended when a cooldown runs out."""
+    with broker.subscribe(user_id) as subscription:
+        yield b"retry: %d\n\n" % RETRY_MILLISECONDS
+        while True:
+            now = datetime.now(timezone.utc)
+            for decision_id in [decision_id for decision_id, ends_at in cooldown_ends.items() if ends_at <= now]:
+                del cooldown_ends[decision_id]
+                yield Event("cooldown_ended", {"decision_id": decision_id}).encode()
+
+            timeout = min([keepalive_seconds, *((ends_at - now).total_seconds() for ends_at in cooldown_ends.values())])
+            try:
+                event = await asyncio.wait_for(subscription.get(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle stream
+                yield b": keepalive\n\n"
+                continue
+            track_cooldown(event, cooldown_ends)
+            yield event.encode()
+
+
+@router.post("/events/ticket", response_model=StreamTicket)
+async def create_events_ticket(
+    current_user: User = Depends(get_current_active_user),
+    settings: Settings = Depends(get_settings),
+):
+    """Issue a short-lived ticket for opening /events?ticket= from EventSource, which can't send headers."""
+    return StreamTicket(ticket=create_stream_ticket(current_user, settings), expires_in=settings.events_ticket_seconds)
+
+
+@router.get("/events")
+async def stream_events(
+    current_user: User = Depends(get_stream_user),
+    session: AsyncSession = Depends(get_db_session),
+    settings: Settings = Depends(get_settings),
+    broker: EventBroker = Depends(get_event_broker),
+):
+    """Stream changes to the current user's decisions as Server-Sent Events.
+
+    Events: decision_created, decision_updated, decision_deleted, decisions_reordered, roll_created,
+    roll_confirmed, cooldown_ended, and resync when the client should refetch everything.
+    """
+    assert current_user.id is not None
+    cooldown_ends = await get_cooldown_ends(current_user, session)
+    # Don't hold a pooled connection for the lifetime of the stream
+    await session.commit()
+
+    return StreamingResponse(
+        event_stream(broker, current_user.id, cooldown_ends, settings.events_keepalive_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,28 +2,26 @@ from datetime import datetime, timezone
 from typing import Any, Dict
 
 from fastapi import APIRouter, Depends
-from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.auth import get_current_active_user
-from app.db import get_db_session
-from app.models import BinaryDecision, Choice, Decision, MultiChoiceDecision, Roll, RollChoiceWeight, User
+from app.db import get_read_db_session
+from app.models import User
+from app.responses import TrustedJSONResponse
+from app.services import read_export_decisions
 
 router = APIRouter(prefix="/user", tags=["user"])
 
 
-@router.get("/export")
+@router.get("/export", response_model=Dict[str, Any])
 async def export_user_data(
     current_user: User = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_session),
-) -> Dict[str, Any]:
+    session: AsyncSession = Depends(get_read_db_session),
+) -> TrustedJSONResponse:
     """Export all user data in JSON format."""
-    # Get all decisions with their related data
-    decisions_stmt = select(Decision).where(Decision.user_id == current_user.id).order_by(Decision.display_order)
-    decisions_result = await session.exec(decisions_stmt)
-    decisions = decisions_result.all()
+    decisions = await read_export_decisions(current_user, session)
 
-    export_data = {
+    export_data: Dict[str, Any] = {
         "export_date": datetime.now(timezone.utc).isoformat(),
         "user": {
             "id": current_user.id,
@@ -34,12 +32,7 @@ async def export_user_data(
     }
 
     for decision in decisions:
-        # Get rolls for this decision
-        rolls_stmt = select(Roll).where(Roll.decision_id == decision.id).order_by(Roll.created_at.desc())
-        rolls_result = await session.exec(rolls_stmt)
-        rolls = rolls_result.all()
-
-        decision_data = {
+        decision_data: Dict[str, Any] = {
             "id": decision.id,
             "title": decision.title,
             "type": decision.type,
@@ -51,12 +44,8 @@ async def export_user_data(
 
         # Add type-specific data
         if decision.type == "binary":
-            # Get binary decision data
-            binary_stmt = select(BinaryDecision).where(BinaryDecision.decision_id == decision.id)
-            binary_result = await session.exec(binary_stmt)
-            binary_data = binary_result.first()
-
-            if binary_data:
+            if decision.binary_decision:
+                binary_data = decision.binary_decision
                 decision_data["binary_data"] = {
                     "probability": float(binary_data.probability),
                     "probability_granularity": binary_data.probability_granularity,
@@ -64,16 +53,7 @@ async def export_user_data(
                     "no_text": binary_data.no_text,
                 }
         else:  # multi_choice
-            # Get choices
-            choices_stmt = select(Choice).where(Choice.decision_id == decision.id).order_by(Choice.id)
-            choices_result = await session.exec(choices_stmt)
-            choices = choices_result.all()
-
-            # Get multi-choice decision data
-            multi_stmt = select(MultiChoiceDecision).where(MultiChoiceDecision.decision_id == decision.id)
-            multi_result = await session.exec(multi_stmt)
-            multi_data = multi_result.first()
-
+            multi_data = decision.multi_choice_decision
             decision_data["multi_choice_data"] = {
                 "weight_granularity": multi_data.weight_granularity if multi_data else 0,
                 "choices": [
@@ -82,14 +62,15 @@ async def export_user_data(
                         "name": choice.name,
                         "weight": choice.weight,
                     }
-                    for choice in choices
+                    for choice in (multi_data.choices if multi_data else [])
                 ],
             }
 
-        # Add rolls data
+        # Add rolls data, newest first
+        rolls = sorted(decision.rolls, key=lambda roll: roll.created_at, reverse=True)
         rolls_data = []
         for roll in rolls:
-            roll_data = {
+            roll_data: Dict[str, Any] = {
                 "id": roll.id,
                 "rolled_at": roll.created_at.isoformat() if roll.created_at else None,
                 "result": roll.result,
@@ -99,13 +80,8 @@ async def export_user_data(
             if decision.type == "binary":
                 roll_data["probability_at_roll"] = float(roll.probability) if roll.probability else None
             else:
-                # Get choice weights for this roll
-                weights_stmt = select(RollChoiceWeight).where(RollChoiceWeight.roll_id == roll.id)
-                weights_result = await session.exec(weights_stmt)
-                weights = weights_result.all()
-
                 roll_data["choice_weights_at_roll"] = [
-                    {"choice_name": w.choice_name, "weight": float(w.weight)} for w in weights
+                    {"choice_name": w.choice_name, "weight": float(w.weight)} for w in roll.choice_weights
                 ]
 
             rolls_data.append(roll_data)
@@ -126,4 +102,4 @@ async def export_user_data(
 
         export_data["decisions"].append(decision_data)
 
-    return export_data
+    return TrustedJSONResponse(export_data)
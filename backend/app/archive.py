@@ -0,0 +1,131 @@
+"""Archive old confirmed rolls into compressed per-decision, per-month segments.
+
+Confirmed rolls older than ROLL_ARCHIVE_AFTER_DAYS are encoded with app.segments into one RollArchive
+row per decision and month, and their roll and rollchoiceweight rows are deleted. Only whole months
+are archived; pending rolls stay live. services.read_rolls merges segments back in, so the decision
+list, export and stats see archived rolls like live ones. Run it from cron:
+
+    python -m app.archive
+"""
+
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import delete, func
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.dto import RollRow
+from app.models import Roll, RollArchive, RollChoiceWeight
+from app.partitioning import add_months, month_start, months_between
+from app.segments import decode_segment, encode_segment
+from app.services import select_live_rolls
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 5000
+
+
+@dataclass
+class ArchiveResult:
+    segments: int = 0
+    rolls: int = 0
+
+
+def _month_bounds(month: date) -> tuple[datetime, datetime]:
+    return (
+        datetime.combine(month, time.min, timezone.utc),
+        datetime.combine(add_months(month, 1), time.min, timezone.utc),
+    )
+
+
+async def _store_segment(session: AsyncSession, decision_id: int, month: date, rolls: list[RollRow]) -> None:
+    """Write rolls into the decision's segment for the month, merging with one archived earlier."""
+    result = await session.exec(
+        select(RollArchive).where(RollArchive.decision_id == decision_id, RollArchive.month == month)
+    )
+    archive = result.first()
+    if archive is None:
+        session.add(
+            RollArchive(decision_id=decision_id, month=month, roll_count=len(rolls), data=encode_segment(rolls))
+        )
+        return
+
+    # A roll from an archived month was confirmed late
+    new_ids = {roll.id for roll in rolls}
+    kept = [roll for roll in decode_segment(archive.data, decision_id) if roll.id not in new_ids]
+    merged = sorted(kept + rolls, key=lambda roll: roll.id)
+    archive.data = encode_segment(merged)
+    archive.roll_count = len(merged)
+
+
+async def archive_old_rolls(session: AsyncSession, older_than: timedelta, now: datetime | None = None) -> ArchiveResult:
+    """Archive confirmed rolls from months that ended more than older_than ago; commits per segment."""
+    now = now or datetime.now(timezone.utc)
+    cutoff_month = month_start((now - older_than).date())
+    cutoff, _ = _month_bounds(cutoff_month)
+    archivable = [col(Roll.followed).is_not(None), col(Roll.created_at) < cutoff]
+
+    decisions_result = await session.exec(select(Roll.decision_id).where(*archivable).distinct())
+    result = ArchiveResult()
+    for decision_id in decisions_result.all():
+        oldest_result = await session.exec(
+            select(func.min(Roll.created_at)).where(Roll.decision_id == decision_id, *archivable)
+        )
+        oldest = oldest_result.one()
+        if oldest is None:
+            continue
+
+        for month in months_between(oldest.date(), add_months(cutoff_month, -1)):
+            start, end = _month_bounds(month)
+            in_month = [col(Roll.created_at) >= start, col(Roll.created_at) < end]
+            rolls = await select_live_rolls(
+                session, col(Roll.decision_id) == decision_id, col(Roll.followed).is_not(None), *in_month
+            )
+            if not rolls:
+                continue
+
+            await _store_segment(session, decision_id, month, rolls)
+            ids = [roll.id for roll in rolls]
+            for index in range(0, len(ids), DELETE_BATCH_SIZE):
+                batch = ids[index : index + DELETE_BATCH_SIZE]
+                await session.exec(  # type: ignore[call-overload]
+                    delete(RollChoiceWeight)
+                    .where(col(RollChoiceWeight.roll_id).in_(batch))
+                    .execution_options(synchronize_session=False)
+                )
+                # The created_at bounds let PostgreSQL prune to the month's partition
+                await session.exec(  # type: ignore[call-overload]
+                    delete(Roll).where(col(Roll.id).in_(batch), *in_month).execution_options(synchronize_session=False)
+                )
+            await session.commit()
+
+            result.segments += 1
+            result.rolls += len(rolls)
+    return result
+
+
+async def main(argv: list[str] | None = None) -> None:
+    from app.db import close_db, get_engine
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=int, default=settings.roll_archive_after_days)
+    args = parser.parse_args(argv)
+
+    engine = get_engine(settings)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            result = await archive_old_rolls(session, timedelta(days=args.older_than_days))
+    finally:
+        await close_db(engine)
+    logger.info("Archived %d rolls into %d segments", result.rolls, result.segments)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
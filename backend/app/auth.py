@@ -15,6 +15,10 @@ from app.settings import Settings, get_settings
 
 # HTTP Bearer token for JWT
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Scope of the short-lived tokens that may only open event streams
+STREAM_TICKET_SCOPE = "events"
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -37,6 +41,13 @@ def create_access_token(data: dict, settings: Settings) -> str:
     return encoded_jwt
 
 
+def create_stream_ticket(user: User, settings: Settings) -> str:
+    """Create a JWT that only opens event streams, expiring after events_ticket_seconds."""
+    expire = datetime.now(timezone.utc) + timedelta(seconds=settings.events_ticket_seconds)
+    data = {"sub": user.email, "scope": STREAM_TICKET_SCOPE, "exp": expire}
+    return jwt.encode(data, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+
+
 async def get_user_by_email(email: str, session: AsyncSession) -> Optional[User]:
     """Get a user by email."""
     statement = select(User).where(User.email == email)
@@ -87,19 +98,23 @@ async def get_current_user(
     settings: Settings = Depends(get_settings),
 ) -> User:
     """Get the current user from JWT token or guest token."""
+    return await get_user_by_token(credentials.credentials, session, settings)
+
+
+async def get_user_by_token(token: str, session: AsyncSession, settings: Settings) -> User:
+    """Get the user a JWT or guest token belongs to; raises 401 if there is none."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token = credentials.credentials
-
     # First, try to decode as JWT token
     try:
         payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
         email: str = payload.get("sub")
-        if email is None:
+        # Stream tickets are only good for ?ticket= on /events
+        if email is None or payload.get("scope") is not None:
             raise credentials_exception
 
         user = await get_user_by_email(email, session)
@@ -121,3 +136,46 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+
+async def get_user_by_stream_ticket(ticket: str, session: AsyncSession, settings: Settings) -> User:
+    """Get the user a stream ticket was issued to; raises 401 for anything else, including access tokens."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate stream ticket",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(ticket, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+    except jwt.PyJWTError:
+        raise credentials_exception
+    if payload.get("scope") != STREAM_TICKET_SCOPE or payload.get("sub") is None:
+        raise credentials_exception
+
+    user = await get_user_by_email(payload["sub"], session)
+    if user is None:
+        raise credentials_exception
+    return user
+
+
+async def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    ticket: Optional[str] = None,
+    session: AsyncSession = Depends(get_db_session),
+    settings: Settings = Depends(get_settings),
+) -> User:
+    """Get the current active user for a stream, from the Authorization header or ?ticket=.
+
+    Browsers can't set headers on EventSource requests, so streams also accept a ticket from
+    POST /events/ticket as a query parameter. Query strings end up in logs, so that is all they accept:
+    access and guest tokens only ever go in the header.
+    """
+    if credentials:
+        user = await get_user_by_token(credentials.credentials, session, settings)
+    elif ticket:
+        user = await get_user_by_stream_ticket(ticket, session, settings)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"}
+        )
+    return await get_current_active_user(user)
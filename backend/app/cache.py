@@ -0,0 +1,284 @@
+"""Shared cache with TTL, LRU eviction and single-flight loading.
+
+Values are stored as JSON, so they come back as plain dicts, lists and strings; the *_bytes methods
+store bytes as they are. Two backends:
+
+- MemoryBackend: per process, LRU-bounded to CACHE_MAX_ENTRIES and CACHE_MAX_BYTES. The default.
+- RedisBackend: anything speaking the Redis protocol at CACHE_URL (redis://[:password@]host[:port][/db]),
+  shared by all workers. Eviction is the server's job (maxmemory-policy allkeys-lru).
+
+Backend failures are logged and treated as misses, so an unreachable cache server slows requests down
+instead of failing them. Cached user data is keyed by the user's data version rather than invalidated:
+a write makes later requests use new keys, and superseded entries age out.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Protocol
+from urllib.parse import unquote, urlsplit
+
+import orjson
+from fastapi import Depends
+
+from app.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+_cache: "Cache | None" = None
+
+
+class CacheError(Exception):
+    """Error reply from the cache server."""
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class MemoryBackend:
+    """In-process backend evicting least recently used entries beyond max_entries or max_bytes of values."""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int | None = None) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0  # Total bytes of stored values
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry[1])
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._remove(key)
+        if self.max_bytes is not None and len(value) > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.size += len(value)
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.size > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._remove(key)
+
+    async def close(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+def encode_command(*args: str | bytes) -> bytes:
+    """Encode a command as a RESP array of bulk strings."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg.encode() if isinstance(arg, str) else arg
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = (await reader.readuntil(b"\r\n"))[:-2]
+    kind, rest = line[:1], line[1:]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise CacheError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        return None if length < 0 else (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [await read_reply(reader) for _ in range(length)]
+    raise CacheError(f"Unexpected reply {line!r}")
+
+
+class RedisBackend:
+    """Backend speaking RESP over one connection per worker, reconnecting after failures."""
+
+    def __init__(self, url: str, timeout: float = 1.0) -> None:
+        parsed = urlsplit(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+
+    async def _call(self, *args: str | bytes) -> Any:
+        assert self._reader is not None and self._writer is not None
+        self._writer.write(encode_command(*args))
+        await self._writer.drain()
+        return await read_reply(self._reader)
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._call("AUTH", self.password)
+        if self.db:
+            await self._call("SELECT", str(self.db))
+
+    async def _disconnect(self) -> None:
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def execute(self, *args: str | bytes) -> Any:
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await asyncio.wait_for(self._connect(), self.timeout)
+                return await asyncio.wait_for(self._call(*args), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.CancelledError):
+                # The connection may be mid-reply; start over with a fresh one next time
+                await self._disconnect()
+                raise
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.execute("SET", key, value, "PX", str(max(1, int(ttl * 1000))))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.execute("DEL", *keys)
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._disconnect()
+
+
+class Cache:
+    """JSON values over a backend, with keys prefixed by namespace.
+
+    get_or_load runs at most one loader per key at a time in this process; concurrent callers wait for
+    its result. A load that overlaps a delete is returned but not stored.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str = "aleator") -> None:
+        self.backend = backend
+        self.namespace = namespace
+        self._inflight: dict[str, asyncio.Future[Any]] = {}
+        self._generation = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get_bytes(self, key: str) -> bytes | None:
+        try:
+            return await self.backend.get(self._key(key))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, CacheError):
+            logger.warning("Cache read of %s failed", key, exc_info=True)
+            return None
+
+    async def set_bytes(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            await self.backend.set(self._key(key), value, ttl)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, CacheError):
+            logger.warning("Cache write of %s failed", key, exc_info=True)
+
+    async def get(self, key: str) -> Any | None:
+        data = await self.get_bytes(key)
+        return None if data is None else orjson.loads(data)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self.set_bytes(key, orjson.dumps(value), ttl)
+
+    async def delete(self, *keys: str) -> None:
+        self._generation += 1
+        try:
+            await self.backend.delete(*(self._key(key) for key in keys))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, CacheError):
+            logger.warning("Cache delete of %s failed", keys, exc_info=True)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float, raw: bool = False) -> Any:
+        """Return the cached value for key, or load, store and return it. None is never cached.
+
+        With raw, the loader returns bytes, which are stored as they are instead of as JSON.
+        """
+        value = await (self.get_bytes(key) if raw else self.get(key))
+        if value is not None:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The request that was loading went away; load for ourselves
+                return await self.get_or_load(key, loader, ttl, raw)
+
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+            if value is not None and generation == self._generation:
+                await (self.set_bytes(key, value, ttl) if raw else self.set(key, value, ttl))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # Waiters re-raise it; don't warn when there were none
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def create_backend(settings: Settings) -> CacheBackend:
+    if settings.cache_url:
+        return RedisBackend(settings.cache_url)
+    return MemoryBackend(settings.cache_max_entries, settings.cache_max_bytes)
+
+
+def get_cache(settings: Settings = Depends(get_settings)) -> Cache:
+    """Get or create the process-wide cache."""
+    global _cache
+    if _cache is None:
+        _cache = Cache(create_backend(settings))
+    return _cache
+
+
+async def close_cache() -> None:
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
@@ -0,0 +1,249 @@
+"""Content-negotiated response compression: zstd, brotli or gzip, whichever the client prefers.
+
+zstd and brotli need the zstandard and brotli packages; without them only gzip is offered. Bodies below
+COMPRESSION_MINIMUM_SIZE are sent as-is, and so are all responses while more than
+COMPRESSION_MAX_IN_FLIGHT requests are being handled by this worker, so that compression doesn't add
+CPU time when the worker is already busy. Server-Sent Events are never compressed: each event must
+reach the client as soon as it is sent. Nor do they count as requests in flight once their response has
+started, since an open stream mostly waits and would otherwise turn compression off for everyone while a
+few dashboards are open.
+"""
+
+import asyncio
+import zlib
+from typing import Callable, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+# Levels that compress JSON nearly as well as the maximum at a fraction of the CPU time
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# Whole bodies at least this large are compressed in a thread instead of blocking the event loop
+THREAD_THRESHOLD = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes:
+        """Everything compressed so far, in a form the client can decode without the rest."""
+        ...
+
+    def finish(self) -> bytes: ...
+
+
+class GzipCompressor:
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> dict[str, Callable[[], Compressor]]:
+    """Supported content codings in order of preference."""
+    encodings: dict[str, Callable[[], Compressor]] = {}
+    if zstandard is not None:
+        encodings["zstd"] = ZstdCompressor
+    if brotli is not None:
+        encodings["br"] = BrotliCompressor
+    encodings["gzip"] = GzipCompressor
+    return encodings
+
+
+def negotiate(accept_encoding: str, encodings: list[str]) -> str | None:
+    """Pick the coding from encodings the Accept-Encoding header rates highest, ties going to the earlier one."""
+    ratings: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ratings[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = ratings.get(encoding, ratings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return (
+        "content-encoding" not in headers
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+        and not content_type.startswith(UNCOMPRESSED_TYPES)
+    )
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses in the coding the client prefers.
+
+    Complete bodies are compressed in one go. Streamed bodies are compressed message by message, each
+    flushed so the client gets it without waiting for the rest.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, max_in_flight: int = 0) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_in_flight = max_in_flight  # 0 means no limit
+        self.encodings = available_encodings()
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), list(self.encodings))
+        self.in_flight += 1
+        counted = True
+
+        def uncount() -> None:
+            nonlocal counted
+            if counted:
+                counted = False
+                self.in_flight -= 1
+
+        try:
+            if self.max_in_flight and self.in_flight > self.max_in_flight:
+                encoding = None
+            sender = CompressingSender(send, encoding, self.encodings, self.minimum_size, on_event_stream=uncount)
+            await self.app(scope, receive, sender)
+        finally:
+            uncount()
+
+
+class CompressingSender:
+    """The send callable for one response, compressing its body if it qualifies."""
+
+    def __init__(
+        self,
+        send: Send,
+        encoding: str | None,
+        encodings: dict[str, Callable[[], Compressor]],
+        minimum_size: int,
+        on_event_stream: Callable[[], None] | None = None,
+    ) -> None:
+        self.send = send
+        self.on_event_stream = on_event_stream
+        self.encoding = encoding
+        self.encodings = encodings
+        self.minimum_size = minimum_size
+        self.start: Message | None = None
+        self.compressor: Compressor | None = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if self.on_event_stream is not None and headers.get("content-type", "").startswith(UNCOMPRESSED_TYPES):
+                self.on_event_stream()
+            if is_compressible(headers):
+                # Caches must keep compressed and uncompressed variants apart, compressed or not
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                if self.encoding is not None:
+                    # Hold the start until the first body message shows whether compressing pays off
+                    self.start = message
+                    return
+            self.passthrough = True
+            await self.send(message)
+            return
+
+        if self.passthrough or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+
+            assert self.encoding is not None
+            self.compressor = self.encodings[self.encoding]()
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            if not more_body:
+                body = await self._compress_all(body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            await self.send(start)
+
+        assert self.compressor is not None
+        if more_body:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _compress_all(self, body: bytes) -> bytes:
+        compressor = self.compressor
+        assert compressor is not None
+        if len(body) >= THREAD_THRESHOLD:
+            return await asyncio.to_thread(lambda: compressor.compress(body) + compressor.finish())
+        return compressor.compress(body) + compressor.finish()
@@ -1,30 +1,134 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator
 
-from alembic import command, config
-from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from fastapi import Depends, Request
+from sqlalchemy import Dialect, MetaData, delete, insert, inspect, select, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+from sqlalchemy.schema import CreateIndex, CreateTable
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.models import SchemaFingerprint
+from app.partitioning import prepare_roll_partitions
 from app.settings import Settings, get_settings
 
+logger = logging.getLogger(__name__)
+
 _engine: AsyncEngine | None = None
 _session_maker: async_sessionmaker[AsyncSession] | None = None
+_read_engine: AsyncEngine | None = None
+_read_session_maker: async_sessionmaker[AsyncSession] | None = None
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Serializes migrations between workers starting at the same time
+SCHEMA_LOCK_ID = 0x736368656D61  # "schema"
+
+
+@dataclass
+class PoolMetrics:
+    """Cumulative connection checkout statistics for the engine's pool."""
+
+    checkouts: int = 0
+    checkout_timeouts: int = 0
+    checkout_wait_seconds_total: float = 0.0
+    checkout_wait_seconds_max: float = 0.0
+
+    def record_checkout(self, wait_seconds: float) -> None:
+        self.checkouts += 1
+        self.checkout_wait_seconds_total += wait_seconds
+        self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, wait_seconds)
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a free connection."""
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.checkout_timeouts += 1
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+def get_pool_limits(settings: Settings) -> tuple[int, int]:
+    """Return (pool_size, max_overflow) for one worker process.
+
+    When db_max_connections is set, the budget is split evenly across web_concurrency workers without
+    overflow, so the total never exceeds what the database allows.
+    """
+    if settings.db_max_connections is not None:
+        return max(1, settings.db_max_connections // max(1, settings.web_concurrency)), 0
+    return settings.db_pool_size, settings.db_pool_max_overflow
+
+
+def get_engine_options(settings: Settings, database_url: str | None = None) -> dict[str, Any]:
+    """Build create_async_engine keyword arguments from settings, for database_url or the primary."""
+    database_url = database_url or settings.database_url
+    options: dict[str, Any] = {"echo": settings.sqlalchemy_echo}
+    if database_url.startswith("sqlite"):
+        return options
+
+    pool_size, max_overflow = get_pool_limits(settings)
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    if "+asyncpg" in database_url:
+        options["connect_args"] = {"prepared_statement_cache_size": settings.db_statement_cache_size}
+    return options
 
 
 def get_engine(settings: Settings = Depends(get_settings)) -> AsyncEngine:
     """Get or create the database engine using cached settings."""
     global _engine
     if _engine is None:
-        _engine = create_async_engine(
-            settings.database_url,
-            echo=settings.sqlalchemy_echo,
-            pool_pre_ping=True,
-        )
+        _engine = create_async_engine(settings.database_url, **get_engine_options(settings))
     return _engine
 
 
+def get_pool_stats() -> dict[str, Any]:
+    """Current pool occupancy and cumulative checkout statistics."""
+    stats: dict[str, Any] = {
+        "checkouts": pool_metrics.checkouts,
+        "checkout_timeouts": pool_metrics.checkout_timeouts,
+        "checkout_wait_seconds_total": round(pool_metrics.checkout_wait_seconds_total, 6),
+        "checkout_wait_seconds_max": round(pool_metrics.checkout_wait_seconds_max, 6),
+    }
+    if _engine is not None and isinstance(_engine.pool, TimedQueuePool):
+        pool = _engine.pool
+        capacity = sum(get_pool_limits(get_settings()))
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=max(0, pool.overflow()),
+            capacity=capacity,
+            saturation=round(pool.checkedout() / capacity, 4) if capacity else 0.0,
+        )
+    return stats
+
+
 def get_session_maker(engine: AsyncEngine = Depends(get_engine)) -> async_sessionmaker[AsyncSession]:
     global _session_maker
     if _session_maker is None:
@@ -36,6 +140,38 @@ def get_session_maker(engine: AsyncEngine = Depends(get_engine)) -> async_sessio
     return _session_maker
 
 
+# Cookie carried by a client that wrote recently; its reads go to the primary while it lasts
+PRIMARY_PIN_COOKIE = "aleator_primary"
+
+
+class PrimaryPinMiddleware:
+    """Pins clients to the primary for READ_AFTER_WRITE_PIN_SECONDS after each successful write.
+
+    Successful responses to unsafe methods set a PRIMARY_PIN_COOKIE that expires after that long, and
+    get_read_db_session sends requests carrying it to the primary, so clients see their own writes despite
+    replica lag. The pin travels with the client, so it holds whichever worker serves the next read, and
+    no matter which token the client uses. It is only set once the write has been answered, which is
+    after it committed.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            seconds = get_settings().read_after_write_pin_seconds
+            if message["type"] == "http.response.start" and message["status"] < 400 and seconds > 0:
+                cookie = f"{PRIMARY_PIN_COOKIE}=1; Max-Age={math.ceil(seconds)}; Path=/; HttpOnly; SameSite=Lax"
+                MutableHeaders(raw=message["headers"]).append("set-cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
 async def get_db_session(
     session_maker: async_sessionmaker[AsyncSession] = Depends(get_session_maker),
 ) -> AsyncIterator[AsyncSession]:
@@ -43,39 +179,128 @@ async def get_db_session(
         yield session
 
 
+def get_read_engine(settings: Settings = Depends(get_settings)) -> AsyncEngine:
+    """Get or create the engine for read_database_url; the primary engine if no replica is configured."""
+    global _read_engine
+    if settings.read_database_url is None:
+        return get_engine(settings)
+    if _read_engine is None:
+        _read_engine = create_async_engine(
+            settings.read_database_url, **get_engine_options(settings, settings.read_database_url)
+        )
+    return _read_engine
+
+
+def get_read_session_maker(settings: Settings) -> async_sessionmaker[AsyncSession]:
+    global _read_session_maker
+    if _read_session_maker is None:
+        _read_session_maker = async_sessionmaker(get_read_engine(settings), expire_on_commit=False, class_=AsyncSession)
+    return _read_session_maker
+
+
+async def get_read_db_session(
+    request: Request,
+    settings: Settings = Depends(get_settings),
+    session: AsyncSession = Depends(get_db_session),
+) -> AsyncIterator[AsyncSession]:
+    """Session for read-only endpoints, on the read replica when one is configured.
+
+    Without a replica, or while the client is pinned to the primary after a write, this is the
+    request's regular session (which only connects if used).
+    """
+    if settings.read_database_url is None or PRIMARY_PIN_COOKIE in request.cookies:
+        yield session
+        return
+    async with get_read_session_maker(settings)() as read_session:
+        yield read_session
+
+
+def schema_fingerprint(metadata: MetaData, dialect: Dialect) -> str:
+    """Hash of the DDL metadata compiles to on dialect; any table, column or index change changes it."""
+    lines = []
+    for table in metadata.sorted_tables:
+        # Constraints come out in set order, which differs between processes, so compare sorted lines
+        ddl = str(CreateTable(table).compile(dialect=dialect))
+        lines.extend(sorted(line.strip().rstrip(",") for line in ddl.splitlines() if line.strip()))
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            lines.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+async def read_schema_fingerprint(conn: AsyncConnection) -> str | None:
+    """The fingerprint stored by the last migration, or None before the first."""
+    table = SchemaFingerprint.__tablename__
+    if not await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(table)):
+        return None
+    return (await conn.execute(select(SchemaFingerprint.fingerprint))).scalar()
+
+
+def upgrade_to_head() -> None:
+    # Imported here: alembic and its dependencies take longer to import than the rest of the app, and
+    # are only needed on the boots that migrate
+    from alembic import command, config
+
+    command.upgrade(config.Config("alembic.ini"), "head")
+
+
+async def migrate_database(engine: AsyncEngine, settings: Settings) -> bool:
+    """Bring the schema up to date unless the stored fingerprint shows it already is.
+
+    Returns whether anything was migrated. On PostgreSQL the migration holds an advisory lock, so of
+    several workers booting at once one migrates and the others find the new fingerprint when they get
+    the lock. Alembic runs in a thread, keeping the event loop free.
+    """
+    fingerprint = schema_fingerprint(SQLModel.metadata, engine.dialect)
+    async with engine.connect() as conn:
+        if await read_schema_fingerprint(conn) == fingerprint:
+            return False
+
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+            if await read_schema_fingerprint(conn) == fingerprint:
+                return False
+
+        if settings.db_auto_create:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        else:
+            await asyncio.to_thread(upgrade_to_head)
+            # Alembic doesn't create the fingerprint table
+            await conn.run_sync(SQLModel.metadata.create_all, tables=[SchemaFingerprint.__table__])
+
+        await conn.execute(delete(SchemaFingerprint))
+        await conn.execute(
+            insert(SchemaFingerprint).values(id=1, fingerprint=fingerprint, migrated_at=datetime.now(timezone.utc))
+        )
+    logger.info("Migrated the database schema to %s", fingerprint[:12])
+    return True
+
+
 async def prepare_database(
     settings: Settings = Depends(get_settings), engine: AsyncEngine = Depends(get_engine)
 ) -> None:
     """Prepare the database - either create tables or run migrations."""
-    if settings.db_auto_create:
-        async with engine.begin() as conn:
-            await conn.run_sync(SQLModel.metadata.create_all)
-    else:
-        alembic_cfg = config.Config("alembic.ini")
-        command.upgrade(alembic_cfg, "head")
+    await migrate_database(engine, settings)
 
 
-async def prepare_database_startup() -> None:
-    """Prepare the database during startup without dependency injection."""
-    # Import models to ensure they're registered with SQLModel.metadata
-    from app.models import BinaryDecision, Choice, Decision, MultiChoiceDecision, ProbabilityHistory, Roll, User
-
+async def prepare_database_startup() -> bool:
+    """Prepare the database during startup without dependency injection; returns whether it migrated."""
     settings = get_settings()
     engine = get_engine(settings)
-
-    if settings.db_auto_create:
-        async with engine.begin() as conn:
-            await conn.run_sync(SQLModel.metadata.create_all)
-    else:
-        alembic_cfg = config.Config("alembic.ini")
-        command.upgrade(alembic_cfg, "head")
+    migrated = await migrate_database(engine, settings)
+    await prepare_roll_partitions(engine, settings)
+    return migrated
 
 
 async def close_db(engine: AsyncEngine = Depends(get_engine)) -> None:
+    global _engine, _session_maker, _read_engine, _read_session_maker
     await engine.dispose()
-    global _engine, _session_maker
+    if _read_engine is not None:
+        await _read_engine.dispose()
     _engine = None
     _session_maker = None
+    _read_engine = None
+    _read_session_maker = None
 
 
 @asynccontextmanager
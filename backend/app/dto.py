@@ -0,0 +1,94 @@
+"""Read-only row objects for large reads.
+
+Slotted dataclasses built straight from Core result tuples: no identity map, change tracking or
+validation, and a fraction of the memory of ORM instances or dicts. Fields are in the order of the
+matching response schemas, so orjson encodes them exactly as the schemas would.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from app.models import DecisionType
+
+
+@dataclass(slots=True)
+class BinaryDecisionRow:
+    probability: float
+    probability_granularity: int
+    yes_text: str
+    no_text: str
+
+
+@dataclass(slots=True)
+class WeightHistoryRow:
+    id: int
+    choice_id: int
+    weight: float
+    changed_at: datetime
+
+
+@dataclass(slots=True)
+class ChoiceRow:
+    id: int
+    name: str
+    weight: float
+    display_order: int
+    weight_history: list[WeightHistoryRow] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class MultiChoiceDecisionRow:
+    choices: list[ChoiceRow]
+    weight_granularity: int
+
+
+@dataclass(slots=True)
+class RollChoiceWeightRow:
+    choice_id: int
+    choice_name: str
+    weight: float
+
+
+@dataclass(slots=True)
+class RollRow:
+    id: int
+    decision_id: int
+    result: str
+    followed: bool | None
+    probability: float | None
+    choice_weights: list[RollChoiceWeightRow]
+    created_at: datetime
+
+
+@dataclass(slots=True)
+class ProbabilityHistoryRow:
+    id: int
+    decision_id: int
+    probability: float
+    changed_at: datetime
+
+
+@dataclass(slots=True)
+class DecisionRow:
+    id: int
+    title: str
+    type: DecisionType
+    cooldown_hours: float
+    display_order: int
+    created_at: datetime
+    updated_at: datetime
+    binary_decision: BinaryDecisionRow | None = None
+    multi_choice_decision: MultiChoiceDecisionRow | None = None
+    rolls: list[RollRow] = field(default_factory=list)
+    probability_history: list[ProbabilityHistoryRow] = field(default_factory=list)
+    pending_roll: RollRow | None = None
+    last_confirmed_at: datetime | None = None
+    cooldown_ends_at: datetime | None = None
+
+
+@dataclass(slots=True)
+class DecisionChangesRow:
+    cursor: str
+    decisions: list[DecisionRow]
+    rolls: list[RollRow]
+    deleted_decision_ids: list[int]
@@ -0,0 +1,206 @@
+"""Per-user change events for the Server-Sent Events stream at /api/v1/events.
+
+Endpoints publish small events (ids and changed values, never whole decisions) to the EventBroker,
+which hands them to the user's open streams in this process. With EVENTS_POSTGRES_BRIDGE enabled,
+events go through PostgreSQL NOTIFY instead and every worker, the sender included, delivers them from
+its LISTEN connection, so streams see changes made through any worker.
+
+Delivery is best effort: a stream that falls behind, or misses events while the bridge reconnects,
+gets a `resync` event and should refetch.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterator
+
+import orjson
+
+from app.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "aleator_events"
+QUEUE_SIZE = 256
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7900
+
+_broker: "EventBroker | None" = None
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    type: str
+    data: dict[str, Any]
+
+    def encode(self) -> bytes:
+        """The event in text/event-stream format."""
+        return b"event: %s\ndata: %s\n\n" % (self.type.encode(), orjson.dumps(self.data))
+
+
+RESYNC = Event("resync", {})
+
+
+class Subscription:
+    """One open stream's queue of events."""
+
+    def __init__(self, user_id: int, maxsize: int = QUEUE_SIZE) -> None:
+        self.user_id = user_id
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize)
+
+    def put(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client can't keep up; drop the backlog and have it refetch instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self) -> Event:
+        return await self.queue.get()
+
+
+class PostgresBridge:
+    """Relays events between workers through NOTIFY on a dedicated asyncpg connection."""
+
+    def __init__(self, dsn: str, broker: "EventBroker") -> None:
+        self.dsn = dsn
+        self.broker = broker
+        self._connection: Any = None
+        self._connected_before = False
+        self._lock = asyncio.Lock()
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        message = orjson.loads(payload)
+        self.broker.deliver(message["user_id"], Event(message["type"], message["data"]))
+
+    def _on_terminate(self, connection: Any) -> None:
+        logger.warning("Event bridge connection lost")
+        self._connection = None
+
+    async def _connection_or_connect(self) -> Any:
+        if self._connection is None or self._connection.is_closed():
+            import asyncpg
+
+            connection = await asyncpg.connect(self.dsn)
+            await connection.add_listener(CHANNEL, self._on_notify)
+            connection.add_termination_listener(self._on_terminate)
+            self._connection = connection
+            if self._connected_before:
+                # Events from other workers were lost while disconnected
+                self.broker.deliver_all(RESYNC)
+            self._connected_before = True
+        return self._connection
+
+    async def start(self) -> None:
+        async with self._lock:
+            await self._connection_or_connect()
+
+    async def publish(self, user_id: int, event: Event) -> bool:
+        """Send the event through NOTIFY; False if it has to be delivered locally instead."""
+        payload = orjson.dumps({"user_id": user_id, "type": event.type, "data": event.data}).decode()
+        if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+            logger.warning("Event %s is too large for NOTIFY, delivering it locally", event.type)
+            return False
+        async with self._lock:
+            try:
+                connection = await self._connection_or_connect()
+                await connection.execute("SELECT pg_notify($1, $2)", CHANNEL, payload)
+            except Exception as exc:  # Connection errors and asyncpg.PostgresError
+                logger.warning("Event bridge publish failed, delivering locally: %s", exc)
+                if self._connection is not None and self._connection.is_closed():
+                    self._connection = None
+                return False
+        return True
+
+    async def close(self) -> None:
+        async with self._lock:
+            connection, self._connection = self._connection, None
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+
+
+class EventBroker:
+    """In-process pub/sub of events keyed by user id."""
+
+    def __init__(self) -> None:
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self.bridge: PostgresBridge | None = None
+
+    @contextmanager
+    def subscribe(self, user_id: int) -> Iterator[Subscription]:
+        subscription = Subscription(user_id)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscriptions = self._subscriptions[user_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[user_id]
+
+    def subscriber_count(self, user_id: int | None = None) -> int:
+        if user_id is not None:
+            return len(self._subscriptions.get(user_id, ()))
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def deliver(self, user_id: int, event: Event) -> None:
+        """Hand the event to the user's streams in this process."""
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.put(event)
+
+    def deliver_all(self, event: Event) -> None:
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.put(event)
+
+    async def publish(self, user_id: int, event_type: str, **data: Any) -> None:
+        """Publish an event to all of the user's streams, in every worker when the bridge is enabled."""
+        event = Event(event_type, {key: _jsonable(value) for key, value in data.items()})
+        if self.bridge is not None and await self.bridge.publish(user_id, event):
+            return
+        self.deliver(user_id, event)
+
+    async def start_bridge(self, settings: Settings) -> None:
+        if not settings.events_postgres_bridge or not settings.database_url.startswith("postgresql"):
+            return
+        from sqlalchemy.engine import make_url
+
+        dsn = make_url(settings.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.bridge = PostgresBridge(dsn, self)
+        try:
+            await self.bridge.start()
+        except (OSError, ConnectionError) as exc:
+            # Publishing retries the connection; until then events stay within this worker
+            logger.warning("Event bridge could not connect: %s", exc)
+
+    async def close(self) -> None:
+        if self.bridge is not None:
+            await self.bridge.close()
+            self.bridge = None
+
+
+def _jsonable(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def get_event_broker() -> EventBroker:
+    """Get or create the process-wide event broker."""
+    global _broker
+    if _broker is None:
+        _broker = EventBroker()
+    return _broker
+
+
+async def start_events() -> None:
+    await get_event_broker().start_bridge(get_settings())
+
+
+async def close_events() -> None:
+    global _broker
+    if _broker is not None:
+        await _broker.close()
+        _broker = None
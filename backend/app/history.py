@@ -0,0 +1,130 @@
+"""Collapse bursts of probability and weight history rows.
+
+With HISTORY_COALESCE_SECONDS set, update_decision overwrites the latest history row when a value changes
+again within that many seconds. This job applies the same rule to rows written before that, or with a
+wider window: within a burst only the last row is kept, and the first row of every decision and choice
+(its initial value) is never removed. Decisions that lose rows are touched, so delta sync and cached
+responses see the change. Run it once after upgrading, or from cron:
+
+    python -m app.history --window-seconds N
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import delete
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Choice, Decision, ProbabilityHistory, WeightHistory
+from app.services import touch_decisions
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 5000
+PAGE_SIZE = 1000  # Decisions whose history is compacted per transaction
+
+
+def superseded_rows(rows: Iterable[tuple[int, int, datetime]], window: timedelta) -> list[int]:
+    """Ids of history rows followed within window by another row of the same owner.
+
+    rows are (id, owner id, changed_at) ordered by owner and id; owner first rows are always kept.
+    """
+    superseded = []
+    previous_id, previous_owner, previous_at = 0, None, datetime.min
+    previous_is_first = False
+    for row_id, owner_id, changed_at in rows:
+        same_owner = owner_id == previous_owner
+        if same_owner and not previous_is_first and changed_at - previous_at < window:
+            superseded.append(previous_id)
+        previous_is_first = not same_owner
+        previous_id, previous_owner, previous_at = row_id, owner_id, changed_at
+    return superseded
+
+
+async def delete_rows(
+    model: type[ProbabilityHistory] | type[WeightHistory], ids: list[int], session: AsyncSession
+) -> None:
+    for index in range(0, len(ids), DELETE_BATCH_SIZE):
+        await session.exec(  # type: ignore[call-overload]
+            delete(model)
+            .where(col(model.id).in_(ids[index : index + DELETE_BATCH_SIZE]))
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def compact_history(session: AsyncSession, window: timedelta, page_size: int = PAGE_SIZE) -> dict[str, int]:
+    """Delete history rows superseded within window; returns the number deleted per table.
+
+    Works through the decisions page_size at a time in id order, committing after each page, so only
+    one page's history is in memory.
+    """
+    deleted = {"probabilityhistory": 0, "weighthistory": 0}
+    after = 0
+    while True:
+        result = await session.exec(
+            select(Decision.id).where(col(Decision.id) > after).order_by(col(Decision.id)).limit(page_size)
+        )
+        page = result.all()
+        if not page:
+            return deleted
+        start, after = after, page[-1]
+        touched: set[int] = set()
+
+        probability_result = await session.exec(
+            select(ProbabilityHistory.id, ProbabilityHistory.decision_id, ProbabilityHistory.changed_at)
+            .where(col(ProbabilityHistory.decision_id) > start, col(ProbabilityHistory.decision_id) <= after)
+            .order_by(col(ProbabilityHistory.decision_id), col(ProbabilityHistory.id))
+        )
+        rows = probability_result.all()
+        ids = superseded_rows(rows, window)
+        await delete_rows(ProbabilityHistory, ids, session)
+        superseded = set(ids)
+        touched.update(decision_id for row_id, decision_id, _ in rows if row_id in superseded)
+        deleted["probabilityhistory"] += len(ids)
+
+        weight_result = await session.exec(
+            select(WeightHistory.id, WeightHistory.choice_id, WeightHistory.changed_at, Choice.decision_id)
+            .join(Choice, col(Choice.id) == col(WeightHistory.choice_id))
+            .where(col(Choice.decision_id) > start, col(Choice.decision_id) <= after)
+            .order_by(col(WeightHistory.choice_id), col(WeightHistory.id))
+        )
+        weight_rows = weight_result.all()
+        ids = superseded_rows(
+            [(row_id, choice_id, changed_at) for row_id, choice_id, changed_at, _ in weight_rows], window
+        )
+        await delete_rows(WeightHistory, ids, session)
+        superseded = set(ids)
+        touched.update(decision_id for row_id, _, _, decision_id in weight_rows if row_id in superseded)
+        deleted["weighthistory"] += len(ids)
+
+        await touch_decisions(sorted(touched), session)
+        await session.commit()
+
+
+async def main(argv: list[str] | None = None) -> None:
+    from app.db import close_db, get_engine
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--window-seconds", type=float, default=settings.history_coalesce_seconds)
+    args = parser.parse_args(argv)
+    if args.window_seconds <= 0:
+        parser.error("--window-seconds is required unless HISTORY_COALESCE_SECONDS is set")
+
+    engine = get_engine(settings)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            deleted = await compact_history(session, timedelta(seconds=args.window_seconds))
+    finally:
+        await close_db(engine)
+    logger.info("Removed superseded history rows: %s", deleted)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
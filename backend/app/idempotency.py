@@ -0,0 +1,137 @@
+"""Idempotency-Key support for POST endpoints that clients retry.
+
+The first successful response to a key is stored in the idempotencykey table for IDEMPOTENCY_TTL_SECONDS,
+next to a hash of the request it answered. The row is inserted before the endpoint runs and committed in
+the same transaction as the endpoint's own writes, so a response is only ever replayed for a change that
+was saved, a change is never saved without the response a retry should get, and a retry arriving while
+the original is still running waits for it instead of running alongside. A retry with the same key gets
+that response again, marked with Idempotent-Replayed: true, instead of running the endpoint a second
+time. Reusing a key for a different request is rejected. Errors are not stored, so a retry after one
+runs the endpoint again.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from fastapi import Header, HTTPException, Request, Response
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.metrics import idempotent_requests_total
+from app.models import IdempotencyKey
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# What an endpoint's handler returns: the response body, and what to do once its writes are committed
+Handled = tuple[bytes, Callable[[], Awaitable[None]]]
+
+
+def idempotency_key_header(
+    idempotency_key: str | None = Header(
+        None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH, description="Unique per intended request; retries reuse it"
+    ),
+) -> str | None:
+    return idempotency_key
+
+
+async def request_fingerprint(request: Request) -> str:
+    """Hash of what makes two requests the same: method, path and body."""
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode() + await request.body())
+    return digest.hexdigest()
+
+
+async def read_idempotency_key(user_id: int, key: str, session: AsyncSession) -> IdempotencyKey | None:
+    """The unexpired stored response to key, if there is one."""
+    statement = select(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at > datetime.now(timezone.utc),
+    )
+    result = await session.exec(statement)
+    return result.first()
+
+
+async def reserve_idempotency_key(
+    user_id: int, key: str, fingerprint: str, ttl: float, session: AsyncSession
+) -> int | None:
+    """Insert the key's row, still without a body, before the endpoint runs; None if another request has it.
+
+    The row stays uncommitted until the endpoint's writes commit with it. A concurrent request with the same
+    key blocks on its unique index until then and gets None once the first one committed, so it replays
+    that response instead of running the endpoint a second time. Expired keys of the user are deleted
+    first, including an earlier use of this one.
+    """
+    now = datetime.now(timezone.utc)
+    await session.exec(  # type: ignore[call-overload]
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.expires_at <= now)
+        .execution_options(synchronize_session=False)
+    )
+    insert_ = postgresql_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+    statement = (
+        insert_(IdempotencyKey)
+        .values(user_id=user_id, key=key, fingerprint=fingerprint, body=b"", expires_at=now + timedelta(seconds=ttl))
+        .on_conflict_do_nothing()
+        .returning(IdempotencyKey.id)
+    )
+    result = await session.exec(statement)  # type: ignore[call-overload]
+    return result.scalar_one_or_none()
+
+
+def replay(stored: IdempotencyKey, fingerprint: str, endpoint: str) -> Response:
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    idempotent_requests_total.inc(endpoint=endpoint, result="replayed")
+    return Response(stored.body, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+
+async def idempotent_response(
+    request: Request,
+    key: str | None,
+    user_id: int,
+    session: AsyncSession,
+    ttl: float,
+    endpoint: str,
+    handle: Callable[[], Awaitable[Handled]],
+) -> Response:
+    """Commit the writes handle leaves in session and respond with its JSON body, or with the stored one if key
+    was used before.
+    """
+    if key is None or ttl <= 0:
+        body, committed = await handle()
+        await session.commit()
+        await committed()
+        return Response(body, media_type="application/json")
+
+    fingerprint = await request_fingerprint(request)
+    stored = await read_idempotency_key(user_id, key, session)
+    if stored is not None:
+        return replay(stored, fingerprint, endpoint)
+
+    key_id = await reserve_idempotency_key(user_id, key, fingerprint, ttl, session)
+    if key_id is None:
+        # A concurrent request with the key committed while this one waited for its row
+        await session.rollback()
+        stored = await read_idempotency_key(user_id, key, session)
+        if stored is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        return replay(stored, fingerprint, endpoint)
+
+    try:
+        body, committed = await handle()
+    except BaseException:
+        # Errors are not stored: give the key back
+        await session.rollback()
+        raise
+    await session.exec(  # type: ignore[call-overload]
+        update(IdempotencyKey).where(col(IdempotencyKey.id) == key_id).values(body=body)
+    )
+    await session.commit()
+
+    await committed()
+    idempotent_requests_total.inc(endpoint=endpoint, result="new")
+    return Response(body, media_type="application/json")
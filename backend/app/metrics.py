@@ -0,0 +1,277 @@
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db import get_pool_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> list[str]: ...
+
+    def render(self) -> str:
+        header = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        return "\n".join(header + self.samples())
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*buckets, float("inf"))
+        # Per label set: (non-cumulative bucket counts, sum)
+        self.values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts, total = self.values.get(key) or ([0] * len(self.buckets), 0.0)
+        counts[bisect_left(self.buckets, value)] += 1
+        self.values[key] = (counts, total + value)
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class CallbackGauge(Metric):
+    """Gauge whose value is read from a callback at scrape time."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float | None]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def samples(self) -> list[str]:
+        value = self.callback()
+        return [] if value is None else [f"{self.name} {_format_value(value)}"]
+
+
+class CallbackCounter(CallbackGauge):
+    type_name = "counter"
+
+
+http_requests_total = Counter(
+    "aleator_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "aleator_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+http_requests_in_flight = Gauge("aleator_http_requests_in_flight", "HTTP requests currently being served.")
+db_queries_per_request = Histogram(
+    "aleator_db_queries_per_request", "Database queries issued per request.", ("route",), QUERY_COUNT_BUCKETS
+)
+db_query_seconds_per_request = Histogram(
+    "aleator_db_query_seconds_per_request", "Time spent in database queries per request.", ("route",)
+)
+db_queries_total = Counter("aleator_db_queries_total", "Database queries by route.", ("route",))
+rolls_total = Counter("aleator_rolls_total", "Decisions rolled by decision type.", ("type",))
+roll_confirmations_total = Counter(
+    "aleator_roll_confirmations_total", "Rolls confirmed by whether they were followed.", ("followed",)
+)
+response_cache_requests_total = Counter(
+    "aleator_response_cache_requests_total", "Cached response lookups by endpoint and result.", ("endpoint", "result")
+)
+idempotent_requests_total = Counter(
+    "aleator_idempotent_requests_total",
+    "Requests with an Idempotency-Key by endpoint and result.",
+    ("endpoint", "result"),
+)
+
+
+def _pool_stat(name: str) -> Callable[[], float | None]:
+    return lambda: get_pool_stats().get(name)
+
+
+REGISTRY: list[Metric] = [
+    http_requests_total,
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    db_queries_per_request,
+    db_query_seconds_per_request,
+    db_queries_total,
+    rolls_total,
+    roll_confirmations_total,
+    response_cache_requests_total,
+    idempotent_requests_total,
+    CallbackGauge("aleator_db_pool_size", "Connections the pool keeps open.", _pool_stat("size")),
+    CallbackGauge("aleator_db_pool_checked_out", "Connections currently checked out.", _pool_stat("checked_out")),
+    CallbackGauge("aleator_db_pool_overflow", "Overflow connections currently open.", _pool_stat("overflow")),
+    CallbackGauge("aleator_db_pool_saturation", "Checked out connections / pool capacity.", _pool_stat("saturation")),
+    CallbackCounter("aleator_db_pool_checkouts_total", "Connection checkouts.", _pool_stat("checkouts")),
+    CallbackCounter(
+        "aleator_db_pool_checkout_timeouts_total", "Checkouts that timed out.", _pool_stat("checkout_timeouts")
+    ),
+    CallbackCounter(
+        "aleator_db_pool_checkout_wait_seconds_total",
+        "Time spent waiting for a connection.",
+        _pool_stat("checkout_wait_seconds_total"),
+    ),
+]
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+@dataclass
+class RequestDbStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+# Database stats of the request being served in the current task, if any
+current_db_stats: ContextVar[RequestDbStats | None] = ContextVar("current_db_stats", default=None)
+# Statement lists of the app.querycount logs active in the current task, each getting every statement
+current_statement_logs: ContextVar[tuple[list[str], ...]] = ContextVar("current_statement_logs", default=())
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # The one engine-wide listener for both: per-request stats are counted after the statement ran
+    for statements in current_statement_logs.get():
+        statements.append(statement)
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    start = conn.info["query_start_times"].pop()
+    stats = current_db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += time.perf_counter() - start
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context) -> None:
+    # after_cursor_execute doesn't run for failed statements
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_times"):
+        connection.info["query_start_times"].pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and database usage per route."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestDbStats()
+        token = current_db_stats.set(stats)
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            current_db_stats.reset(token)
+
+            route = _route_template(scope)
+            method = scope["method"]
+            http_requests_total.inc(method=method, route=route, status=str(status))
+            http_request_duration_seconds.observe(duration, method=method, route=route)
+            db_queries_per_request.observe(stats.queries, route=route)
+            db_query_seconds_per_request.observe(stats.seconds, route=route)
+            if stats.queries:
+                db_queries_total.inc(stats.queries, route=route)
+
+
+def _route_template(scope: dict[str, Any]) -> str:
+    """Path template of the matched route, so metrics don't get a label per decision id."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -1,9 +1,9 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from enum import StrEnum
 from typing import Optional
 
 from pydantic import EmailStr
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, Index, LargeBinary, UniqueConstraint, text
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -22,8 +22,12 @@ class User(SQLModel, table=True):
     is_active: bool = Field(default=True)
     is_guest: bool = Field(default=False)
     guest_token: str | None = Field(default=None, unique=True, index=True)
+    # Incremented by every write to the user's decisions and rolls; the cursor of /decisions/changes
+    data_version: int = Field(default=0)
 
     decisions: list["Decision"] = Relationship(back_populates="user", cascade_delete=True)
+    decision_tombstones: list["DecisionTombstone"] = Relationship(cascade_delete=True)
+    idempotency_keys: list["IdempotencyKey"] = Relationship(cascade_delete=True)
 
 
 class Decision(SQLModel, table=True):
@@ -33,6 +37,7 @@ class Decision(SQLModel, table=True):
     type: DecisionType
     cooldown_hours: float = Field(default=0, ge=0)  # 0 means no cooldown
     display_order: int = Field(default=0)  # For custom ordering
+    version: int = Field(default=0)  # User.data_version of the last change to the decision, its choices or history
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc), sa_column=Column(DateTime(timezone=True), nullable=False)
     )
@@ -47,6 +52,7 @@ class Decision(SQLModel, table=True):
         back_populates="decision", cascade_delete=True
     )
     rolls: list["Roll"] = Relationship(back_populates="decision", cascade_delete=True)
+    roll_archives: list["RollArchive"] = Relationship(back_populates="decision", cascade_delete=True)
     probability_history: list["ProbabilityHistory"] = Relationship(back_populates="decision", cascade_delete=True)
 
 
@@ -80,12 +86,27 @@ class Choice(SQLModel, table=True):
 
 
 class Roll(SQLModel, table=True):
+    # Rolls are always read per decision, mostly newest first or within a time window, or by version for delta sync
+    __table_args__ = (
+        Index("ix_roll_decision_id_created_at", "decision_id", "created_at"),
+        Index("ix_roll_decision_id_version", "decision_id", "version"),
+        # At most one pending roll per decision (not on partitioned tables, see app.partitioning)
+        Index(
+            "uq_roll_decision_id_pending",
+            "decision_id",
+            unique=True,
+            postgresql_where=text("followed IS NULL"),
+            sqlite_where=text("followed IS NULL"),
+        ),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     decision_id: int = Field(foreign_key="decision.id")
     result: str  # For binary: "yes"/"no", for multi: choice name
     followed: bool | None = Field(default=None)  # None means not yet confirmed
     # For binary decisions, store the probability used for this roll
     probability: float | None = Field(default=None, ge=0.01, le=99.99)
+    version: int = Field(default=0)  # User.data_version of the roll's creation or confirmation
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc), sa_column=Column(DateTime(timezone=True), nullable=False)
     )
@@ -107,6 +128,45 @@ class RollChoiceWeight(SQLModel, table=True):
     roll: Roll = Relationship(back_populates="choice_weights")
 
 
+class RollArchive(SQLModel, table=True):
+    """Confirmed rolls of one decision and month, compressed into a single segment (see app.archive)"""
+
+    __table_args__ = (UniqueConstraint("decision_id", "month"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    decision_id: int = Field(foreign_key="decision.id", index=True)
+    month: date  # First day of the month, UTC
+    roll_count: int
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))  # app.segments encoding
+
+    decision: Decision = Relationship(back_populates="roll_archives")
+
+
+class DecisionTombstone(SQLModel, table=True):
+    """Records a deleted decision so /decisions/changes can report the deletion"""
+
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    decision_id: int
+    version: int  # User.data_version of the deletion
+    deleted_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+
+
+class IdempotencyKey(SQLModel, table=True):
+    """The response to a request made with an Idempotency-Key, kept for replaying retries (see app.idempotency)"""
+
+    __table_args__ = (UniqueConstraint("user_id", "key"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    key: str = Field(max_length=255)
+    fingerprint: str = Field(max_length=64)  # sha256 of the request's method, path and body
+    body: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+
 class ProbabilityHistory(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     decision_id: int = Field(foreign_key="decision.id")
@@ -127,3 +187,13 @@ class WeightHistory(SQLModel, table=True):
     )
 
     choice: Choice = Relationship(back_populates="weight_history")
+
+
+class SchemaFingerprint(SQLModel, table=True):
+    """Hash of the schema the database was last migrated to, so startup can skip migrating (see app.db)."""
+
+    id: int = Field(default=1, primary_key=True)
+    fingerprint: str
+    migrated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
@@ -0,0 +1,181 @@
+"""Monthly range partitioning of the roll table on PostgreSQL.
+
+With DB_PARTITION_ROLLS enabled, startup converts `roll` into a table partitioned by `created_at`
+month (copying existing rows), and makes sure partitions exist for the next few months. Rows outside
+every monthly partition land in `roll_default`. Run `python -m app.partitioning` from cron as well, so
+long-running deployments keep getting future partitions without a restart.
+
+A partitioned table's primary key has to include the partition key, so it becomes (id, created_at),
+and rollchoiceweight.roll_id can no longer be a foreign key to it. For the same reason the unique index
+on pending rolls is dropped. services.insert_pending_roll still refuses a second pending roll: its
+NOT EXISTS check runs after services.roll_decision has locked the user row through bump_data_version,
+so a concurrent roll waits there and the check then sees the pending roll it committed.
+
+Reads bounded by created_at (roll history windows, the stats for today) only touch the partitions they
+need. The per-decision lookups of the pending roll and the latest confirmed one can't be bounded, since
+either may be of any age, so they probe the (decision_id, created_at) index of every partition. That stays
+cheap because app.archive empties the partitions of archived months.
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "roll_default"
+# Serializes partition maintenance between workers starting at the same time
+ADVISORY_LOCK_ID = 0x726F6C6C  # "roll"
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"roll_{month.year:04d}_{month.month:02d}"
+
+
+def months_between(first: date, last: date) -> list[date]:
+    """First days of every month from first's month through last's month."""
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def create_partition_sql(month: date) -> str:
+    end = add_months(month, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF roll "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+    )
+
+
+def convert_roll_table_sql() -> list[str]:
+    """Statements that replace the plain roll table with an empty partitioned one, up to the data copy."""
+    return [
+        "LOCK TABLE roll IN ACCESS EXCLUSIVE MODE",
+        "ALTER TABLE roll RENAME TO roll_unpartitioned",
+        "ALTER TABLE roll_unpartitioned RENAME CONSTRAINT roll_pkey TO roll_unpartitioned_pkey",
+        "DROP INDEX IF EXISTS ix_roll_decision_id_created_at",
+        "DROP INDEX IF EXISTS ix_roll_decision_id_version",
+        "DROP INDEX IF EXISTS uq_roll_decision_id_pending",
+        "CREATE TABLE roll (LIKE roll_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)",
+        "ALTER TABLE roll ADD CONSTRAINT roll_pkey PRIMARY KEY (id, created_at)",
+        "ALTER TABLE roll ADD CONSTRAINT roll_decision_id_fkey FOREIGN KEY (decision_id) REFERENCES decision (id)",
+        "CREATE INDEX ix_roll_decision_id_created_at ON roll (decision_id, created_at)",
+        "CREATE INDEX ix_roll_decision_id_version ON roll (decision_id, version)",
+        "ALTER TABLE rollchoiceweight DROP CONSTRAINT IF EXISTS rollchoiceweight_roll_id_fkey",
+        f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF roll DEFAULT",
+    ]
+
+
+async def is_roll_table_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'roll'::regclass)")
+    )
+    return bool(result.scalar())
+
+
+async def ensure_roll_partitions(conn: AsyncConnection, months_ahead: int, today: date | None = None) -> list[str]:
+    """Create the partitions for this month and the next months_ahead months; return the names created.
+
+    A month is skipped with a warning if rows for it already ended up in the default partition, since
+    PostgreSQL refuses to create a partition whose rows sit in the default one.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    existing = set(
+        (
+            await conn.execute(
+                text(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = 'roll'::regclass"
+                )
+            )
+        ).scalars()
+    )
+    created = []
+    for month in months_between(today, add_months(month_start(today), months_ahead)):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        stranded = await conn.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end)"),
+            {
+                "start": datetime.combine(month, datetime.min.time(), timezone.utc),
+                "end": datetime.combine(add_months(month, 1), datetime.min.time(), timezone.utc),
+            },
+        )
+        if stranded.scalar():
+            logger.warning("Not creating %s: the default partition already holds rolls for that month", name)
+            continue
+        await conn.execute(text(create_partition_sql(month)))
+        created.append(name)
+    return created
+
+
+async def partition_roll_table(conn: AsyncConnection, months_ahead: int) -> None:
+    """Convert the plain roll table into a partitioned one, keeping its rows and id sequence.
+
+    Runs in the caller's transaction and holds an exclusive lock on roll while rows are copied.
+    """
+    for statement in convert_roll_table_sql():
+        await conn.execute(text(statement))
+
+    today = datetime.now(timezone.utc).date()
+    oldest = (await conn.execute(text("SELECT MIN(created_at) FROM roll_unpartitioned"))).scalar()
+    first = oldest.astimezone(timezone.utc).date() if oldest else today
+    for month in months_between(first, add_months(month_start(today), months_ahead)):
+        await conn.execute(text(create_partition_sql(month)))
+
+    await conn.execute(text("INSERT INTO roll SELECT * FROM roll_unpartitioned"))
+    # The id sequence belongs to the old table and would be dropped with it
+    sequence = (await conn.execute(text("SELECT pg_get_serial_sequence('roll_unpartitioned', 'id')"))).scalar()
+    if sequence:
+        await conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY roll.id"))
+    await conn.execute(text("DROP TABLE roll_unpartitioned"))
+
+
+async def prepare_roll_partitions(engine: AsyncEngine, settings: Settings) -> None:
+    """Partition the roll table if enabled and not done yet, then create upcoming partitions."""
+    if not settings.db_partition_rolls or engine.dialect.name != "postgresql":
+        return
+
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+        if not await is_roll_table_partitioned(conn):
+            logger.info("Converting the roll table to monthly partitions")
+            await partition_roll_table(conn, settings.db_roll_partition_months_ahead)
+            return
+        created = await ensure_roll_partitions(conn, settings.db_roll_partition_months_ahead)
+    if created:
+        logger.info("Created roll partitions: %s", ", ".join(created))
+
+
+async def main() -> None:
+    from app.db import close_db, get_engine
+
+    settings = get_settings()
+    engine = get_engine(settings)
+    try:
+        await prepare_roll_partitions(engine, settings)
+    finally:
+        await close_db(engine)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+import functools
+import inspect
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.metrics import current_statement_logs
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryLog:
+    """SQL statements executed while the log was active."""
+
+    statements: list[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        """Statements executed at least `threshold` times, the usual sign of a query inside a loop."""
+        return {statement: n for statement, n in Counter(self.statements).items() if n >= threshold}
+
+    def __enter__(self) -> "QueryLog":
+        # app.metrics records statements into every active log; nested logs all see the same statements
+        self._token = current_statement_logs.set((*current_statement_logs.get(), self.statements))
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        current_statement_logs.reset(self._token)
+
+
+def count_queries() -> QueryLog:
+    """Start a log of the statements executed in the current context; use it as a context manager."""
+    return QueryLog()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget:
+    """Fail if more than `limit` queries run inside the block or decorated (async) function.
+
+    Usable as `with query_budget(3): ...` or as a decorator on test functions.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    def __enter__(self) -> QueryLog:
+        self._log = QueryLog().__enter__()
+        return self._log
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._log.__exit__(exc_type, exc, tb)
+        if exc_type is None and self._log.count > self.limit:
+            raise QueryBudgetExceeded(_describe(self._log, self.limit))
+
+    def __call__(self, func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self:
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def _describe(log: QueryLog, limit: int) -> str:
+    lines = [f"{log.count} queries executed, budget is {limit}:"]
+    lines += [f"  {statement}" for statement in log.statements]
+    return "\n".join(lines)
+
+
+class RepeatedQueryMiddleware:
+    """Development middleware that warns when a request runs the same statement `threshold` times or more."""
+
+    def __init__(self, app: ASGIApp, threshold: int):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as log:
+            await self.app(scope, receive, send)
+
+        for statement, n in log.repeated(self.threshold).items():
+            logger.warning(
+                "%s %s executed the same statement %d times (possible N+1 query): %s",
+                scope["method"],
+                scope["path"],
+                n,
+                " ".join(statement.split()),
+            )
@@ -0,0 +1,20 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+class TrustedJSONResponse(ORJSONResponse):
+    """Encode plain dicts and lists straight to JSON, without response-model validation.
+
+    Return it only with content already shaped like the route's response model, such as the output of
+    services.read_user_decisions. Datetimes are written the way pydantic writes them, with UTC as "Z".
+    """
+
+    def render(self, content: Any) -> bytes:
+        return render_trusted(content)
+
+
+def render_trusted(content: Any) -> bytes:
+    """Encode content the way TrustedJSONResponse does, for bodies built ahead of the response."""
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
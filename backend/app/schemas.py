@@ -39,6 +39,11 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int  # Seconds
+
+
 class UserResponse(BaseModel):
     id: int
     email: EmailStr
@@ -187,3 +192,21 @@ class DecisionWithRollsResponse(BaseModel):
     multi_choice_decision: MultiChoiceDecisionResponse | None = None
     rolls: list[RollResponse] = []
     probability_history: list[ProbabilityHistoryResponse] = []
+    pending_roll: RollResponse | None = None  # The roll awaiting confirmation, if any
+    last_confirmed_at: datetime | None = None  # When the latest confirmed roll was rolled
+    # last_confirmed_at plus the cooldown, for decisions with one; rolling is blocked until then
+    cooldown_ends_at: datetime | None = None
+
+
+class DecisionOrderResponse(BaseModel):
+    id: int
+    display_order: int
+
+
+class DecisionChangesResponse(BaseModel):
+    """Changes to the user's data since a cursor; pass cursor as `since` to get the next ones."""
+
+    cursor: str
+    decisions: list[DecisionWithRollsResponse] = []  # Changed or created decisions, with history but without rolls
+    rolls: list[RollResponse] = []  # Rolls created or confirmed since the cursor
+    deleted_decision_ids: list[int] = []
@@ -0,0 +1,85 @@
+"""Columnar, compressed encoding of archived rolls.
+
+A segment stores one decision's rolls column by column: results and choices are dictionary encoded,
+timestamps and ids as deltas, and the whole thing is zlib-compressed JSON. Timestamps come back with
+the same tzinfo they were encoded with (SQLite hands out naive UTC values, PostgreSQL aware ones).
+"""
+
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import orjson
+
+from app.dto import RollChoiceWeightRow, RollRow
+
+SEGMENT_VERSION = 1
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _micros(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _deltas(values: list[int]) -> list[int]:
+    return [value - previous for previous, value in zip([0, *values], values)]
+
+
+def _undeltas(deltas: list[int]) -> list[int]:
+    values, total = [], 0
+    for delta in deltas:
+        total += delta
+        values.append(total)
+    return values
+
+
+def encode_segment(rolls: list[RollRow]) -> bytes:
+    """Encode rolls, all of the same decision, into segment bytes."""
+    results: dict[str, int] = {}
+    choices: dict[tuple[int, str], int] = {}
+    columns = {
+        "version": SEGMENT_VERSION,
+        "naive": bool(rolls) and rolls[0].created_at.tzinfo is None,
+        "id": _deltas([roll.id for roll in rolls]),
+        "result": [results.setdefault(roll.result, len(results)) for roll in rolls],
+        "results": list(results),
+        "followed": [roll.followed for roll in rolls],
+        "probability": [roll.probability for roll in rolls],
+        "created_at": _deltas([_micros(roll.created_at) for roll in rolls]),
+        "choice_weights": [
+            [[choices.setdefault((w.choice_id, w.choice_name), len(choices)), w.weight] for w in roll.choice_weights]
+            for roll in rolls
+        ],
+        "choices": list(choices),
+    }
+    return zlib.compress(orjson.dumps(columns), 9)
+
+
+def decode_segment(data: bytes, decision_id: int) -> list[RollRow]:
+    columns = orjson.loads(zlib.decompress(data))
+    if columns["version"] != SEGMENT_VERSION:
+        raise ValueError(f"Unsupported roll segment version {columns['version']}")
+
+    tzinfo = None if columns["naive"] else timezone.utc
+    results = columns["results"]
+    choices = columns["choices"]
+    return [
+        RollRow(
+            roll_id,
+            decision_id,
+            results[result],
+            followed,
+            probability,
+            [RollChoiceWeightRow(choices[index][0], choices[index][1], weight) for index, weight in weights],
+            (EPOCH + timedelta(microseconds=micros)).replace(tzinfo=tzinfo),
+        )
+        for roll_id, result, followed, probability, micros, weights in zip(
+            _undeltas(columns["id"]),
+            columns["result"],
+            columns["followed"],
+            columns["probability"],
+            _undeltas(columns["created_at"]),
+            columns["choice_weights"],
+        )
+    ]
@@ -1,279 +1,734 @@
 import secrets
-from datetime import datetime, timedelta, timezone
-from typing import Optional
-
-from sqlmodel import col, select
+from copy import copy
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Optional, Sequence, TypeVar
+
+from sqlalchemy import Update, case, delete, insert, literal, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import col, func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.dto import (
+    BinaryDecisionRow,
+    ChoiceRow,
+    DecisionChangesRow,
+    DecisionRow,
+    MultiChoiceDecisionRow,
+    ProbabilityHistoryRow,
+    RollChoiceWeightRow,
+    RollRow,
+    WeightHistoryRow,
+)
 from app.models import (
     BinaryDecision,
     Choice,
     Decision,
+    DecisionTombstone,
     DecisionType,
     MultiChoiceDecision,
     ProbabilityHistory,
     Roll,
+    RollArchive,
     RollChoiceWeight,
     User,
     WeightHistory,
 )
-from app.schemas import DecisionCreate, DecisionUpdate
+from app.schemas import (
+    BinaryDecisionResponse,
+    ChoiceResponse,
+    DecisionCreate,
+    DecisionResponse,
+    DecisionUpdate,
+    MultiChoiceDecisionResponse,
+    WeightHistoryResponse,
+)
+from app.segments import decode_segment
+
+HistoryT = TypeVar("HistoryT", ProbabilityHistory, WeightHistory)
+
+PENDING_ROLL_ERROR = "You have a pending roll that must be confirmed first"
+
+
+def as_utc(value: datetime) -> datetime:
+    """Attach UTC to the naive timestamps SQLite returns."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def coalesce_target(history: Sequence[HistoryT], now: datetime, window: timedelta) -> HistoryT | None:
+    """The row a new history value should overwrite instead of adding one, if any.
+
+    That is the latest row if it was written less than window ago. history is ordered by id; its first
+    row records the initial value and is never overwritten.
+    """
+    if window <= timedelta(0) or len(history) < 2:
+        return None
+    latest = history[-1]
+    return latest if now - as_utc(latest.changed_at) < window else None
+
+
+def data_version_bump(user_id: int) -> Update:
+    """UPDATE incrementing the user's data version, returning the new value first.
+
+    Every write to a user's decisions or rolls stamps the rows it touches with this version. The UPDATE
+    locks the user's row until commit, so a user's writes commit in version order: once version V is
+    visible, so is every change up to V.
+    """
+    return (
+        update(User)
+        .where(col(User.id) == user_id)
+        .values(data_version=col(User.data_version) + 1)
+        .returning(col(User.data_version))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def bump_data_version(user_id: int, session: AsyncSession) -> int:
+    """Increment the user's data version in the current transaction and return the new value."""
+    result = await session.exec(data_version_bump(user_id))  # type: ignore[call-overload]
+    return result.scalar_one()
+
+
+async def touch_decisions(decision_ids: Sequence[int], session: AsyncSession) -> None:
+    """Bump the data version of the decisions' users and stamp the decisions with it.
+
+    For jobs that change what the API returns for decisions without going through the write paths
+    above, so that delta sync and cached responses pick the change up.
+    """
+    if not decision_ids:
+        return
+    users = select(Decision.user_id).where(col(Decision.id).in_(decision_ids))
+    await session.exec(  # type: ignore[call-overload]
+        update(User)
+        .where(col(User.id).in_(users))
+        .values(data_version=col(User.data_version) + 1)
+        .execution_options(synchronize_session=False)
+    )
+    user_version = select(User.data_version).where(User.id == Decision.user_id).scalar_subquery()
+    await session.exec(  # type: ignore[call-overload]
+        update(Decision)
+        .where(col(Decision.id).in_(decision_ids))
+        .values(version=user_version)
+        .execution_options(synchronize_session=False)
+    )
 
 
-async def create_decision(user: User, decision_data: DecisionCreate, session: AsyncSession) -> Decision:
-    """Create a new decision for a user."""
-    # Get max display_order for user's decisions
-    from sqlmodel import func
+async def read_data_version(user_id: int, session: AsyncSession) -> int:
+    """The user's current data version, read from the database rather than the session."""
+    result = await session.exec(select(User.data_version).where(User.id == user_id))
+    return result.one()
+
 
-    # Check user's decision count limit
-    count_statement = select(func.count(Decision.id)).where(Decision.user_id == user.id)
-    count_result = await session.exec(count_statement)
-    decision_count = count_result.first() or 0
+async def create_decision(user: User, decision_data: DecisionCreate, session: AsyncSession) -> DecisionResponse:
+    """Create a new decision for a user.
+
+    Everything is written in one transaction: choices and their initial weight history go out as
+    multi-row INSERT ... RETURNING statements, and the response is built from the inserted data
+    instead of reloading the decision graph.
+    """
+    # Validate the type-specific payload before writing anything
+    if decision_data.type == DecisionType.BINARY:
+        if not decision_data.binary_data:
+            raise ValueError("Binary decision data is required")
+    elif decision_data.type == DecisionType.MULTI_CHOICE:
+        if not decision_data.multi_choice_data:
+            raise ValueError("Multi-choice decision data is required")
+
+        # Validate weights sum to 100
+        total_weight = sum(choice.weight for choice in decision_data.multi_choice_data.choices)
+        if total_weight != 100:
+            raise ValueError("Choice weights must sum to 100")
+
+    # Bump the data version first: it locks the user's row until commit, so a concurrent create waits
+    # here. The count and max display_order have to be a separate statement after it, which under READ
+    # COMMITTED takes a fresh snapshot that includes whatever the create we waited for committed;
+    # subqueries in the UPDATE itself would still see the snapshot from before the lock.
+    assert user.id is not None
+    version = await bump_data_version(user.id, session)
+    stats_statement = select(func.count(Decision.id), func.max(Decision.display_order)).where(
+        Decision.user_id == user.id
+    )
+    stats_result = await session.exec(stats_statement)
+    decision_count, max_order = stats_result.one()
 
     if decision_count >= 100:
         raise ValueError("Maximum of 100 decisions allowed per user")
 
-    max_order_statement = select(func.max(Decision.display_order)).where(Decision.user_id == user.id)
-    max_order_result = await session.exec(max_order_statement)
-    max_order = max_order_result.first() or 0
-
     # Create the base decision
     decision = Decision(
         user_id=user.id,
         title=decision_data.title,
         type=decision_data.type,
         cooldown_hours=decision_data.cooldown_hours,
-        display_order=max_order + 1,
+        display_order=(max_order or 0) + 1,
+        version=version,
     )
     session.add(decision)
-    await session.commit()
-    await session.refresh(decision)
+    await session.flush()  # Ensure decision.id is available
+    assert decision.id is not None
+
+    response = DecisionResponse(
+        id=decision.id,
+        title=decision.title,
+        type=decision.type,
+        cooldown_hours=decision.cooldown_hours,
+        display_order=decision.display_order,
+        created_at=decision.created_at,
+        updated_at=decision.updated_at,
+    )
 
     # Create type-specific data
-    if decision_data.type == DecisionType.BINARY:
-        if not decision_data.binary_data:
-            raise ValueError("Binary decision data is required")
-
-        binary_decision = BinaryDecision(
-            decision_id=decision.id,
-            probability=decision_data.binary_data.probability,
-            probability_granularity=decision_data.binary_data.probability_granularity,
-            yes_text=decision_data.binary_data.yes_text,
-            no_text=decision_data.binary_data.no_text,
+    if decision_data.binary_data and decision_data.type == DecisionType.BINARY:
+        binary_data = decision_data.binary_data
+        session.add(
+            BinaryDecision(
+                decision_id=decision.id,
+                probability=binary_data.probability,
+                probability_granularity=binary_data.probability_granularity,
+                yes_text=binary_data.yes_text,
+                no_text=binary_data.no_text,
+            )
         )
-        session.add(binary_decision)
 
         # Add initial probability history entry
-        prob_history = ProbabilityHistory(decision_id=decision.id, probability=decision_data.binary_data.probability)
-        session.add(prob_history)
+        session.add(ProbabilityHistory(decision_id=decision.id, probability=binary_data.probability))
 
-    elif decision_data.type == DecisionType.MULTI_CHOICE:
-        if not decision_data.multi_choice_data:
-            raise ValueError("Multi-choice decision data is required")
+        response.binary_decision = BinaryDecisionResponse(
+            probability=binary_data.probability,
+            probability_granularity=binary_data.probability_granularity,
+            yes_text=binary_data.yes_text,
+            no_text=binary_data.no_text,
+        )
+
+    elif decision_data.multi_choice_data and decision_data.type == DecisionType.MULTI_CHOICE:
+        multi_choice_data = decision_data.multi_choice_data
+        session.add(
+            MultiChoiceDecision(decision_id=decision.id, weight_granularity=multi_choice_data.weight_granularity)
+        )
+        await session.flush()
+
+        # Insert all choices at once; display_order maintains creation order and maps rows back to input
+        choices_statement = (
+            insert(Choice)
+            .values(
+                [
+                    {"decision_id": decision.id, "name": choice.name, "weight": choice.weight, "display_order": idx}
+                    for idx, choice in enumerate(multi_choice_data.choices)
+                ]
+            )
+            .returning(col(Choice.id), col(Choice.display_order))
+        )
+        choices_result = await session.exec(choices_statement)  # type: ignore[call-overload]
+        choice_ids = {row.display_order: row.id for row in choices_result.all()}
+
+        # Add initial weight history entries
+        changed_at = datetime.now(timezone.utc)
+        history_statement = (
+            insert(WeightHistory)
+            .values(
+                [
+                    {"choice_id": choice_ids[idx], "weight": choice.weight, "changed_at": changed_at}
+                    for idx, choice in enumerate(multi_choice_data.choices)
+                ]
+            )
+            .returning(col(WeightHistory.id), col(WeightHistory.choice_id))
+        )
+        history_result = await session.exec(history_statement)  # type: ignore[call-overload]
+        history_ids = {row.choice_id: row.id for row in history_result.all()}
+
+        response.multi_choice_decision = MultiChoiceDecisionResponse(
+            weight_granularity=multi_choice_data.weight_granularity,
+            choices=[
+                ChoiceResponse(
+                    id=choice_ids[idx],
+                    name=choice.name,
+                    weight=choice.weight,
+                    display_order=idx,
+                    weight_history=[
+                        WeightHistoryResponse(
+                            id=history_ids[choice_ids[idx]],
+                            choice_id=choice_ids[idx],
+                            weight=choice.weight,
+                            changed_at=changed_at,
+                        )
+                    ],
+                )
+                for idx, choice in enumerate(multi_choice_data.choices)
+            ],
+        )
+
+    await session.commit()
+    return response
 
-        # Validate weights sum to 100
-        total_weight = sum(choice.weight for choice in decision_data.multi_choice_data.choices)
-        if total_weight != 100:
-            raise ValueError("Choice weights must sum to 100")
 
-        multi_choice = MultiChoiceDecision(
-            decision_id=decision.id, weight_granularity=decision_data.multi_choice_data.weight_granularity
+async def get_user_decision(decision_id: int, user: User, session: AsyncSession) -> Optional[Decision]:
+    """Get a decision that belongs to the user without loading any of its relationships."""
+    statement = select(Decision).where(Decision.id == decision_id, Decision.user_id == user.id)
+    result = await session.exec(statement)
+    return result.first()
+
+
+async def select_live_rolls(session: AsyncSession, *criteria: Any) -> list[RollRow]:
+    """Read rolls matching the given criteria from the roll table, in id order, with their choice weights.
+
+    Only the needed columns are selected, and rows are mapped straight into slotted RollRow objects.
+    Criteria must only reference Roll columns.
+    """
+    rolls_result = await session.exec(
+        select(Roll.id, Roll.decision_id, Roll.result, Roll.followed, Roll.probability, Roll.created_at)
+        .where(*criteria)
+        .order_by(col(Roll.id))
+    )
+    rolls = [RollRow(row[0], row[1], row[2], row[3], row[4], [], row[5]) for row in rolls_result.all()]
+    if not rolls:
+        return rolls
+
+    by_id = {roll.id: roll for roll in rolls}
+    weights_result = await session.exec(
+        select(
+            RollChoiceWeight.roll_id, RollChoiceWeight.choice_id, RollChoiceWeight.choice_name, RollChoiceWeight.weight
         )
-        session.add(multi_choice)
+        .join(Roll, col(Roll.id) == col(RollChoiceWeight.roll_id))
+        .where(*criteria)
+        .order_by(col(RollChoiceWeight.id))
+    )
+    for row in weights_result.all():
+        by_id[row[0]].choice_weights.append(RollChoiceWeightRow(row[1], row[2], row[3]))
+    return rolls
 
-        for idx, choice_data in enumerate(decision_data.multi_choice_data.choices):
-            choice = Choice(
-                decision_id=decision.id,
-                name=choice_data.name,
-                weight=choice_data.weight,
-                display_order=idx,  # Maintain creation order
+
+async def read_rolls(decision_ids: Any, session: AsyncSession) -> list[RollRow]:
+    """Read all rolls of the given decisions in id order, live and archived, with the choice weights used.
+
+    decision_ids is anything usable in an IN clause, typically a scalar subquery.
+    """
+    rolls = await select_live_rolls(session, col(Roll.decision_id).in_(decision_ids))
+
+    archives_result = await session.exec(
+        select(RollArchive.decision_id, RollArchive.data).where(col(RollArchive.decision_id).in_(decision_ids))
+    )
+    archived = [roll for row in archives_result.all() for roll in decode_segment(row[1], row[0])]
+    if archived:
+        rolls = sorted(rolls + archived, key=lambda roll: roll.id)
+    return rolls
+
+
+async def read_roll_states(decisions: dict[int, DecisionRow], session: AsyncSession) -> None:
+    """Set pending_roll, last_confirmed_at and cooldown_ends_at on the decisions, whose ids key the dict.
+
+    One query reads, per decision, the id of its pending roll, when its latest live confirmed roll was
+    created and the month of its latest archive, each from a correlated subquery served by a roll index.
+    Pending rolls are then read by id. Only decisions whose confirmed rolls have all been archived need
+    a segment decoded.
+    """
+    pending_id = (
+        select(Roll.id).where(Roll.decision_id == Decision.id, col(Roll.followed).is_(None)).limit(1).scalar_subquery()
+    )
+    last_confirmed_at = (
+        select(func.max(Roll.created_at))
+        .where(Roll.decision_id == Decision.id, col(Roll.followed).is_not(None))
+        .scalar_subquery()
+    )
+    last_archived_month = select(func.max(RollArchive.month)).where(RollArchive.decision_id == Decision.id)
+    states_result = await session.exec(
+        select(Decision.id, pending_id, last_confirmed_at, last_archived_month.scalar_subquery()).where(
+            col(Decision.id).in_(list(decisions))
+        )
+    )
+    pending_ids = []
+    archived: dict[int, date] = {}
+    for decision_id, roll_id, confirmed_at, archived_month in states_result.all():
+        if roll_id is not None:
+            pending_ids.append(roll_id)
+        if confirmed_at is not None:
+            decisions[decision_id].last_confirmed_at = confirmed_at
+        elif archived_month is not None:
+            archived[decision_id] = archived_month
+
+    if pending_ids:
+        for roll in await select_live_rolls(session, col(Roll.id).in_(pending_ids)):
+            decisions[roll.decision_id].pending_roll = roll
+
+    if archived:
+        archives_result = await session.exec(
+            select(RollArchive.decision_id, RollArchive.data).where(
+                tuple_(col(RollArchive.decision_id), col(RollArchive.month)).in_(list(archived.items()))
+            )
+        )
+        for decision_id, data in archives_result.all():
+            decisions[decision_id].last_confirmed_at = max(
+                roll.created_at for roll in decode_segment(data, decision_id)
             )
-            session.add(choice)
-            await session.flush()  # Ensure choice.id is available
 
-            # Add initial weight history entry
-            weight_history = WeightHistory(choice_id=choice.id, weight=choice_data.weight)
-            session.add(weight_history)
+    for decision in decisions.values():
+        if decision.cooldown_hours and decision.last_confirmed_at is not None:
+            decision.cooldown_ends_at = decision.last_confirmed_at + timedelta(hours=decision.cooldown_hours)
 
-    await session.commit()
 
-    # Reload with relationships
-    from sqlalchemy.orm import selectinload
+async def read_user_decisions(user: User, session: AsyncSession, decision_id: int | None = None) -> list[DecisionRow]:
+    """Read a user's decisions with rolls and history as slotted rows shaped like DecisionWithRollsResponse.
 
-    statement = (
-        select(Decision)
-        .where(Decision.id == decision.id)
-        .options(
-            selectinload(Decision.binary_decision),
-            selectinload(Decision.multi_choice_decision)
-            .selectinload(MultiChoiceDecision.choices)
-            .selectinload(Choice.weight_history),
-            selectinload(Decision.rolls).selectinload(Roll.choice_weights),
-            selectinload(Decision.probability_history),
-        )
+    Selects columns with one Core query per table instead of loading the ORM graph, and the result is
+    meant to be encoded as-is without response-model validation. Pass decision_id to read a single
+    decision. tests/test_serialization.py keeps the encoded rows in sync with the schema.
+    """
+    decision_filter = [col(Decision.user_id) == user.id]
+    if decision_id is not None:
+        decision_filter.append(col(Decision.id) == decision_id)
+    return await read_decisions(session, decision_filter)
+
+
+async def read_export_decisions(user: User, session: AsyncSession) -> list[DecisionRow]:
+    """Read a user's decisions for the data export: with rolls, without the computed roll states.
+
+    Ordered by display_order, then by creation, as the export always has been.
+    """
+    return await read_decisions(
+        session,
+        [col(Decision.user_id) == user.id],
+        include_roll_states=False,
+        order_by=(col(Decision.display_order).asc(), col(Decision.id).asc()),
     )
-    result = await session.exec(statement)
-    return result.one()
 
 
-async def get_user_decisions(user: User, session: AsyncSession) -> list[Decision]:
-    """Get all decisions for a user."""
-    from sqlalchemy.orm import selectinload
+async def read_decisions(
+    session: AsyncSession,
+    decision_filter: list[Any],
+    include_rolls: bool = True,
+    include_roll_states: bool = True,
+    order_by: Sequence[Any] = (col(Decision.display_order).asc(), col(Decision.created_at).desc()),
+) -> list[DecisionRow]:
+    """Read the decisions matching decision_filter the way read_user_decisions does.
+
+    Optionally without rolls or without the pending roll and cooldown read by read_roll_states.
+    """
+    decision_ids = select(Decision.id).where(*decision_filter).scalar_subquery()
+
+    decisions_result = await session.exec(
+        select(
+            Decision.id,
+            Decision.title,
+            Decision.type,
+            Decision.cooldown_hours,
+            Decision.display_order,
+            Decision.created_at,
+            Decision.updated_at,
+        )
+        .where(*decision_filter)
+        .order_by(*order_by)
+    )
+    decisions = {row[0]: DecisionRow(*row) for row in decisions_result.all()}
+    if not decisions:
+        return []
+
+    binary_result = await session.exec(
+        select(
+            BinaryDecision.decision_id,
+            BinaryDecision.probability,
+            BinaryDecision.probability_granularity,
+            BinaryDecision.yes_text,
+            BinaryDecision.no_text,
+        ).where(col(BinaryDecision.decision_id).in_(decision_ids))
+    )
+    for row in binary_result.all():
+        decisions[row[0]].binary_decision = BinaryDecisionRow(row[1], row[2], row[3], row[4])
 
-    statement = (
-        select(Decision)
-        .where(Decision.user_id == user.id)
-        .options(
-            selectinload(Decision.binary_decision),
-            selectinload(Decision.multi_choice_decision)
-            .selectinload(MultiChoiceDecision.choices)
-            .selectinload(Choice.weight_history),
-            selectinload(Decision.rolls).selectinload(Roll.choice_weights),
-            selectinload(Decision.probability_history),
+    multi_result = await session.exec(
+        select(MultiChoiceDecision.decision_id, MultiChoiceDecision.weight_granularity).where(
+            col(MultiChoiceDecision.decision_id).in_(decision_ids)
         )
-        .order_by(col(Decision.display_order).asc(), col(Decision.created_at).desc())
     )
-    result = await session.exec(statement)
-    return list(result.all())
+    multi_choice: dict[int, MultiChoiceDecisionRow] = {}
+    for row in multi_result.all():
+        multi_choice[row[0]] = decisions[row[0]].multi_choice_decision = MultiChoiceDecisionRow([], row[1])
+
+    choices: dict[int, ChoiceRow] = {}
+    if multi_choice:
+        choices_result = await session.exec(
+            select(Choice.id, Choice.decision_id, Choice.name, Choice.weight, Choice.display_order)
+            .where(col(Choice.decision_id).in_(decision_ids))
+            .order_by(col(Choice.id))
+        )
+        for row in choices_result.all():
+            choices[row[0]] = ChoiceRow(row[0], row[2], row[3], row[4])
+            multi_choice[row[1]].choices.append(choices[row[0]])
+
+    if choices:
+        weight_history_result = await session.exec(
+            select(WeightHistory.id, WeightHistory.choice_id, WeightHistory.weight, WeightHistory.changed_at)
+            .join(Choice, col(Choice.id) == col(WeightHistory.choice_id))
+            .where(col(Choice.decision_id).in_(decision_ids))
+            .order_by(col(WeightHistory.id))
+        )
+        for row in weight_history_result.all():
+            choices[row[1]].weight_history.append(WeightHistoryRow(*row))
+
+    if include_rolls:
+        for roll in await read_rolls(decision_ids, session):
+            decisions[roll.decision_id].rolls.append(roll)
+    if include_roll_states:
+        await read_roll_states(decisions, session)
+
+    history_result = await session.exec(
+        select(
+            ProbabilityHistory.id,
+            ProbabilityHistory.decision_id,
+            ProbabilityHistory.probability,
+            ProbabilityHistory.changed_at,
+        )
+        .where(col(ProbabilityHistory.decision_id).in_(decision_ids))
+        .order_by(col(ProbabilityHistory.id))
+    )
+    for row in history_result.all():
+        decisions[row[1]].probability_history.append(ProbabilityHistoryRow(*row))
+
+    return list(decisions.values())
+
+
+async def read_decision_changes(user: User, cursor: str, session: AsyncSession) -> DecisionChangesRow:
+    """Read what changed in the user's data after cursor, shaped like DecisionChangesResponse.
+
+    Changed decisions come with their type data, choices and full history but without rolls; rolls
+    created or confirmed since the cursor are listed separately. Everything is capped at the version
+    read first, which becomes the new cursor, so a write committing during the read shows up in the
+    next call instead of half in this one. Raises ValueError for a cursor this user's data never had.
+    """
+    assert user.id is not None
+    try:
+        since = int(cursor)
+    except ValueError:
+        raise ValueError("Invalid cursor") from None
+    version = await read_data_version(user.id, session)
+    if not 0 <= since <= version:
+        raise ValueError("Invalid cursor")
+    changes = DecisionChangesRow(str(version), [], [], [])
+    if since == version:
+        return changes
+
+    changes.decisions = await read_decisions(
+        session,
+        [col(Decision.user_id) == user.id, col(Decision.version) > since, col(Decision.version) <= version],
+        include_rolls=False,
+    )
+    changes.rolls = await select_live_rolls(
+        session,
+        col(Roll.decision_id).in_(select(Decision.id).where(Decision.user_id == user.id).scalar_subquery()),
+        col(Roll.version) > since,
+        col(Roll.version) <= version,
+    )
+    deleted_result = await session.exec(
+        select(DecisionTombstone.decision_id)
+        .where(
+            DecisionTombstone.user_id == user.id,
+            col(DecisionTombstone.version) > since,
+            col(DecisionTombstone.version) <= version,
+        )
+        .order_by(col(DecisionTombstone.version))
+    )
+    changes.deleted_decision_ids = list(deleted_result.all())
+    return changes
 
 
-async def get_decision_by_id(decision_id: int, user: User, session: AsyncSession) -> Optional[Decision]:
-    """Get a specific decision by ID, ensuring it belongs to the user."""
-    from sqlalchemy.orm import selectinload
+async def get_decision_for_update(decision_id: int, user: User, session: AsyncSession) -> Optional[Decision]:
+    """Get a decision with everything update_decision needs, but without its rolls or probability history.
 
+    The one-to-one type rows are joined into the decision query; only choices and their history need
+    queries of their own.
+    """
     statement = (
         select(Decision)
         .where(Decision.id == decision_id, Decision.user_id == user.id)
         .options(
-            selectinload(Decision.binary_decision),
-            selectinload(Decision.multi_choice_decision)
+            joinedload(Decision.binary_decision),
+            joinedload(Decision.multi_choice_decision)
             .selectinload(MultiChoiceDecision.choices)
             .selectinload(Choice.weight_history),
-            selectinload(Decision.rolls).selectinload(Roll.choice_weights),
-            selectinload(Decision.probability_history),
         )
     )
     result = await session.exec(statement)
     return result.first()
 
 
-async def update_decision(decision: Decision, update_data: DecisionUpdate, session: AsyncSession) -> Decision:
-    """Update a decision."""
-    if update_data.title is not None:
-        decision.title = update_data.title
-
-    if update_data.cooldown_hours is not None:
-        decision.cooldown_hours = update_data.cooldown_hours
-
-    if update_data.display_order is not None:
-        decision.display_order = update_data.display_order
-
-    # For binary decisions, update probability and text
-    if decision.type == DecisionType.BINARY:
-        # Get current binary decision
-        binary_statement = select(BinaryDecision).where(BinaryDecision.decision_id == decision.id)
-        binary_result = await session.exec(binary_statement)
-        binary_decision = binary_result.first()
-
-        if binary_decision:
-            # Update probability if provided
-            if update_data.probability is not None and binary_decision.probability != update_data.probability:
-                binary_decision.probability = update_data.probability
-
-                # Record probability change in history
-                prob_history = ProbabilityHistory(decision_id=decision.id, probability=update_data.probability)
-                session.add(prob_history)
-
-            # Update probability granularity if provided
-            if update_data.probability_granularity is not None:
-                binary_decision.probability_granularity = update_data.probability_granularity
-
-            # Update yes/no text if provided
-            if update_data.yes_text is not None:
-                binary_decision.yes_text = update_data.yes_text
-            if update_data.no_text is not None:
-                binary_decision.no_text = update_data.no_text
-
-    # For multi-choice decisions, update choice weights and granularity
-    elif decision.type == DecisionType.MULTI_CHOICE:
-        # Get current multi-choice decision
-        multi_statement = select(MultiChoiceDecision).where(MultiChoiceDecision.decision_id == decision.id)
-        multi_result = await session.exec(multi_statement)
-        multi_choice_decision = multi_result.first()
-
-        if multi_choice_decision:
-            # Update weight granularity if provided
-            if update_data.weight_granularity is not None:
-                multi_choice_decision.weight_granularity = update_data.weight_granularity
+async def update_decision(
+    decision: Decision,
+    update_data: DecisionUpdate,
+    session: AsyncSession,
+    coalesce_window: timedelta = timedelta(0),
+) -> DecisionResponse:
+    """Update a decision loaded by get_decision_for_update.
+
+    Works on the already loaded type row and choices, only records history for values that actually
+    changed (weight history in one multi-row insert), and builds the response from the updated graph.
+    A value that changes again within coalesce_window of its latest history row overwrites that row,
+    so slider drags leave one history entry instead of dozens.
+    """
+    # For multi-choice decisions, validate all choice updates before changing anything
+    current_choices: dict[int | None, Choice] = {}
+    if decision.type == DecisionType.MULTI_CHOICE and decision.multi_choice_decision:
+        current_choices = {choice.id: choice for choice in decision.multi_choice_decision.choices}
 
-        # Update choice weights if provided
         if update_data.choices is not None:
             # Validate that all choices sum to 100
             total_weight = sum(choice.weight for choice in update_data.choices)
             if abs(total_weight - 100) > 0.01:  # Allow small floating point errors
                 raise ValueError(f"Choice weights must sum to 100, got {total_weight}")
 
-            # Get current choices
-            choices_statement = select(Choice).where(Choice.decision_id == decision.id).order_by(Choice.display_order)
-            choices_result = await session.exec(choices_statement)
-            current_choices = {choice.id: choice for choice in choices_result.all()}
+        for choice_update in [*(update_data.choices or []), *(update_data.multi_choice_names or [])]:
+            if choice_update.id not in current_choices:
+                raise ValueError(f"Choice with id {choice_update.id} not found")
 
-            # Update weights and track history
-            for choice_update in update_data.choices:
-                choice_id = choice_update.id
-                new_weight = choice_update.weight
+    decision.version = await bump_data_version(decision.user_id, session)
 
-                if choice_id not in current_choices:
-                    raise ValueError(f"Choice with id {choice_id} not found")
+    if update_data.title is not None:
+        decision.title = update_data.title
 
-                choice = current_choices[choice_id]
-                if abs(choice.weight - new_weight) > 0.001:  # Only update if changed
-                    choice.weight = new_weight
+    if update_data.cooldown_hours is not None:
+        decision.cooldown_hours = update_data.cooldown_hours
 
-                    # Record weight change in history
-                    weight_history = WeightHistory(choice_id=choice.id, weight=new_weight)
-                    session.add(weight_history)
+    if update_data.display_order is not None:
+        decision.display_order = update_data.display_order
 
-        # Update choice names if provided
-        if update_data.multi_choice_names is not None:
-            # Get current choices if not already loaded
-            if update_data.choices is None:
-                choices_statement = (
-                    select(Choice).where(Choice.decision_id == decision.id).order_by(Choice.display_order)
-                )
-                choices_result = await session.exec(choices_statement)
-                current_choices = {choice.id: choice for choice in choices_result.all()}
+    # Weight changes that need a history entry, as (choice, new weight)
+    changed_weights: list[tuple[Choice, float]] = []
+    now = datetime.now(timezone.utc)
+
+    # For binary decisions, update probability and text
+    binary_decision = decision.binary_decision
+    if decision.type == DecisionType.BINARY and binary_decision:
+        # Update probability if provided
+        if update_data.probability is not None and binary_decision.probability != update_data.probability:
+            binary_decision.probability = update_data.probability
+
+            # Record probability change in history
+            history_result = await session.exec(
+                select(ProbabilityHistory)
+                .where(ProbabilityHistory.decision_id == decision.id)
+                .order_by(col(ProbabilityHistory.id).desc())
+                .limit(2)
+            )
+            latest = coalesce_target(list(reversed(history_result.all())), now, coalesce_window)
+            if latest:
+                latest.probability = update_data.probability
+                latest.changed_at = now
+            else:
+                session.add(ProbabilityHistory(decision_id=decision.id, probability=update_data.probability))
+
+        # Update probability granularity if provided
+        if update_data.probability_granularity is not None:
+            binary_decision.probability_granularity = update_data.probability_granularity
+
+        # Update yes/no text if provided
+        if update_data.yes_text is not None:
+            binary_decision.yes_text = update_data.yes_text
+        if update_data.no_text is not None:
+            binary_decision.no_text = update_data.no_text
+
+    # For multi-choice decisions, update choice weights, names and granularity
+    multi_choice_decision = decision.multi_choice_decision
+    if decision.type == DecisionType.MULTI_CHOICE and multi_choice_decision:
+        # Update weight granularity if provided
+        if update_data.weight_granularity is not None:
+            multi_choice_decision.weight_granularity = update_data.weight_granularity
+
+        for choice_update in update_data.choices or []:
+            choice = current_choices[choice_update.id]
+            if abs(choice.weight - choice_update.weight) > 0.001:  # Only update if changed
+                choice.weight = choice_update.weight
+                history = sorted(choice.weight_history, key=lambda entry: entry.id or 0)
+                latest = coalesce_target(history, now, coalesce_window)
+                if latest:
+                    latest.weight = choice_update.weight
+                    latest.changed_at = now
+                else:
+                    changed_weights.append((choice, choice_update.weight))
+
+        for name_update in update_data.multi_choice_names or []:
+            current_choices[name_update.id].name = name_update.name
+
+    # Record all weight changes in history with a single insert
+    new_history: list[WeightHistoryResponse] = []
+    if changed_weights:
+        history_statement = (
+            insert(WeightHistory)
+            .values(
+                [{"choice_id": choice.id, "weight": weight, "changed_at": now} for choice, weight in changed_weights]
+            )
+            .returning(col(WeightHistory.id), col(WeightHistory.choice_id), col(WeightHistory.weight))
+        )
+        history_result = await session.exec(history_statement)  # type: ignore[call-overload]
+        new_history = [
+            WeightHistoryResponse(id=row.id, choice_id=row.choice_id, weight=row.weight, changed_at=now)
+            for row in history_result.all()
+        ]
 
-            # Update names
-            for name_update in update_data.multi_choice_names:
-                choice_id = name_update.id
-                new_name = name_update.name
+    await session.commit()
 
-                if choice_id not in current_choices:
-                    raise ValueError(f"Choice with id {choice_id} not found")
+    response = DecisionResponse.model_validate(decision, from_attributes=True)
+    if new_history and response.multi_choice_decision:
+        for choice_response in response.multi_choice_decision.choices:
+            choice_response.weight_history.extend(h for h in new_history if h.choice_id == choice_response.id)
+        # The loaded collections no longer include the new rows; reload them on next access
+        for choice, _ in changed_weights:
+            session.expire(choice, ["weight_history"])
 
-                choice = current_choices[choice_id]
-                choice.name = new_name
+    return response
 
-    await session.commit()
 
-    # Reload with relationships
-    from sqlalchemy.orm import selectinload
+async def reorder_user_decisions(user: User, orders: dict[int, int], session: AsyncSession) -> list[tuple[int, int]]:
+    """Apply new display orders to a user's decisions in a single UPDATE.
 
+    Returns the (id, display_order) pairs that were updated. Raises ValueError if any of the given
+    decisions does not exist or does not belong to the user, in which case nothing is changed.
+    """
+    if not orders:
+        return []
+
+    assert user.id is not None
+    version = await bump_data_version(user.id, session)
     statement = (
-        select(Decision)
-        .where(Decision.id == decision.id)
-        .options(
-            selectinload(Decision.binary_decision),
-            selectinload(Decision.multi_choice_decision)
-            .selectinload(MultiChoiceDecision.choices)
-            .selectinload(Choice.weight_history),
-            selectinload(Decision.rolls).selectinload(Roll.choice_weights),
-            selectinload(Decision.probability_history),
-        )
+        update(Decision)
+        .where(col(Decision.user_id) == user.id, col(Decision.id).in_(orders.keys()))
+        .values(display_order=case(orders, value=col(Decision.id)), version=version)
+        .returning(col(Decision.id), col(Decision.display_order))
+        .execution_options(synchronize_session="fetch")
     )
-    result = await session.exec(statement)
-    return result.one()
+    result = await session.exec(statement)  # type: ignore[call-overload]
+    updated = [(row.id, row.display_order) for row in result.all()]
+
+    missing = orders.keys() - {decision_id for decision_id, _ in updated}
+    if missing:
+        await session.rollback()
+        raise ValueError(f"Decision {min(missing)} not found")
+
+    await session.commit()
+    return sorted(updated, key=lambda pair: pair[1])
+
+
+async def delete_decision(decision: Decision, session: AsyncSession) -> None:
+    """Delete a decision and everything recorded for it, leaving a tombstone for /decisions/changes.
+
+    The dependent rows are deleted with one statement per table instead of being loaded for the ORM to
+    cascade, so a decision with a long roll history doesn't have to be read to be deleted.
+    """
+    assert decision.id is not None
+    version = await bump_data_version(decision.user_id, session)
+    session.add(DecisionTombstone(user_id=decision.user_id, decision_id=decision.id, version=version))
+    roll_ids = select(Roll.id).where(Roll.decision_id == decision.id)
+    choice_ids = select(Choice.id).where(Choice.decision_id == decision.id)
+    for statement in (
+        delete(RollChoiceWeight).where(col(RollChoiceWeight.roll_id).in_(roll_ids)),
+        delete(Roll).where(col(Roll.decision_id) == decision.id),
+        delete(RollArchive).where(col(RollArchive.decision_id) == decision.id),
+        delete(ProbabilityHistory).where(col(ProbabilityHistory.decision_id) == decision.id),
+        delete(WeightHistory).where(col(WeightHistory.choice_id).in_(choice_ids)),
+        delete(Choice).where(col(Choice.decision_id) == decision.id),
+        delete(MultiChoiceDecision).where(col(MultiChoiceDecision.decision_id) == decision.id),
+        delete(BinaryDecision).where(col(BinaryDecision.decision_id) == decision.id),
+        delete(Decision).where(col(Decision.id) == decision.id),
+    ):
+        await session.exec(statement.execution_options(synchronize_session=False))  # type: ignore[call-overload]
+    await session.commit()
 
 
 def roll_binary_decision(probability: float) -> str:
@@ -308,20 +763,39 @@ def roll_multi_choice_decision(choices: list[Choice]) -> str:
     return choices[-1].name
 
 
-async def roll_decision(decision: Decision, session: AsyncSession, roll_request=None) -> Roll:
-    """Roll a decision and create a roll record."""
-    from sqlmodel import func
+async def insert_pending_roll(session: AsyncSession, **values: Any) -> int | None:
+    """Insert a pending roll unless its decision already has one; return the new roll's id, or None if it has.
+
+    The check and the write are one INSERT ... SELECT ... WHERE NOT EXISTS (pending roll) ON CONFLICT DO
+    NOTHING RETURNING id. A concurrent roll of the same decision that the NOT EXISTS can't see yet hits
+    the unique index on pending rolls instead, so only one of them is inserted.
+    """
+    insert_ = postgresql_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+    columns = Roll.__table__.c  # type: ignore[attr-defined]
+    pending = select(Roll.id).where(Roll.decision_id == values["decision_id"], col(Roll.followed).is_(None))
+    row = select(*(literal(value, columns[name].type) for name, value in values.items())).where(~pending.exists())
+    statement = insert_(Roll).from_select(list(values), row).on_conflict_do_nothing().returning(Roll.id)
+    result = await session.exec(statement)  # type: ignore[call-overload]
+    return result.scalar_one_or_none()
 
-    from app.schemas import RollRequest
 
+async def roll_decision(decision: Decision, session: AsyncSession, roll_request=None) -> Roll:
+    """Roll a decision and create a roll record, leaving the commit to the caller."""
     # Check user's total roll count limit
     roll_count_statement = select(func.count(Roll.id)).join(Decision).where(Decision.user_id == decision.user_id)
     roll_count_result = await session.exec(roll_count_statement)
-    roll_count = roll_count_result.first() or 0
+    archived_count_statement = (
+        select(func.sum(RollArchive.roll_count)).join(Decision).where(Decision.user_id == decision.user_id)
+    )
+    archived_count_result = await session.exec(archived_count_statement)
+    roll_count = (roll_count_result.first() or 0) + (archived_count_result.first() or 0)
 
     if roll_count >= 1_000_000:
         raise ValueError("Maximum of 1 million rolls allowed per user")
 
+    version = await bump_data_version(decision.user_id, session)
+    roll_values = {"decision_id": decision.id, "version": version, "created_at": datetime.now(timezone.utc)}
+
     if decision.type == DecisionType.BINARY:
         # Get binary decision data
         binary_statement = select(BinaryDecision).where(BinaryDecision.decision_id == decision.id)
@@ -340,7 +814,9 @@ async def roll_decision(decision: Decision, session: AsyncSession, roll_request=
         result = roll_binary_decision(probability)
 
         # Create roll record with the probability used
-        roll = Roll(decision_id=decision.id, result=result, probability=probability)
+        roll_id = await insert_pending_roll(session, **roll_values, result=result, probability=probability)
+        if roll_id is None:
+            raise ValueError(PENDING_ROLL_ERROR)
 
     elif decision.type == DecisionType.MULTI_CHOICE:
         # Get choices ordered by display_order
@@ -381,8 +857,6 @@ async def roll_decision(decision: Decision, session: AsyncSession, roll_request=
                 raise ValueError(f"Weights must sum to 100, got {total_weight}")
 
             # Create temporary choice objects with updated weights for rolling
-            from copy import copy
-
             roll_choices = []
             for choice in choices:
                 temp_choice = copy(choice)
@@ -394,16 +868,14 @@ async def roll_decision(decision: Decision, session: AsyncSession, roll_request=
         result = roll_multi_choice_decision(roll_choices)
 
         # Create roll record
-        roll = Roll(decision_id=decision.id, result=result)
-        session.add(roll)
-        await session.flush()  # Get the roll ID before creating weight records
+        roll_id = await insert_pending_roll(session, **roll_values, result=result)
+        if roll_id is None:
+            raise ValueError(PENDING_ROLL_ERROR)
 
         # Create weight records for each choice with the weights used for rolling
         for choice in roll_choices:
-            from app.models import RollChoiceWeight
-
             weight_record = RollChoiceWeight(
-                roll_id=roll.id,
+                roll_id=roll_id,
                 choice_id=choice.id,
                 choice_name=choice.name,  # Store name directly
                 weight=choice.weight,
@@ -413,19 +885,14 @@ async def roll_decision(decision: Decision, session: AsyncSession, roll_request=
     else:
         raise ValueError(f"Unknown decision type: {decision.type}")
 
-    if decision.type == DecisionType.BINARY:
-        session.add(roll)
-
-    await session.commit()
+    # The decision's pending_roll changed, so delta sync has to send it again
+    decision.version = version
+    await session.flush()
 
     # Reload roll with relationships
-    from sqlalchemy.orm import selectinload
-
-    statement = select(Roll).where(Roll.id == roll.id).options(selectinload(Roll.choice_weights))
+    statement = select(Roll).where(Roll.id == roll_id).options(selectinload(Roll.choice_weights))
     result = await session.exec(statement)
-    roll = result.first()
-
-    return roll
+    return result.one()
 
 
 async def confirm_roll(
@@ -433,7 +900,7 @@ async def confirm_roll(
     followed: bool,
     session: AsyncSession,
 ) -> Roll:
-    """Confirm whether the user followed through on a roll."""
+    """Confirm whether the user followed through on a roll, leaving the commit to the caller."""
     if roll.followed is not None:
         raise ValueError("Roll already confirmed")
 
@@ -447,6 +914,9 @@ async def confirm_roll(
     if not decision:
         raise ValueError("Decision not found")
 
+    # Confirming changes the decision's pending roll and cooldown whether or not it was followed
+    roll.version = decision.version = await bump_data_version(decision.user_id, session)
+
     # If user followed through, update the decision's weights to match what was used
     if followed:
         if decision.type == DecisionType.BINARY and roll.probability is not None:
@@ -475,8 +945,7 @@ async def confirm_roll(
                     if choice.id in roll_weights:
                         choice.weight = roll_weights[choice.id]
 
-    await session.commit()
-    await session.refresh(roll)
+    await session.flush()
     return roll
 
 
@@ -492,14 +961,21 @@ async def get_pending_roll(decision_id: int, user: User, session: AsyncSession)
     return result.first()
 
 
-async def get_last_confirmed_roll(decision_id: int, user: User, session: AsyncSession) -> Optional[Roll]:
-    """Get the most recent confirmed roll for a decision."""
+async def get_last_confirmed_roll(
+    decision_id: int, user: User, session: AsyncSession, since: datetime | None = None
+) -> Optional[Roll]:
+    """Get the most recent confirmed roll for a decision, optionally only one created at or after since.
+
+    Passing since lets PostgreSQL skip roll partitions older than it.
+    """
     statement = (
         select(Roll)
         .join(Decision)
         .where(Roll.decision_id == decision_id, Decision.user_id == user.id, col(Roll.followed).is_not(None))
         .order_by(col(Roll.created_at).desc())
     )
+    if since is not None:
+        statement = statement.where(col(Roll.created_at) >= since)
     result = await session.exec(statement)
     return result.first()
 
@@ -509,20 +985,38 @@ async def check_cooldown(decision: Decision, user: User, session: AsyncSession)
     if decision.cooldown_hours == 0:
         return False, None
 
-    # Get the last confirmed roll
+    # Get the last confirmed roll; only rolls within the cooldown window can still block a new one
     if decision.id is None:
         return False, None
-    last_roll = await get_last_confirmed_roll(decision.id, user, session)
+    now = datetime.now(timezone.utc)
+    cooldown = timedelta(hours=decision.cooldown_hours)
+    last_roll = await get_last_confirmed_roll(decision.id, user, session, since=now - cooldown)
     if not last_roll:
-        # No previous rolls, not on cooldown
+        # No recent rolls, not on cooldown
         return False, None
 
     # Calculate when cooldown ends
-    cooldown_ends_at = last_roll.created_at + timedelta(hours=decision.cooldown_hours)
+    cooldown_ends_at = as_utc(last_roll.created_at) + cooldown
 
     # Check if we're still in cooldown
-    now = datetime.now(timezone.utc)
     if now < cooldown_ends_at:
         return True, cooldown_ends_at
 
     return False, None
+
+
+async def get_cooldown_ends(user: User, session: AsyncSession, now: Optional[datetime] = None) -> dict[int, datetime]:
+    """When each of the user's decisions that is currently on cooldown comes off it, in one query."""
+    now = now or datetime.now(timezone.utc)
+    result = await session.exec(
+        select(Decision.id, Decision.cooldown_hours, func.max(Roll.created_at))
+        .join(Roll, col(Roll.decision_id) == col(Decision.id))
+        .where(Decision.user_id == user.id, col(Decision.cooldown_hours) > 0, col(Roll.followed).is_not(None))
+        .group_by(col(Decision.id), col(Decision.cooldown_hours))
+    )
+    cooldown_ends = {}
+    for decision_id, cooldown_hours, last_rolled_at in result.all():
+        ends_at = as_utc(last_rolled_at) + timedelta(hours=cooldown_hours)
+        if ends_at > now:
+            cooldown_ends[decision_id] = ends_at
+    return cooldown_ends
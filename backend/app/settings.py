@@ -1,11 +1,66 @@
+import logging
+import signal
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from pydantic import ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+logger = logging.getLogger(__name__)
+
 
 class Settings(BaseSettings):
     sqlalchemy_echo: bool
     db_auto_create: bool
 
     database_url: str
+    # Read replica for read-only endpoints; clients read from the primary for a while after writing
+    read_database_url: str | None = None
+    read_after_write_pin_seconds: float = 5
+
+    # Connection pool settings (ignored for SQLite)
+    db_pool_size: int = 5
+    db_pool_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 30
+    db_pool_recycle_seconds: int = 1800  # -1 disables recycling
+    db_pool_pre_ping: bool = True  # Costs one round trip per checkout
+    db_statement_cache_size: int = 100  # asyncpg prepared statement cache per connection, 0 disables
+    # Total connection budget shared by all workers; when set, overrides db_pool_size/db_pool_max_overflow
+    db_max_connections: int | None = None
+    web_concurrency: int = 1  # Number of worker processes, as passed to uvicorn --workers
+    # Log a warning when one request runs the same statement this many times (dev only, 0 disables)
+    query_repeat_warning_threshold: int = 0
+    # Partition the roll table by month (PostgreSQL only, converts the table on startup)
+    db_partition_rolls: bool = False
+    db_roll_partition_months_ahead: int = 3
+    # Confirmed rolls from months that ended longer ago than this are compressed by app.archive
+    roll_archive_after_days: int = 365
+    # Opt-in: a probability or weight change this soon after the previous one overwrites its history entry
+    # instead of adding one (0 keeps every change)
+    history_coalesce_seconds: float = 0
+
+    # Shared cache: Redis-protocol server URL, or None for a per-process LRU cache of cache_max_entries
+    # entries and cache_max_bytes of values
+    cache_url: str | None = None
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 64 * 1024 * 1024
+    # Lifetime of cached decision list and detail responses (0 disables caching them)
+    response_cache_ttl_seconds: float = 3600
+    # How long responses to requests with an Idempotency-Key are kept for replaying (0 disables)
+    idempotency_ttl_seconds: float = 86400
+    # /api/v1/stats counts are recounted in the background this often, plus up to stats_refresh_jitter of it
+    stats_refresh_seconds: float = 600
+    stats_refresh_jitter: float = 0.1
+    # Relay /api/v1/events between workers through PostgreSQL LISTEN/NOTIFY
+    events_postgres_bridge: bool = False
+    events_keepalive_seconds: float = 15
+    # Lifetime of the tickets EventSource clients pass as /api/v1/events?ticket=
+    events_ticket_seconds: int = 60
+    # Responses smaller than this go out uncompressed, and so does everything while more than
+    # compression_max_in_flight requests are in progress in the worker (0 disables that limit)
+    compression_minimum_size: int = 1024
+    compression_max_in_flight: int = 100
+
     cors_origins: list[str] = ["http://localhost:5173"]
 
     # JWT settings
@@ -21,8 +76,52 @@ class Settings(BaseSettings):
         env_file=".env",
         extra="ignore",
         env_nested_delimiter="__",
+        frozen=True,
     )
 
 
+# Process-wide settings snapshot, replaced as a whole on reload
+_settings: Settings | None = None
+
+
 def get_settings() -> Settings:
-    return Settings()  # type: ignore
+    """Return the settings snapshot, reading the environment and .env file only on first use."""
+    global _settings
+    if _settings is None:
+        _settings = Settings()  # type: ignore
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """Re-read the environment and .env file and swap in the new snapshot.
+
+    Settings that are only used at startup (database URL and pool, CORS, trusted hosts) still need a
+    restart to take effect. If the new values don't validate, the current snapshot is kept.
+    """
+    global _settings
+    try:
+        settings = Settings()  # type: ignore
+    except ValidationError:
+        logger.exception("Settings reload failed, keeping the current settings")
+        return get_settings()
+    _settings = settings
+    logger.info("Settings reloaded")
+    return settings
+
+
+@contextmanager
+def override_settings(**values: Any) -> Iterator[Settings]:
+    """Temporarily replace the snapshot with a copy updated with the given values (for tests)."""
+    global _settings
+    previous = _settings
+    _settings = get_settings().model_copy(update=values)
+    try:
+        yield _settings
+    finally:
+        _settings = previous
+
+
+def install_reload_signal_handler() -> None:
+    """Reload settings when the process receives SIGHUP."""
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_settings())
@@ -0,0 +1,182 @@
+"""Service statistics for /api/v1/stats, counted in the background.
+
+A StatsRefresher task started from the lifespan recounts every STATS_REFRESH_SECONDS, plus up to
+STATS_REFRESH_JITTER of that, so workers started together drift apart instead of querying at the same
+moment. Requests only read the latest snapshot and report its age. Snapshots go through the cache
+too: with a shared cache, a worker whose turn comes shortly after another's reuses that snapshot
+instead of counting again.
+"""
+
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import Cache, get_cache
+from app.db import get_read_session_maker
+from app.models import Decision, Roll, RollArchive, User
+from app.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_KEY = "stats"
+
+_refresher: "StatsRefresher | None" = None
+
+
+@dataclass(frozen=True, slots=True)
+class StatsSnapshot:
+    counts: dict[str, int]
+    computed_at: datetime
+
+    def age_seconds(self, now: datetime | None = None) -> float:
+        return ((now or datetime.now(timezone.utc)) - self.computed_at).total_seconds()
+
+
+async def count_stats(session: AsyncSession) -> dict[str, int]:
+    """Count users, decisions and rolls, in total and for today."""
+    # Get current time for "today" calculations
+    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # Total users (guest + registered)
+    result = await session.exec(select(func.count(User.id)))
+    total_users = result.one()
+
+    # Guest users
+    result = await session.exec(select(func.count(User.id)).where(User.is_guest == True))
+    guest_users = result.one()
+
+    # Registered users
+    result = await session.exec(select(func.count(User.id)).where(User.is_guest == False))
+    registered_users = result.one()
+
+    # Total decisions
+    result = await session.exec(select(func.count(Decision.id)))
+    total_decisions = result.one()
+
+    # Total rolls, including archived ones
+    result = await session.exec(select(func.count(Roll.id)))
+    total_rolls = result.one()
+    result = await session.exec(select(func.sum(RollArchive.roll_count)))
+    total_rolls = (total_rolls or 0) + (result.one() or 0)
+
+    # New users today
+    result = await session.exec(select(func.count(User.id)).where(User.created_at >= today_start))
+    new_users_today = result.one()
+
+    # Active users today (made a roll)
+    result = await session.exec(
+        select(func.count(func.distinct(Decision.user_id))).join(Roll).where(Roll.created_at >= today_start)
+    )
+    active_users_today = result.one()
+
+    # Rolls today
+    result = await session.exec(select(func.count(Roll.id)).where(Roll.created_at >= today_start))
+    rolls_today = result.one()
+
+    # Decisions created today
+    result = await session.exec(select(func.count(Decision.id)).where(Decision.created_at >= today_start))
+    decisions_today = result.one()
+
+    return {
+        "total_users": total_users or 0,
+        "guest_users": guest_users or 0,
+        "registered_users": registered_users or 0,
+        "total_decisions": total_decisions or 0,
+        "total_rolls": total_rolls or 0,
+        "new_users_today": new_users_today or 0,
+        "active_users_today": active_users_today or 0,
+        "rolls_today": rolls_today or 0,
+        "decisions_today": decisions_today or 0,
+    }
+
+
+class StatsRefresher:
+    """Keeps the latest stats snapshot, recounting every interval seconds in a background task."""
+
+    def __init__(self, cache: Cache, interval: float, jitter: float = 0.1) -> None:
+        self.cache = cache
+        self.interval = interval
+        self.jitter = jitter
+        self.snapshot: StatsSnapshot | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(0, self.jitter))
+
+    async def refresh(self, session: AsyncSession) -> StatsSnapshot:
+        """Take a snapshot less than interval old from the cache, or count and publish a new one."""
+        cached = await self.cache.get(STATS_CACHE_KEY)
+        if cached is not None:
+            snapshot = StatsSnapshot(cached["counts"], datetime.fromisoformat(cached["computed_at"]))
+            if snapshot.age_seconds() < self.interval:
+                self.snapshot = snapshot
+                return snapshot
+
+        snapshot = StatsSnapshot(await count_stats(session), datetime.now(timezone.utc))
+        await self.cache.set(
+            STATS_CACHE_KEY,
+            {"counts": snapshot.counts, "computed_at": snapshot.computed_at.isoformat()},
+            ttl=self.interval,
+        )
+        self.snapshot = snapshot
+        return snapshot
+
+    async def current(self, session: AsyncSession) -> StatsSnapshot:
+        """The latest snapshot, counted with session only if there hasn't been one yet."""
+        return self.snapshot or await self.refresh(session)
+
+    async def clear(self) -> None:
+        """Forget the snapshot, here and in the cache, so the next request counts again."""
+        self.snapshot = None
+        await self.cache.delete(STATS_CACHE_KEY)
+
+    async def run(self, session_maker: Callable[[], Any]) -> None:
+        while True:
+            try:
+                async with session_maker() as session:
+                    await self.refresh(session)
+            except Exception:
+                logger.exception("Refreshing stats failed; serving the previous snapshot")
+            await asyncio.sleep(self.next_delay())
+
+    def start(self, session_maker: Callable[[], Any]) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(session_maker), name="stats-refresher")
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+def get_stats_refresher() -> StatsRefresher:
+    """Get or create the process-wide stats refresher."""
+    global _refresher
+    if _refresher is None:
+        settings = get_settings()
+        _refresher = StatsRefresher(get_cache(settings), settings.stats_refresh_seconds, settings.stats_refresh_jitter)
+    return _refresher
+
+
+async def start_stats_refresher(settings: Settings | None = None) -> None:
+    """Start refreshing stats in the background, counting on the read replica when one is configured."""
+    get_stats_refresher().start(get_read_session_maker(settings or get_settings()))
+
+
+async def close_stats_refresher() -> None:
+    """Cancel the refresh task and wait for it to stop."""
+    global _refresher
+    if _refresher is not None:
+        await _refresher.close()
+        _refresher = None
@@ -0,0 +1,286 @@
+"""Load-test the core API endpoints and report throughput and latency percentiles.
+
+Seeds a database, then drives the app in-process through ASGI (default) or a running server
+(--base-url), and writes the results as JSON. Run from the backend directory:
+
+    python -m benchmarks.run --users 10 --rolls-per-user 10000 --output results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to seed and use (default: a temporary SQLite file)")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--decisions-per-user", type=int, default=6)
+    parser.add_argument("--rolls-per-user", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--scenarios",
+        default="list,roll,export,stats,auth",
+        help="Comma-separated subset of: list, roll (roll + confirm), export, stats, auth (login + me)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--baseline", type=Path, help="Compare against a previous results file")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to --baseline")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="Exit with status 1 if any p95 latency is this fraction slower than the baseline (e.g. 0.2), "
+        "or any endpoint has more errors than in it",
+    )
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Point the app at the benchmark database; must run before the app package is imported."""
+    if args.database_url is None:
+        args.database_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='aleator-bench-')}/bench.db"
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SQLALCHEMY_ECHO", "false")
+    os.environ.setdefault("DB_AUTO_CREATE", "true")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key")
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.phases: dict[str, dict[str, Any]] = {}
+
+    async def request(self, name: str, call: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await call()
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.is_error:
+            self.errors[name] += 1
+        return response
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Latency percentiles and error counts per endpoint; p*_ms are None if no request got a response."""
+        results = {}
+        for name in [*self.latencies, *(name for name in self.errors if name not in self.latencies)]:
+            latencies = self.latencies[name]
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else None
+
+            def ms(index: int) -> float | None:
+                if not latencies:
+                    return None
+                return round((percentiles[index] if percentiles else latencies[0]) * 1000, 3)
+
+            results[name] = {
+                "requests": len(latencies),
+                "errors": self.errors[name],
+                "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else None,
+                "p50_ms": ms(49),
+                "p95_ms": ms(94),
+                "p99_ms": ms(98),
+            }
+        return results
+
+
+async def run_phase(
+    recorder: Recorder,
+    scenario: str,
+    names: list[str],
+    concurrency: int,
+    requests: int,
+    worker: Callable[[int, int], Awaitable[None]],
+) -> None:
+    """Run `requests` iterations of `worker(worker_index, iteration)` spread over `concurrency` tasks.
+
+    Endpoints of one scenario run interleaved (roll then confirm, login then me), so throughput is
+    reported for the scenario as a whole: all its requests over its wall time.
+    """
+
+    async def loop(index: int) -> None:
+        for iteration in range(index, requests, concurrency):
+            await worker(index, iteration)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(loop(index) for index in range(concurrency)))
+    wall_seconds = time.perf_counter() - start
+    completed = sum(len(recorder.latencies[name]) for name in names)
+    recorder.phases[scenario] = {
+        "endpoints": names,
+        "requests": completed,
+        "errors": sum(recorder.errors[name] for name in names),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(completed / wall_seconds, 2) if wall_seconds else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    from app import create_app
+    from app.auth import create_access_token
+    from app.db import close_db, get_engine
+    from app.settings import get_settings
+    from benchmarks.seed import PASSWORD, seed
+
+    settings = get_settings()
+    engine = get_engine(settings)
+
+    seed_start = time.perf_counter()
+    users = await seed(engine, args.users, args.decisions_per_user, args.rolls_per_user, seed=args.seed)
+    seed_seconds = time.perf_counter() - seed_start
+    print(f"Seeded {len(users)} users with {args.rolls_per_user} rolls each in {seed_seconds:.1f}s", file=sys.stderr)
+
+    headers = [{"Authorization": f"Bearer {create_access_token({'sub': user.email}, settings)}"} for user in users]
+    # Each worker rolls its own decisions, so concurrent workers never hit each other's pending rolls
+    owned_decisions = [(i, decision_id) for i, user in enumerate(users) for decision_id in user.decision_ids]
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app()), base_url="http://bench", timeout=60)
+
+    recorder = Recorder()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+
+    async def list_decisions(worker: int, iteration: int) -> None:
+        await recorder.request(
+            "list", lambda: client.get("/api/v1/decisions/", headers=headers[iteration % len(users)])
+        )
+
+    async def roll_and_confirm(worker: int, iteration: int) -> None:
+        mine = owned_decisions[worker :: args.concurrency]
+        if not mine:
+            return
+        user_index, decision_id = mine[iteration // args.concurrency % len(mine)]
+        user_headers = headers[user_index]
+        response = await recorder.request(
+            "roll", lambda: client.post(f"/api/v1/decisions/{decision_id}/roll", headers=user_headers)
+        )
+        if response is None or response.is_error:
+            return
+        confirm_url = f"/api/v1/decisions/{decision_id}/rolls/{response.json()['id']}/confirm"
+        await recorder.request(
+            "confirm", lambda: client.post(confirm_url, json={"followed": True}, headers=user_headers)
+        )
+
+    async def export(worker: int, iteration: int) -> None:
+        await recorder.request(
+            "export", lambda: client.get("/api/v1/user/export", headers=headers[iteration % len(users)])
+        )
+
+    async def stats(worker: int, iteration: int) -> None:
+        await recorder.request("stats", lambda: client.get("/api/v1/stats/"))
+
+    async def auth(worker: int, iteration: int) -> None:
+        user = users[iteration % len(users)]
+        await recorder.request(
+            "login", lambda: client.post("/api/v1/auth/login", data={"username": user.email, "password": PASSWORD})
+        )
+        await recorder.request("me", lambda: client.get("/api/v1/auth/me", headers=headers[iteration % len(users)]))
+
+    phases: dict[str, tuple[list[str], Callable[[int, int], Awaitable[None]]]] = {
+        "list": (["list"], list_decisions),
+        "roll": (["roll", "confirm"], roll_and_confirm),
+        "export": (["export"], export),
+        "stats": (["stats"], stats),
+        "auth": (["login", "me"], auth),
+    }
+    unknown = set(scenarios) - phases.keys()
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    async with client:
+        for scenario in scenarios:
+            names, worker = phases[scenario]
+            print(f"Running {scenario}...", file=sys.stderr)
+            await run_phase(recorder, scenario, names, args.concurrency, args.requests, worker)
+
+    await close_db(engine)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "target": args.base_url or "asgi",
+            "users": args.users,
+            "decisions_per_user": args.decisions_per_user,
+            "rolls_per_user": args.rolls_per_user,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "results": recorder.summary(),
+        "phases": recorder.phases,
+    }
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], max_regression: float | None) -> bool:
+    """Print a comparison table; return False if, with max_regression, any endpoint regressed.
+
+    An endpoint regressed if its p95 is more than max_regression slower than the baseline's, or if it
+    had more errors than in the baseline (an endpoint that only failed has no p95 at all).
+    """
+    ok = True
+    print(f"{'endpoint':<10} {'p95 base':>10} {'p95 now':>10} {'change':>8} {'err base':>9} {'err now':>8}")
+    for name, current in results["results"].items():
+        previous = baseline["results"].get(name, {"p95_ms": None, "errors": 0})
+        if previous["p95_ms"] and current["p95_ms"] is not None:
+            change = current["p95_ms"] / previous["p95_ms"] - 1
+        else:
+            change = 0.0
+        regressed = max_regression is not None and (change > max_regression or current["errors"] > previous["errors"])
+        ok = ok and not regressed
+        print(
+            f"{name:<10} {format_ms(previous['p95_ms']):>10} {format_ms(current['p95_ms']):>10} {change:>+8.1%} "
+            f"{previous['errors']:>9} {current['errors']:>8}" + ("  REGRESSION" if regressed else "")
+        )
+
+    print(f"\n{'scenario':<10} {'rps base':>10} {'rps now':>10}")
+    for scenario, current in results.get("phases", {}).items():
+        previous = baseline.get("phases", {}).get(scenario)
+        if previous is not None:
+            print(f"{scenario:<10} {previous['throughput_rps']:>10.1f} {current['throughput_rps']:>10.1f}")
+    return ok
+
+
+def format_ms(value: float | None) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    configure_environment(args)
+    results = asyncio.run(run(args))
+
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    print(json.dumps(results["results"], indent=2))
+
+    ok = True
+    if args.baseline and args.baseline.exists() and not args.save_baseline:
+        ok = compare(results, json.loads(args.baseline.read_text()), args.max_regression)
+    if args.baseline and args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Seed a database with benchmark users, decisions and roll history."""
+
+import random
+import secrets
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlmodel import SQLModel
+
+from app.auth import get_password_hash
+from app.models import (
+    BinaryDecision,
+    Choice,
+    Decision,
+    DecisionType,
+    MultiChoiceDecision,
+    ProbabilityHistory,
+    Roll,
+    RollChoiceWeight,
+    User,
+    WeightHistory,
+)
+
+PASSWORD = "benchmark-password"
+BATCH_SIZE = 5000
+
+
+@dataclass
+class SeededUser:
+    id: int
+    email: str
+    decision_ids: list[int] = field(default_factory=list)
+
+
+def _batched(rows: Iterable[dict[str, Any]], size: int = BATCH_SIZE) -> Iterator[list[dict[str, Any]]]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def _insert_returning_ids(conn: AsyncConnection, model: type[SQLModel], rows: list[dict[str, Any]]) -> list[int]:
+    """Insert rows in batches and return their ids in input order."""
+    ids: list[int] = []
+    for batch in _batched(rows):
+        statement = insert(model).returning(model.id, sort_by_parameter_order=True)  # type: ignore[attr-defined]
+        result = await conn.execute(statement, batch)
+        ids.extend(result.scalars().all())
+    return ids
+
+
+async def _insert(conn: AsyncConnection, model: type[SQLModel], rows: Iterable[dict[str, Any]]) -> None:
+    for batch in _batched(rows):
+        await conn.execute(insert(model), batch)
+
+
+async def seed(
+    engine: AsyncEngine,
+    users: int,
+    decisions_per_user: int,
+    rolls_per_user: int,
+    seed: int = 0,
+) -> list[SeededUser]:
+    """Create users with alternating binary and multi-choice decisions and confirmed roll history.
+
+    All rolls are confirmed so every decision can be rolled right away. Every user gets the password
+    PASSWORD; emails get a random tag so repeated runs against the same database don't collide.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    hashed_password = get_password_hash(PASSWORD)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+        tag = secrets.token_hex(4)
+        emails = [f"bench-{tag}-{i}@example.com" for i in range(users)]
+        user_rows = [
+            {
+                "email": email,
+                "hashed_password": hashed_password,
+                "created_at": now,
+                "is_active": True,
+                "is_guest": False,
+            }
+            for email in emails
+        ]
+        user_ids = await _insert_returning_ids(conn, User, user_rows)
+        seeded = [SeededUser(id=user_id, email=email) for user_id, email in zip(user_ids, emails)]
+
+        decision_rows = []
+        for user in seeded:
+            for order in range(decisions_per_user):
+                decision_type = DecisionType.BINARY if order % 2 == 0 else DecisionType.MULTI_CHOICE
+                decision_rows.append(
+                    {
+                        "user_id": user.id,
+                        "title": f"Decision {order}",
+                        "type": decision_type,
+                        "cooldown_hours": 0,
+                        "display_order": order,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+        decision_ids = await _insert_returning_ids(conn, Decision, decision_rows)
+        decision_types = {decision_id: row["type"] for decision_id, row in zip(decision_ids, decision_rows)}
+        for index, user in enumerate(seeded):
+            user.decision_ids = decision_ids[index * decisions_per_user : (index + 1) * decisions_per_user]
+
+        binary_ids = [d for d in decision_ids if decision_types[d] == DecisionType.BINARY]
+        multi_ids = [d for d in decision_ids if decision_types[d] == DecisionType.MULTI_CHOICE]
+        await _insert(conn, BinaryDecision, ({"decision_id": d, "probability": 50} for d in binary_ids))
+        await _insert(
+            conn, ProbabilityHistory, ({"decision_id": d, "probability": 50, "changed_at": now} for d in binary_ids)
+        )
+        await _insert(conn, MultiChoiceDecision, ({"decision_id": d} for d in multi_ids))
+
+        choice_rows = [
+            {"decision_id": d, "name": name, "weight": weight, "display_order": order}
+            for d in multi_ids
+            for order, (name, weight) in enumerate([("Red", 50), ("Green", 30), ("Blue", 20)])
+        ]
+        choice_ids = await _insert_returning_ids(conn, Choice, choice_rows)
+        await _insert(
+            conn,
+            WeightHistory,
+            ({"choice_id": c, "weight": row["weight"], "changed_at": now} for c, row in zip(choice_ids, choice_rows)),
+        )
+        choices_by_decision: dict[int, list[tuple[int, dict[str, Any]]]] = {}
+        for choice_id, row in zip(choice_ids, choice_rows):
+            choices_by_decision.setdefault(row["decision_id"], []).append((choice_id, row))
+
+        # Rolls are spread round-robin over each user's decisions across the past year
+        for user in seeded:
+            if not user.decision_ids:
+                continue
+            roll_rows = []
+            for n in range(rolls_per_user):
+                decision_id = user.decision_ids[n % len(user.decision_ids)]
+                roll = {
+                    "decision_id": decision_id,
+                    "followed": rng.random() < 0.7,
+                    "created_at": now - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+                    "probability": None,
+                }
+                if decision_types[decision_id] == DecisionType.BINARY:
+                    roll["result"] = "yes" if rng.random() < 0.5 else "no"
+                    roll["probability"] = 50
+                else:
+                    roll["result"] = rng.choice(choices_by_decision[decision_id])[1]["name"]
+                roll_rows.append(roll)
+            roll_ids = await _insert_returning_ids(conn, Roll, roll_rows)
+
+            await _insert(
+                conn,
+                RollChoiceWeight,
+                (
+                    {"roll_id": roll_id, "choice_id": choice_id, "choice_name": row["name"], "weight": row["weight"]}
+                    for roll_id, roll in zip(roll_ids, roll_rows)
+                    if decision_types[roll["decision_id"]] == DecisionType.MULTI_CHOICE
+                    for choice_id, row in choices_by_decision[roll["decision_id"]]
+                ),
+            )
+
+    return seeded
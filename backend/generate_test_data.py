@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""Generate deterministic synthetic users, decisions and roll history.
+
+Covers binary and multi-choice decisions with probability/weight history, the weights used for each
+multi-choice roll, and a mix of confirmed and pending rolls spread over several usage patterns. Rows
+are streamed in large batches: COPY on PostgreSQL, multi-row INSERT elsewhere. The same --seed
+always produces the same data relative to the time of the run.
+
+    python generate_test_data.py
+    python generate_test_data.py --users 1000 --decisions-per-user 10 --rolls-per-decision 1000
+
+Ids are assigned up front, so run it against a database nobody else is writing to.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
+
+from sqlalchemy import Enum, Table, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from sqlmodel import SQLModel, col
+
+from app.auth import get_password_hash
+from app.models import (
+    BinaryDecision,
+    Choice,
+    Decision,
+    DecisionType,
+    MultiChoiceDecision,
+    ProbabilityHistory,
+    Roll,
+    RollChoiceWeight,
+    User,
+    WeightHistory,
+)
+
+PASSWORD = "testpassword"
+BATCH_SIZE = 10_000
+
+
+@dataclass(frozen=True)
+class Pattern:
+    horizon_days: int
+    cooldown_hours: float
+    follow_rate: float
+    # Chance that the probability or weights change after a roll
+    change_rate: float
+    # Most rolls fall into the first third of the horizon
+    burst: bool = False
+
+
+PATTERNS = {
+    "dense_daily": Pattern(horizon_days=14, cooldown_hours=4, follow_rate=0.6, change_rate=0.02),
+    "regular_daily": Pattern(horizon_days=60, cooldown_hours=20, follow_rate=0.8, change_rate=0.01),
+    "sparse_weekly": Pattern(horizon_days=180, cooldown_hours=72, follow_rate=0.6, change_rate=0.02),
+    "burst_then_sparse": Pattern(horizon_days=365, cooldown_hours=24, follow_rate=0.5, change_rate=0.03, burst=True),
+    "monthly_sparse": Pattern(horizon_days=730, cooldown_hours=720, follow_rate=0.7, change_rate=0.01),
+}
+
+BINARY_TITLES = [
+    "Daily Dessert",
+    "Evening Meditation",
+    "Weekly Exercise",
+    "Morning Coffee",
+    "Weekend Gaming",
+    "Study Break",
+    "Monthly Treat",
+    "Take the Stairs",
+]
+MULTI_CHOICE_OPTIONS = {
+    "Dinner": ["Pasta", "Pizza", "Salad", "Curry", "Soup"],
+    "Workout": ["Run", "Swim", "Bike", "Yoga"],
+    "Free Evening": ["Read", "Watch a Film", "Play a Game", "Call a Friend"],
+    "Commute": ["Walk", "Bike", "Bus"],
+    "Weekend Trip": ["Mountains", "Lake", "City", "Stay Home"],
+}
+
+
+class BulkWriter:
+    """Buffers rows per table and writes them in large batches.
+
+    Buffers are always flushed together in foreign key order, so a batch never references a row that
+    hasn't been written yet. PostgreSQL gets COPY, other databases a multi-row INSERT.
+    """
+
+    def __init__(self, conn: AsyncConnection, batch_size: int = BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.use_copy = conn.dialect.driver == "asyncpg"
+        self.buffers: dict[Table, list[tuple[Any, ...]]] = {table: [] for table in SQLModel.metadata.sorted_tables}
+        self.counts: Counter[str] = Counter()
+        self._buffered = 0
+
+    async def add(self, model: type[SQLModel], row: tuple[Any, ...]) -> None:
+        """Queue a row whose values are in the table's column order."""
+        self.buffers[model.__table__].append(row)  # type: ignore[attr-defined]
+        self._buffered += 1
+        if self._buffered >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        for table, rows in self.buffers.items():
+            if rows:
+                await (self._copy(table, rows) if self.use_copy else self._insert(table, rows))
+                self.counts[table.name] += len(rows)
+                rows.clear()
+        self._buffered = 0
+
+    async def _insert(self, table: Table, rows: list[tuple[Any, ...]]) -> None:
+        names = [column.name for column in table.columns]
+        await self.conn.execute(insert(table), [dict(zip(names, row)) for row in rows])
+
+    async def _copy(self, table: Table, rows: list[tuple[Any, ...]]) -> None:
+        # COPY skips SQLAlchemy's type processing; enums are the only columns stored differently
+        processors = {
+            index: column.type.bind_processor(self.conn.dialect)
+            for index, column in enumerate(table.columns)
+            if isinstance(column.type, Enum)
+        }
+        if processors:
+            rows = [tuple(processors[i](v) if i in processors else v for i, v in enumerate(row)) for row in rows]
+        raw = await self.conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(  # type: ignore[union-attr]
+            table.name, records=rows, columns=[column.name for column in table.columns]
+        )
+
+
+class IdAllocator:
+    """Hands out primary keys after the current maximum of each table."""
+
+    def __init__(self, next_ids: dict[str, int]):
+        self.next_ids = next_ids
+
+    @classmethod
+    async def load(cls, conn: AsyncConnection) -> "IdAllocator":
+        next_ids = {}
+        for model in (User, Decision, Choice, Roll, RollChoiceWeight, ProbabilityHistory, WeightHistory):
+            max_id = (await conn.execute(select(func.max(col(model.id))))).scalar()
+            next_ids[model.__tablename__] = (max_id or 0) + 1
+        return cls(next_ids)
+
+    def __call__(self, model: type[SQLModel]) -> int:
+        table = str(model.__tablename__)
+        value = self.next_ids[table]
+        self.next_ids[table] = value + 1
+        return value
+
+
+def _roll_times(rng: random.Random, pattern: Pattern, count: int, now: datetime) -> list[datetime]:
+    start = now - timedelta(days=pattern.horizon_days)
+    span = (pattern.horizon_days * 24 - 1) * 3600
+    offsets = []
+    for _ in range(count):
+        offset = rng.random()
+        if pattern.burst and rng.random() < 0.8:
+            offset /= 3
+        offsets.append(offset * span)
+    offsets.sort()
+    return [start + timedelta(seconds=offset) for offset in offsets]
+
+
+def _weights(rng: random.Random, count: int) -> list[int]:
+    """Whole-number weights between 1 and 97 that sum to 100."""
+    cuts = sorted(rng.sample(range(1, 100), count - 1))
+    return [b - a for a, b in zip([0, *cuts], [*cuts, 100])]
+
+
+class Generator:
+    def __init__(
+        self,
+        writer: BulkWriter,
+        ids: IdAllocator,
+        rng: random.Random,
+        now: datetime,
+        rolls_per_decision: int,
+        pending_ratio: float,
+        multi_choice_ratio: float,
+    ):
+        self.writer = writer
+        self.ids = ids
+        self.rng = rng
+        self.now = now
+        self.rolls_per_decision = rolls_per_decision
+        self.pending_ratio = pending_ratio
+        self.multi_choice_ratio = multi_choice_ratio
+
+    async def user(self, email: str, hashed_password: str, decisions: int) -> None:
+        user_id = self.ids(User)
+        created_at = self.now - timedelta(days=max(p.horizon_days for p in PATTERNS.values()) + 1)
+        await self.writer.add(User, (user_id, email, hashed_password, created_at, True, False, None, 0))
+        for order in range(decisions):
+            if self.rng.random() < self.multi_choice_ratio:
+                await self.multi_choice_decision(user_id, order)
+            else:
+                await self.binary_decision(user_id, order)
+
+    def _plan(self) -> tuple[Pattern, list[datetime], int | None]:
+        """Pick a pattern and roll times; the index of the pending roll, if any, is returned too."""
+        pattern = PATTERNS[self.rng.choice(list(PATTERNS))]
+        count = self.rng.randint(self.rolls_per_decision // 2, self.rolls_per_decision * 3 // 2)
+        times = _roll_times(self.rng, pattern, count, self.now)
+        pending = None
+        if times and self.rng.random() < self.pending_ratio:
+            # A pending roll is always the latest one and recent
+            pending = len(times) - 1
+            times[pending] = max(times[pending], self.now - timedelta(seconds=self.rng.randrange(3600)))
+        return pattern, times, pending
+
+    async def _decision(
+        self, user_id: int, order: int, title: str, decision_type: DecisionType, pattern: Pattern, times: list[datetime]
+    ) -> tuple[int, datetime]:
+        decision_id = self.ids(Decision)
+        created_at = (times[0] if times else self.now) - timedelta(days=1)
+        updated_at = times[-1] if times else created_at
+        await self.writer.add(
+            Decision,
+            (decision_id, user_id, title, decision_type, pattern.cooldown_hours, order, 0, created_at, updated_at),
+        )
+        return decision_id, created_at
+
+    def _followed(self, pattern: Pattern, index: int, pending: int | None) -> bool | None:
+        return None if index == pending else self.rng.random() < pattern.follow_rate
+
+    async def binary_decision(self, user_id: int, order: int) -> None:
+        pattern, times, pending = self._plan()
+        title = f"{self.rng.choice(BINARY_TITLES)} #{order + 1}"
+        decision_id, created_at = await self._decision(user_id, order, title, DecisionType.BINARY, pattern, times)
+
+        probability = float(self.rng.randint(5, 95))
+        history = [(probability, created_at)]
+        rolls = []
+        for index, rolled_at in enumerate(times):
+            result = "yes" if self.rng.random() * 100 < probability else "no"
+            rolls.append(
+                (
+                    self.ids(Roll),
+                    decision_id,
+                    result,
+                    self._followed(pattern, index, pending),
+                    probability,
+                    0,
+                    rolled_at,
+                )
+            )
+            if index != pending and self.rng.random() < pattern.change_rate:
+                probability = float(max(1, min(99, probability + self.rng.randint(-15, 15))))
+                history.append((probability, rolled_at + timedelta(minutes=1)))
+
+        await self.writer.add(BinaryDecision, (decision_id, probability, 0, "Do it", "Skip it"))
+        for value, changed_at in history:
+            await self.writer.add(ProbabilityHistory, (self.ids(ProbabilityHistory), decision_id, value, changed_at))
+        for roll in rolls:
+            await self.writer.add(Roll, roll)
+
+    async def multi_choice_decision(self, user_id: int, order: int) -> None:
+        pattern, times, pending = self._plan()
+        topic = self.rng.choice(list(MULTI_CHOICE_OPTIONS))
+        names = self.rng.sample(MULTI_CHOICE_OPTIONS[topic], self.rng.randint(2, len(MULTI_CHOICE_OPTIONS[topic])))
+        title = f"{topic} #{order + 1}"
+        decision_id, created_at = await self._decision(user_id, order, title, DecisionType.MULTI_CHOICE, pattern, times)
+
+        choice_ids = [self.ids(Choice) for _ in names]
+        weights = _weights(self.rng, len(names))
+        history = [(choice_id, weight, created_at) for choice_id, weight in zip(choice_ids, weights)]
+        rolls = []
+        for index, rolled_at in enumerate(times):
+            result = self.rng.choices(names, weights)[0]
+            roll_id = self.ids(Roll)
+            rolls.append(
+                ((roll_id, decision_id, result, self._followed(pattern, index, pending), None, 0, rolled_at), weights)
+            )
+            if index != pending and self.rng.random() < pattern.change_rate:
+                new_weights = _weights(self.rng, len(names))
+                changed_at = rolled_at + timedelta(minutes=1)
+                history += [
+                    (choice_id, new, changed_at)
+                    for choice_id, old, new in zip(choice_ids, weights, new_weights)
+                    if new != old
+                ]
+                weights = new_weights
+
+        await self.writer.add(MultiChoiceDecision, (decision_id, 0))
+        for display_order, (choice_id, name, weight) in enumerate(zip(choice_ids, names, weights)):
+            await self.writer.add(Choice, (choice_id, decision_id, name, float(weight), display_order))
+        for choice_id, weight, changed_at in history:
+            await self.writer.add(WeightHistory, (self.ids(WeightHistory), choice_id, float(weight), changed_at))
+        for roll, roll_weights in rolls:
+            await self.writer.add(Roll, roll)
+            for choice_id, name, weight in zip(choice_ids, names, roll_weights):
+                await self.writer.add(
+                    RollChoiceWeight, (self.ids(RollChoiceWeight), roll[0], choice_id, name, float(weight))
+                )
+
+
+def _emails(users: int) -> Iterator[str]:
+    yield "test@example.com"
+    for n in range(1, users):
+        yield f"test+{n}@example.com"
+
+
+async def _lock_tables(conn: AsyncConnection) -> None:
+    """Block concurrent writers on PostgreSQL while ids are assigned by hand."""
+    if conn.dialect.name == "postgresql":
+        tables = ", ".join(conn.dialect.identifier_preparer.quote(t.name) for t in SQLModel.metadata.sorted_tables)
+        await conn.execute(text(f"LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE"))
+
+
+async def _reset_sequences(conn: AsyncConnection) -> None:
+    """Move PostgreSQL id sequences past the rows written with explicit ids."""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in SQLModel.metadata.sorted_tables:
+        if "id" not in table.columns:
+            continue
+        quoted = conn.dialect.identifier_preparer.quote(table.name)
+        await conn.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{quoted}', 'id'), MAX(id)) FROM {quoted} HAVING MAX(id) IS NOT NULL"
+            )
+        )
+
+
+async def generate(
+    engine: AsyncEngine,
+    users: int = 1,
+    decisions_per_user: int = 8,
+    rolls_per_decision: int = 200,
+    pending_ratio: float = 0.2,
+    multi_choice_ratio: float = 0.5,
+    seed: int = 0,
+    batch_size: int = BATCH_SIZE,
+    now: datetime | None = None,
+) -> Counter[str]:
+    """Generate users test@example.com, test+1@example.com, ... and return the rows written per table.
+
+    Users that already exist are skipped. Every user gets the password PASSWORD.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    hashed_password = get_password_hash(PASSWORD)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await _lock_tables(conn)
+
+        emails = list(_emails(users))
+        existing = set((await conn.execute(select(col(User.email)).where(col(User.email).in_(emails)))).scalars())
+        for email in sorted(existing):
+            print(f"{email} already exists, skipping", file=sys.stderr)
+
+        writer = BulkWriter(conn, batch_size)
+        generator = Generator(
+            writer, await IdAllocator.load(conn), rng, now, rolls_per_decision, pending_ratio, multi_choice_ratio
+        )
+        for email in emails:
+            if email not in existing:
+                await generator.user(email, hashed_password, decisions_per_user)
+        await writer.flush()
+        await _reset_sequences(conn)
+
+    return writer.counts
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to fill (default: DATABASE_URL from the settings)")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--decisions-per-user", type=int, default=8)
+    parser.add_argument(
+        "--rolls-per-decision", type=int, default=200, help="Average; each decision gets 50%%-150%% of it"
+    )
+    parser.add_argument("--pending-ratio", type=float, default=0.2, help="Share of decisions with a pending roll")
+    parser.add_argument("--multi-choice-ratio", type=float, default=0.5, help="Share of multi-choice decisions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows buffered before each write")
+    return parser.parse_args(argv)
+
+
+async def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.database_url is None:
+        from app.settings import get_settings
+
+        args.database_url = get_settings().database_url
+    engine = create_async_engine(args.database_url)
+
+    start = time.perf_counter()
+    try:
+        counts = await generate(
+            engine,
+            users=args.users,
+            decisions_per_user=args.decisions_per_user,
+            rolls_per_decision=args.rolls_per_decision,
+            pending_ratio=args.pending_ratio,
+            multi_choice_ratio=args.multi_choice_ratio,
+            seed=args.seed,
+            batch_size=args.batch_size,
+        )
+    finally:
+        await engine.dispose()
+
+    for table, count in counts.items():
+        print(f"{table:<20} {count:>12,}")
+    print(f"Done in {time.perf_counter() - start:.1f}s. Login with test@example.com / {PASSWORD}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
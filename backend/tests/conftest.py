@@ -7,6 +7,7 @@ os.environ["DB_AUTO_CREATE"] = "true"
 os.environ["CORS_ORIGINS"] = '["http://localhost:5173"]'
 os.environ["JWT_SECRET_KEY"] = "test_secret_key_for_testing_only"
 
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import async_sessionmaker
@@ -14,7 +15,22 @@ from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import create_app
+from app.auth import get_password_hash
+from app.cache import Cache, MemoryBackend, get_cache
 from app.db import get_db_session
+from app.models import User
+from app.querycount import query_budget
+from app.statistics import StatsRefresher, get_stats_refresher
+
+PASSWORD = "testpass123"
+
+# Request bodies for POST /api/v1/decisions/
+BINARY = {"title": "Run?", "type": "binary", "binary_data": {"probability": 50}}
+MULTI_CHOICE = {
+    "title": "What to eat?",
+    "type": "multi_choice",
+    "multi_choice_data": {"choices": [{"name": "Pizza", "weight": 50}, {"name": "Salad", "weight": 50}]},
+}
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -45,8 +61,20 @@ async def session(engine):
         yield session
 
 
+@pytest.fixture
+def cache():
+    """Empty in-memory cache for one test."""
+    return Cache(MemoryBackend())
+
+
+@pytest.fixture
+def stats_refresher(cache):
+    """Stats refresher without a background task; requests count on first use."""
+    return StatsRefresher(cache, interval=600)
+
+
 @pytest_asyncio.fixture(scope="function")
-async def app(session):
+async def app(session, cache, stats_refresher):
     """Create test app with overridden dependencies."""
     test_app = create_app()
 
@@ -55,6 +83,8 @@ async def app(session):
         yield session
 
     test_app.dependency_overrides[get_db_session] = override_get_db
+    test_app.dependency_overrides[get_cache] = lambda: cache
+    test_app.dependency_overrides[get_stats_refresher] = lambda: stats_refresher
 
     yield test_app
 
@@ -68,3 +98,25 @@ async def client(app):
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test", follow_redirects=False) as client:
         yield client
+
+
+@pytest.fixture
+def max_queries():
+    """Query budget for a block of a test; fails if the block runs more queries than allowed."""
+    return query_budget
+
+
+@pytest_asyncio.fixture
+async def user(session):
+    """Registered user logging in with PASSWORD."""
+    user = User(email="user@example.com", hashed_password=get_password_hash(PASSWORD))
+    session.add(user)
+    await session.commit()
+    return user
+
+
+@pytest_asyncio.fixture
+async def auth_headers(client, user):
+    """Authorization header with an access token for user."""
+    response = await client.post("/api/v1/auth/login", data={"username": user.email, "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
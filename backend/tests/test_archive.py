@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func
+from sqlmodel import col, select
+
+from app.archive import archive_old_rolls
+from app.dto import RollChoiceWeightRow, RollRow
+from app.models import Roll, RollArchive
+from app.segments import decode_segment, encode_segment
+from app.settings import override_settings
+from generate_test_data import PASSWORD, generate
+
+NOW = datetime(2025, 6, 15, tzinfo=timezone.utc)
+
+
+def test_segment_round_trip():
+    rolls = [
+        RollRow(
+            10,
+            1,
+            "A",
+            True,
+            None,
+            [RollChoiceWeightRow(3, "A", 2.0), RollChoiceWeightRow(4, "B", 1.5)],
+            datetime(2024, 1, 5, 12, 0, 0, 123456, tzinfo=timezone.utc),
+        ),
+        RollRow(
+            12,
+            1,
+            "B",
+            False,
+            None,
+            [RollChoiceWeightRow(3, "A", 1.0), RollChoiceWeightRow(4, "B", 1.5)],
+            datetime(2024, 1, 6, tzinfo=timezone.utc),
+        ),
+    ]
+    assert decode_segment(encode_segment(rolls), 1) == rolls
+
+    naive = [RollRow(1, 2, "Yes", True, 50.0, [], datetime(2024, 1, 1, 8))]
+    assert decode_segment(encode_segment(naive), 2) == naive
+
+
+@pytest_asyncio.fixture
+async def seeded_headers(engine, client):
+    await generate(engine, decisions_per_user=6, rolls_per_decision=40, pending_ratio=0.5, now=NOW)
+    response = await client.post("/api/v1/auth/login", data={"username": "test@example.com", "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _snapshot(client, stats_refresher, headers):
+    # Archiving leaves the data version alone, so a cached response would hide any difference
+    with override_settings(response_cache_ttl_seconds=0):
+        decisions = (await client.get("/api/v1/decisions/", headers=headers)).json()
+    export = (await client.get("/api/v1/user/export", headers=headers)).json()
+    export.pop("export_date")
+    await stats_refresher.clear()
+    stats = (await client.get("/api/v1/stats/", headers=headers)).json()
+    return decisions, export, stats["total_rolls"]
+
+
+@pytest.mark.asyncio
+async def test_archiving_keeps_api_output(client, stats_refresher, session, seeded_headers):
+    before = await _snapshot(client, stats_refresher, seeded_headers)
+
+    result = await archive_old_rolls(session, timedelta(days=90), now=NOW)
+    assert result.rolls > 0
+    assert (await session.exec(select(func.sum(RollArchive.roll_count)))).one() == result.rolls
+
+    cutoff = datetime(2025, 3, 1)
+    old_live = await session.exec(
+        select(Roll.followed).where(col(Roll.created_at) < cutoff)  # SQLite stores naive UTC
+    )
+    assert all(followed is None for followed in old_live.all())
+
+    assert await _snapshot(client, stats_refresher, seeded_headers) == before
+
+
+@pytest.mark.asyncio
+async def test_archiving_twice_merges_segments(client, session, seeded_headers):
+    first = await archive_old_rolls(session, timedelta(days=90), now=NOW)
+    # A pending roll in an archived month gets confirmed later
+    pending = (await session.exec(select(Roll).where(col(Roll.followed).is_(None)).order_by(Roll.created_at))).first()
+    pending.followed = True
+    await session.commit()
+
+    second = await archive_old_rolls(session, timedelta(days=90), now=NOW + timedelta(days=400))
+    archives = (await session.exec(select(RollArchive))).all()
+    assert sum(archive.roll_count for archive in archives) == first.rolls + second.rolls
+    assert len({(archive.decision_id, archive.month) for archive in archives}) == len(archives)
+
+    response = await client.get("/api/v1/decisions/", headers=seeded_headers)
+    rolls = [roll["id"] for decision in response.json() for roll in decision["rolls"]]
+    assert len(rolls) == len(set(rolls))
+
+    # Decisions whose confirmed rolls are all archived still know when the last one was rolled
+    for decision in response.json():
+        confirmed = [roll["created_at"] for roll in decision["rolls"] if roll["followed"] is not None]
+        assert decision["last_confirmed_at"] == max(confirmed, default=None)
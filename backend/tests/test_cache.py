@@ -0,0 +1,191 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+
+from app import cache as cache_module
+from app.cache import Cache, MemoryBackend, RedisBackend, encode_command, read_reply
+
+
+class RespStandIn:
+    """Minimal in-process server for the Redis commands RedisBackend uses."""
+
+    def __init__(self) -> None:
+        self.values: dict[bytes, tuple[bytes, float | None]] = {}
+        self.commands: list[bytes] = []
+
+    def _reply(self, value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self._reply(item) for item in value)
+        if value == b"OK":
+            return b"+OK\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _run(self, name: bytes, args: list[bytes]):
+        if name == b"GET":
+            value, expires = self.values.get(args[0], (None, None))
+            if expires is not None and expires <= time.monotonic():
+                del self.values[args[0]]
+                return None
+            return value
+        if name == b"SET":
+            expires = time.monotonic() + int(args[3]) / 1000 if len(args) > 2 else None
+            self.values[args[0]] = (args[1], expires)
+            return b"OK"
+        if name == b"DEL":
+            return sum(self.values.pop(key, None) is not None for key in args)
+        return b"OK"  # AUTH, SELECT
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                name, *args = await read_reply(reader)
+                self.commands.append(name)
+                writer.write(self._reply(self._run(name.upper(), args)))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+
+@pytest_asyncio.fixture
+async def resp_server():
+    stand_in = RespStandIn()
+    server = await asyncio.start_server(stand_in.handle, "127.0.0.1", 0)
+    stand_in.url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/2"
+    yield stand_in
+    server.close()
+    await server.wait_closed()
+
+
+@pytest_asyncio.fixture(params=["memory", "redis"])
+async def shared_cache(request, resp_server):
+    backend = MemoryBackend() if request.param == "memory" else RedisBackend(resp_server.url)
+    cache = Cache(backend)
+    yield cache
+    await cache.close()
+
+
+def test_encode_command():
+    assert encode_command("SET", "k", b"v\r\n") == b"*3\r\n$3\r\nSET\r\n$1\r\nk\r\n$3\r\nv\r\n\r\n"
+
+
+@pytest.mark.asyncio
+async def test_get_set_delete(shared_cache):
+    assert await shared_cache.get("a") is None
+    await shared_cache.set("a", {"n": 1, "items": [1, 2]}, ttl=60)
+    assert await shared_cache.get("a") == {"n": 1, "items": [1, 2]}
+
+    await shared_cache.delete("a")
+    assert await shared_cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_single_flight(shared_cache):
+    calls = 0
+    release = asyncio.Event()
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"value": calls}
+
+    waiters = [asyncio.create_task(shared_cache.get_or_load("k", load, ttl=60)) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == [{"value": 1}] * 5
+    assert calls == 1
+    assert await shared_cache.get_or_load("k", load, ttl=60) == {"value": 1}
+
+
+@pytest.mark.asyncio
+async def test_load_overlapping_delete_is_not_stored(shared_cache):
+    async def load():
+        await shared_cache.delete("k")
+        return "stale"
+
+    assert await shared_cache.get_or_load("k", load, ttl=60) == "stale"
+    assert await shared_cache.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_loader_errors_reach_every_waiter():
+    cache = Cache(MemoryBackend())
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        raise RuntimeError("database down")
+
+    waiters = [asyncio.create_task(cache.get_or_load("k", load, ttl=60)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_ttl_and_lru(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: clock[0])
+    backend = MemoryBackend(max_entries=2)
+
+    await backend.set("a", b"1", ttl=10)
+    await backend.set("b", b"2", ttl=10)
+    assert await backend.get("a") == b"1"  # a is now the most recently used
+    await backend.set("c", b"3", ttl=10)
+
+    assert await backend.get("b") is None
+    assert await backend.get("a") == b"1"
+    clock[0] += 10
+    assert await backend.get("a") is None
+    assert len(backend) == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_byte_limit():
+    backend = MemoryBackend(max_bytes=10)
+    await backend.set("a", b"1234", ttl=10)
+    await backend.set("b", b"5678", ttl=10)
+    await backend.set("c", b"9012", ttl=10)
+    await backend.set("huge", b"x" * 11, ttl=10)
+
+    assert [await backend.get(key) for key in ("a", "b", "c", "huge")] == [None, b"5678", b"9012", None]
+    assert backend.size == 8
+
+
+@pytest.mark.asyncio
+async def test_raw_values_are_stored_as_is(shared_cache):
+    async def load():
+        return b'{"already":"encoded"}'
+
+    assert await shared_cache.get_or_load("k", load, ttl=60, raw=True) == b'{"already":"encoded"}'
+    assert await shared_cache.get_bytes("k") == b'{"already":"encoded"}'
+    assert await shared_cache.get("k") == {"already": "encoded"}
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_selects_database(resp_server):
+    backend = RedisBackend(resp_server.url)
+    await backend.set("k", b"v", ttl=1)
+    await backend.close()
+    assert resp_server.commands[:2] == [b"SELECT", b"SET"]
+
+
+@pytest.mark.asyncio
+async def test_unreachable_cache_server_is_a_miss(unused_tcp_port):
+    cache = Cache(RedisBackend(f"redis://127.0.0.1:{unused_tcp_port}", timeout=0.5))
+
+    async def load():
+        return {"loaded": True}
+
+    assert await cache.get_or_load("k", load, ttl=60) == {"loaded": True}
+    await cache.delete("k")
+    await cache.close()
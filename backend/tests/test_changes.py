@@ -0,0 +1,92 @@
+import pytest
+from pydantic import TypeAdapter
+
+from app.schemas import DecisionChangesResponse
+from tests.conftest import BINARY, MULTI_CHOICE
+
+
+async def changes(client, headers, since: str) -> dict:
+    response = await client.get("/api/v1/decisions/changes", params={"since": since}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_changes_since_cursor(client, auth_headers):
+    binary = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    multi = (await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)).json()
+    cursor = (await client.get("/api/v1/decisions/", headers=auth_headers)).headers["x-changes-cursor"]
+
+    roll = (await client.post(f"/api/v1/decisions/{binary['id']}/roll", headers=auth_headers)).json()
+    await client.post(
+        f"/api/v1/decisions/{binary['id']}/rolls/{roll['id']}/confirm", json={"followed": False}, headers=auth_headers
+    )
+    choices = multi["multi_choice_decision"]["choices"]
+    update = {"choices": [{"id": choices[0]["id"], "weight": 70}, {"id": choices[1]["id"], "weight": 30}]}
+    await client.put(f"/api/v1/decisions/{multi['id']}", json=update, headers=auth_headers)
+    removed = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    await client.delete(f"/api/v1/decisions/{removed['id']}", headers=auth_headers)
+
+    response = await client.get("/api/v1/decisions/changes", params={"since": cursor}, headers=auth_headers)
+    adapter = TypeAdapter(DecisionChangesResponse)
+    assert adapter.dump_json(adapter.validate_json(response.content)) == response.content
+    delta = response.json()
+
+    # A confirmed roll changes its decision's roll state even when not followed; the removed decision
+    # only shows up as deleted
+    assert sorted(decision["id"] for decision in delta["decisions"]) == [binary["id"], multi["id"]]
+    rolled, changed = sorted(delta["decisions"], key=lambda decision: decision["id"] != binary["id"])
+    assert rolled["binary_decision"]["probability"] == 50
+    assert rolled["pending_roll"] is None
+    assert rolled["last_confirmed_at"] == delta["rolls"][0]["created_at"]
+    assert changed["rolls"] == []
+    assert [choice["weight"] for choice in changed["multi_choice_decision"]["choices"]] == [70, 30]
+    assert [len(choice["weight_history"]) for choice in changed["multi_choice_decision"]["choices"]] == [2, 2]
+    assert [(r["id"], r["followed"]) for r in delta["rolls"]] == [(roll["id"], False)]
+    assert delta["deleted_decision_ids"] == [removed["id"]]
+
+    assert await changes(client, auth_headers, delta["cursor"]) == {
+        "cursor": delta["cursor"],
+        "decisions": [],
+        "rolls": [],
+        "deleted_decision_ids": [],
+    }
+
+
+@pytest.mark.asyncio
+async def test_followed_roll_reports_its_decision(client, auth_headers):
+    decision = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    roll = (
+        await client.post(f"/api/v1/decisions/{decision['id']}/roll", json={"probability": 80}, headers=auth_headers)
+    ).json()
+    cursor = (await changes(client, auth_headers, "0"))["cursor"]
+
+    await client.post(
+        f"/api/v1/decisions/{decision['id']}/rolls/{roll['id']}/confirm", json={"followed": True}, headers=auth_headers
+    )
+
+    delta = await changes(client, auth_headers, cursor)
+    assert [d["binary_decision"]["probability"] for d in delta["decisions"]] == [80]
+    assert [(r["id"], r["followed"]) for r in delta["rolls"]] == [(roll["id"], True)]
+
+
+@pytest.mark.asyncio
+async def test_roll_reports_pending_roll(client, auth_headers):
+    decision = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    cursor = (await changes(client, auth_headers, "0"))["cursor"]
+
+    roll = (await client.post(f"/api/v1/decisions/{decision['id']}/roll", headers=auth_headers)).json()
+
+    delta = await changes(client, auth_headers, cursor)
+    assert [d["id"] for d in delta["decisions"]] == [decision["id"]]
+    assert delta["decisions"][0]["pending_roll"]["id"] == roll["id"]
+    assert [r["id"] for r in delta["rolls"]] == [roll["id"]]
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor(client, auth_headers):
+    await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)
+    for since in ("abc", "-1", "2"):
+        response = await client.get("/api/v1/decisions/changes", params={"since": since}, headers=auth_headers)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
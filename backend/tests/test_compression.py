@@ -0,0 +1,150 @@
+import asyncio
+import zlib
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.compression import CompressionMiddleware, available_encodings, negotiate
+
+PAYLOAD = [
+    {"id": index, "result": "yes", "followed": True, "created_at": "2025-06-01T12:00:00Z"} for index in range(200)
+]
+
+
+def make_app(**options) -> CompressionMiddleware:
+    app = FastAPI()
+
+    @app.get("/rolls")
+    async def rolls():
+        return ORJSONResponse(PAYLOAD)
+
+    @app.get("/small")
+    async def small():
+        return ORJSONResponse({"ok": True})
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(3):
+                yield orjson.dumps(PAYLOAD[index * 50 : (index + 1) * 50]) + b"\n"
+
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    @app.get("/events")
+    async def events():
+        async def chunks():
+            yield b"event: roll_created\ndata: {}\n\n" * 100
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return CompressionMiddleware(app, **options)
+
+
+async def fetch(middleware, path: str, accept_encoding: str):
+    async with AsyncClient(transport=ASGITransport(app=middleware), base_url="http://test") as client:
+        return await client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+
+def test_negotiate():
+    encodings = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, deflate, br", encodings) == "br"
+    assert negotiate("gzip, br;q=0.5", encodings) == "gzip"
+    assert negotiate("*", encodings) == "zstd"
+    assert negotiate("*, zstd;q=0", encodings) == "br"
+    assert negotiate("GZIP;q=0.1", encodings) == "gzip"
+    assert negotiate("gzip;q=0, identity", encodings) is None
+    assert negotiate("", encodings) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", list(available_encodings()))
+async def test_compresses_in_negotiated_encoding(encoding):
+    middleware = make_app()
+    response = await fetch(middleware, "/rolls", encoding)
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) * 5 < len(orjson.dumps(PAYLOAD))
+    assert response.json() == PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_small_bodies_and_unwilling_clients_get_identity():
+    middleware = make_app(minimum_size=1024)
+
+    small = await fetch(middleware, "/small", "gzip")
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept-Encoding"
+    assert small.json() == {"ok": True}
+
+    identity = await fetch(middleware, "/rolls", "identity")
+    assert "content-encoding" not in identity.headers
+    assert identity.content == orjson.dumps(PAYLOAD)
+
+
+@pytest.mark.asyncio
+async def test_streams_are_compressed_chunk_by_chunk():
+    middleware = make_app()
+    async with AsyncClient(transport=ASGITransport(app=middleware), base_url="http://test") as client:
+        async with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            assert response.headers["content-encoding"] == "gzip"
+            assert "content-length" not in response.headers
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    lines = zlib.decompress(raw, 16 + zlib.MAX_WBITS).splitlines()
+    assert [item for line in lines for item in orjson.loads(line)] == PAYLOAD[:150]
+
+
+@pytest.mark.asyncio
+async def test_event_streams_are_not_compressed():
+    middleware = make_app()
+    response = await fetch(middleware, "/events", "gzip")
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_busy_worker_skips_compression():
+    middleware = make_app(max_in_flight=2)
+    middleware.in_flight = 2  # Two other requests in progress
+    busy = await fetch(middleware, "/rolls", "gzip")
+    assert "content-encoding" not in busy.headers
+    assert busy.headers["vary"] == "Accept-Encoding"
+
+    middleware.in_flight = 0
+    assert (await fetch(middleware, "/rolls", "gzip")).headers["content-encoding"] == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_open_event_streams_dont_count_as_load():
+    closed = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["path"] != "/events":
+            await ORJSONResponse(PAYLOAD)(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b": keepalive\n\n", "more_body": True})
+        await closed.wait()
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        await closed.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    middleware = CompressionMiddleware(app, max_in_flight=2)
+    scope = {"type": "http", "method": "GET", "path": "/events", "headers": [(b"accept-encoding", b"gzip")]}
+    streams = [asyncio.create_task(middleware(scope, receive, send)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert middleware.in_flight == 0
+
+    assert (await fetch(middleware, "/rolls", "gzip")).headers["content-encoding"] == "gzip"
+    closed.set()
+    await asyncio.gather(*streams)
+    assert middleware.in_flight == 0
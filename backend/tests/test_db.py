@@ -0,0 +1,155 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from starlette.requests import Request
+
+from app import db
+from app.db import (
+    PRIMARY_PIN_COOKIE,
+    TimedQueuePool,
+    get_engine_options,
+    get_pool_limits,
+    get_pool_stats,
+    get_read_db_session,
+    migrate_database,
+    pool_metrics,
+    read_schema_fingerprint,
+    schema_fingerprint,
+)
+from app.settings import get_settings, override_settings
+from tests.conftest import BINARY
+
+
+def test_pool_limits_default():
+    settings = get_settings().model_copy(update={"db_pool_size": 7, "db_pool_max_overflow": 3})
+    assert get_pool_limits(settings) == (7, 3)
+
+
+def test_pool_limits_split_across_workers():
+    settings = get_settings().model_copy(update={"db_max_connections": 90, "web_concurrency": 4})
+    assert get_pool_limits(settings) == (22, 0)
+
+
+def test_engine_options_for_asyncpg():
+    settings = get_settings().model_copy(
+        update={
+            "database_url": "postgresql+asyncpg://aleator@localhost/aleator",
+            "db_pool_pre_ping": False,
+            "db_statement_cache_size": 500,
+        }
+    )
+    options = get_engine_options(settings)
+    assert options["poolclass"] is TimedQueuePool
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {"prepared_statement_cache_size": 500}
+
+
+def test_engine_options_for_sqlite():
+    assert "pool_size" not in get_engine_options(get_settings())
+
+
+@pytest.mark.asyncio
+async def test_timed_pool_records_checkouts(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool)
+    before = pool_metrics.checkouts
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+
+    assert pool_metrics.checkouts == before + 1
+    assert pool_metrics.checkout_wait_seconds_max >= 0
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_capacity_follows_pool_limits(tmp_path, monkeypatch):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=2, max_overflow=3
+    )
+    monkeypatch.setattr(db, "_engine", engine)
+    try:
+        with override_settings(db_pool_size=2, db_pool_max_overflow=3):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                stats = get_pool_stats()
+    finally:
+        await engine.dispose()
+
+    assert (stats["checked_out"], stats["capacity"], stats["saturation"]) == (1, 5, 0.2)
+
+
+def make_request(cookie: str | None = None) -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+@pytest.mark.asyncio
+async def test_successful_writes_pin_the_client(client, auth_headers):
+    created = await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)
+    assert created.cookies[PRIMARY_PIN_COOKIE] == "1"
+    assert "max-age=5" in created.headers["set-cookie"].lower()
+
+    client.cookies.clear()
+    assert PRIMARY_PIN_COOKIE not in (await client.get("/api/v1/decisions/", headers=auth_headers)).cookies
+    failed = await client.post("/api/v1/decisions/999/roll", headers=auth_headers)
+    assert failed.status_code == 404
+    assert PRIMARY_PIN_COOKIE not in failed.cookies
+
+
+@pytest.mark.asyncio
+async def test_read_session_routing(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "_read_engine", None)
+    monkeypatch.setattr(db, "_read_session_maker", None)
+    primary = object()
+
+    async def read_session(settings, request):
+        sessions = get_read_db_session(request, settings, primary)  # type: ignore[arg-type]
+        session = await anext(sessions)
+        await sessions.aclose()
+        return session
+
+    # Without a replica, reads share the primary session
+    assert await read_session(get_settings(), make_request()) is primary
+
+    settings = get_settings().model_copy(update={"read_database_url": f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"})
+    try:
+        replica = await read_session(settings, make_request())
+        assert replica is not primary
+        assert replica.bind is db._read_engine
+
+        # After a write the client reads from the primary until its pin cookie expires
+        assert await read_session(settings, make_request(f"{PRIMARY_PIN_COOKIE}=1")) is primary
+    finally:
+        await db._read_engine.dispose()
+
+
+def test_schema_fingerprint_tracks_columns():
+    dialect = create_async_engine("sqlite+aiosqlite://").dialect
+    metadata = MetaData()
+    for table in SQLModel.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    assert schema_fingerprint(metadata, dialect) == schema_fingerprint(SQLModel.metadata, dialect)
+
+    metadata.tables["decision"].append_column(Column("extra", Integer))
+    assert schema_fingerprint(metadata, dialect) != schema_fingerprint(SQLModel.metadata, dialect)
+
+
+@pytest.mark.asyncio
+async def test_migration_is_skipped_once_fingerprint_matches(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'schema.db'}")
+    settings = get_settings().model_copy(update={"db_auto_create": True})
+    try:
+        assert await migrate_database(engine, settings) is True
+        async with engine.connect() as conn:
+            assert await read_schema_fingerprint(conn) == schema_fingerprint(SQLModel.metadata, engine.dialect)
+            assert (await conn.execute(text("SELECT COUNT(*) FROM decision"))).scalar() == 0
+
+        assert await migrate_database(engine, settings) is False
+
+        async with engine.begin() as conn:
+            await conn.execute(text("UPDATE schemafingerprint SET fingerprint = 'stale'"))
+        assert await migrate_database(engine, settings) is True
+    finally:
+        await engine.dispose()
@@ -1,36 +1,30 @@
+from datetime import datetime, timedelta, timezone
+
 import pytest
 import pytest_asyncio
-
-from app.auth import get_password_hash
-from app.models import BinaryDecision, Decision, DecisionType, User
-
-
-@pytest_asyncio.fixture
-async def test_user(session):
-    """Create a test user."""
-    user = User(email="test@example.com", hashed_password=get_password_hash("testpass123"))
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
-    return user
-
-
-@pytest_asyncio.fixture
-async def auth_headers(client, test_user):
-    """Get authentication headers for test user."""
-    login_data = {"username": test_user.email, "password": "testpass123"}
-
-    response = await client.post(
-        "/api/v1/auth/login", data=login_data, headers={"Content-Type": "application/x-www-form-urlencoded"}
-    )
-    token = response.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import func, select
+
+from app.metrics import response_cache_requests_total
+from app.models import (
+    BinaryDecision,
+    Choice,
+    Decision,
+    DecisionType,
+    MultiChoiceDecision,
+    Roll,
+    RollChoiceWeight,
+    WeightHistory,
+)
+from app.querycount import count_queries
+from app.settings import override_settings
+from tests.conftest import BINARY, MULTI_CHOICE
 
 
 @pytest_asyncio.fixture
-async def test_binary_decision(session, test_user):
+async def test_binary_decision(session, user):
     """Create a test binary decision."""
-    decision = Decision(user_id=test_user.id, title="Have dessert?", type=DecisionType.BINARY)
+    decision = Decision(user_id=user.id, title="Have dessert?", type=DecisionType.BINARY)
     session.add(decision)
     await session.commit()
     await session.refresh(decision)
@@ -93,6 +87,34 @@ class TestDecisionEndpoints:
         assert data["title"] == decision_data["title"]
         assert data["type"] == "multi_choice"
 
+    @pytest.mark.asyncio
+    async def test_create_multi_choice_decision_response_matches_stored(self, client, auth_headers):
+        """Test that the create response built from inserted rows matches the stored decision."""
+        decision_data = {
+            "title": "Which book?",
+            "type": "multi_choice",
+            "multi_choice_data": {"choices": [{"name": f"Book {i}", "weight": 10} for i in range(10)]},
+        }
+
+        response = await client.post("/api/v1/decisions/", json=decision_data, headers=auth_headers)
+
+        assert response.status_code == 201
+        created = response.json()
+        choices = created["multi_choice_decision"]["choices"]
+        assert [c["name"] for c in choices] == [f"Book {i}" for i in range(10)]
+        assert [c["display_order"] for c in choices] == list(range(10))
+        for choice in choices:
+            assert len(choice["weight_history"]) == 1
+            assert choice["weight_history"][0]["choice_id"] == choice["id"]
+            assert choice["weight_history"][0]["weight"] == 10
+
+        response = await client.get(f"/api/v1/decisions/{created['id']}", headers=auth_headers)
+        stored = response.json()
+        for choice in [*choices, *stored["multi_choice_decision"]["choices"]]:
+            for entry in choice["weight_history"]:
+                entry.pop("changed_at")  # SQLite drops the timezone on reload
+        assert stored["multi_choice_decision"]["choices"] == choices
+
     @pytest.mark.asyncio
     async def test_create_decision_invalid_weights(self, client, auth_headers):
         """Test creating multi-choice decision with invalid weights."""
@@ -141,6 +163,23 @@ class TestDecisionEndpoints:
 
         assert response.status_code == 404
 
+    @pytest.mark.asyncio
+    async def test_responses_are_cached_until_data_changes(self, client, auth_headers, test_binary_decision):
+        """Test that unchanged users get cached list and detail bodies, and writes make them miss."""
+        paths = ["/api/v1/decisions/", f"/api/v1/decisions/{test_binary_decision.id}"]
+        first = [(await client.get(path, headers=auth_headers)).content for path in paths]
+        hits = response_cache_requests_total.values.get(("decisions", "hit"), 0)
+
+        with count_queries() as log:
+            assert [(await client.get(path, headers=auth_headers)).content for path in paths] == first
+        assert log.count == 4  # Authentication and the data version, per request
+        assert response_cache_requests_total.values[("decisions", "hit")] == hits + 1
+
+        await client.put(f"/api/v1/decisions/{test_binary_decision.id}", json={"title": "New"}, headers=auth_headers)
+        decisions = (await client.get(paths[0], headers=auth_headers)).json()
+        decision = (await client.get(paths[1], headers=auth_headers)).json()
+        assert decisions[0]["title"] == decision["title"] == "New"
+
     @pytest.mark.asyncio
     async def test_update_decision(self, client, auth_headers, test_binary_decision):
         """Test updating a decision."""
@@ -154,6 +193,73 @@ class TestDecisionEndpoints:
         data = response.json()
         assert data["title"] == update_data["title"]
 
+    @pytest.mark.asyncio
+    async def test_update_multi_choice_weights(self, client, auth_headers):
+        """Test that only changed weights get a history entry and the response includes it."""
+        response = await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)
+        created = response.json()
+        pizza, salad = created["multi_choice_decision"]["choices"]
+
+        update_data = {
+            "choices": [{"id": pizza["id"], "weight": 70}, {"id": salad["id"], "weight": 30}],
+            "multi_choice_names": [{"id": salad["id"], "name": "Soup"}],
+        }
+        response = await client.put(f"/api/v1/decisions/{created['id']}", json=update_data, headers=auth_headers)
+
+        assert response.status_code == 200
+        pizza, soup = response.json()["multi_choice_decision"]["choices"]
+        assert (pizza["weight"], soup["weight"], soup["name"]) == (70, 30, "Soup")
+        assert [h["weight"] for h in pizza["weight_history"]] == [50, 70]
+        assert [h["weight"] for h in soup["weight_history"]] == [50, 30]
+
+        # Unchanged weights don't add history
+        update_data = {"choices": [{"id": pizza["id"], "weight": 70}, {"id": soup["id"], "weight": 30}]}
+        response = await client.put(f"/api/v1/decisions/{created['id']}", json=update_data, headers=auth_headers)
+        pizza, soup = response.json()["multi_choice_decision"]["choices"]
+        assert len(pizza["weight_history"]) == 2
+        assert len(soup["weight_history"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_update_coalesces_history_bursts(self, client, auth_headers):
+        """Test that when enabled, quick changes overwrite the latest history entry but not the initial one."""
+        with override_settings(history_coalesce_seconds=10):
+            created = (await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)).json()
+            pizza, salad = created["multi_choice_decision"]["choices"]
+            for weight in (60, 70, 80):
+                update_data = {
+                    "choices": [{"id": pizza["id"], "weight": weight}, {"id": salad["id"], "weight": 100 - weight}]
+                }
+                response = await client.put(
+                    f"/api/v1/decisions/{created['id']}", json=update_data, headers=auth_headers
+                )
+                assert response.status_code == 200
+
+            pizza, salad = response.json()["multi_choice_decision"]["choices"]
+            assert [h["weight"] for h in pizza["weight_history"]] == [50, 80]
+            assert [h["weight"] for h in salad["weight_history"]] == [50, 20]
+
+            created = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+            for probability in (55, 60, 65):
+                await client.put(
+                    f"/api/v1/decisions/{created['id']}", json={"probability": probability}, headers=auth_headers
+                )
+
+            decision = (await client.get(f"/api/v1/decisions/{created['id']}", headers=auth_headers)).json()
+            assert [h["probability"] for h in decision["probability_history"]] == [50, 65]
+
+    @pytest.mark.asyncio
+    async def test_update_unknown_choice_changes_nothing(self, client, auth_headers):
+        """Test that an invalid choice id is rejected before any field is modified."""
+        response = await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)
+        created = response.json()
+
+        update_data = {"title": "Changed", "multi_choice_names": [{"id": 9999, "name": "Soup"}]}
+        response = await client.put(f"/api/v1/decisions/{created['id']}", json=update_data, headers=auth_headers)
+
+        assert response.status_code == 400
+        response = await client.get(f"/api/v1/decisions/{created['id']}", headers=auth_headers)
+        assert response.json()["title"] == MULTI_CHOICE["title"]
+
     @pytest.mark.asyncio
     async def test_roll_binary_decision(self, client, auth_headers, test_binary_decision):
         """Test rolling a binary decision."""
@@ -189,6 +295,81 @@ class TestDecisionEndpoints:
         # This is probabilistic, so we just check that all results are valid
         assert all(result in ["yes", "no"] for result in results)
 
+    @pytest.mark.asyncio
+    async def test_only_one_pending_roll(self, client, auth_headers, session, test_binary_decision):
+        """Test that a decision with a pending roll can't get a second one, however it is inserted."""
+        url = f"/api/v1/decisions/{test_binary_decision.id}/roll"
+        assert (await client.post(url, headers=auth_headers)).status_code == 200
+
+        response = await client.post(url, headers=auth_headers)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "You have a pending roll that must be confirmed first"
+
+        session.add(Roll(decision_id=test_binary_decision.id, result="no"))
+        with pytest.raises(IntegrityError):
+            await session.commit()
+        await session.rollback()
+
+    @pytest.mark.asyncio
+    async def test_list_reports_roll_state(self, client, auth_headers, session, test_binary_decision):
+        """Test that the decision list carries the pending roll and cooldown without scanning rolls."""
+        test_binary_decision.cooldown_hours = 24
+        await session.commit()
+
+        async def listed() -> dict:
+            response = await client.get("/api/v1/decisions/", headers=auth_headers)
+            return next(d for d in response.json() if d["id"] == test_binary_decision.id)
+
+        decision = await listed()
+        assert (decision["pending_roll"], decision["last_confirmed_at"], decision["cooldown_ends_at"]) == (
+            None,
+            None,
+            None,
+        )
+
+        roll = (await client.post(f"/api/v1/decisions/{test_binary_decision.id}/roll", headers=auth_headers)).json()
+        decision = await listed()
+        assert decision["pending_roll"] == decision["rolls"][-1]
+        assert decision["pending_roll"]["id"] == roll["id"]
+        assert decision["cooldown_ends_at"] is None
+
+        await client.post(
+            f"/api/v1/decisions/{test_binary_decision.id}/rolls/{roll['id']}/confirm",
+            headers=auth_headers,
+            json={"followed": False},
+        )
+        decision = await listed()
+        assert decision["pending_roll"] is None
+        assert decision["last_confirmed_at"] == decision["rolls"][-1]["created_at"]
+        last_confirmed_at = datetime.fromisoformat(decision["last_confirmed_at"])
+        assert datetime.fromisoformat(decision["cooldown_ends_at"]) == last_confirmed_at + timedelta(hours=24)
+
+    @pytest.mark.asyncio
+    async def test_roll_respects_cooldown(self, client, auth_headers, session, test_binary_decision):
+        """Test that only a confirmed roll within the cooldown window blocks the next roll."""
+        decision_id = test_binary_decision.id
+        test_binary_decision.cooldown_hours = 24
+        old_roll = Roll(
+            decision_id=decision_id,
+            result="yes",
+            followed=True,
+            created_at=datetime.now(timezone.utc) - timedelta(hours=30),
+        )
+        session.add(old_roll)
+        await session.commit()
+
+        response = await client.post(f"/api/v1/decisions/{decision_id}/roll", headers=auth_headers)
+        assert response.status_code == 200
+        await client.post(
+            f"/api/v1/decisions/{decision_id}/rolls/{response.json()['id']}/confirm",
+            headers=auth_headers,
+            json={"followed": True},
+        )
+
+        response = await client.post(f"/api/v1/decisions/{decision_id}/roll", headers=auth_headers)
+        assert response.status_code == 400
+        assert "cooldown" in response.json()["detail"]
+
     @pytest.mark.asyncio
     async def test_unauthorized_access(self, client):
         """Test that endpoints require authentication."""
@@ -198,3 +379,60 @@ class TestDecisionEndpoints:
 
         response = await client.post("/api/v1/decisions/", json={})
         assert response.status_code == 403
+
+    @pytest.mark.asyncio
+    async def test_delete_decision_removes_its_rows(self, client, auth_headers, session):
+        """Test that deleting a decision deletes its choices, history and rolls."""
+        response = await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)
+        decision_id = response.json()["id"]
+        roll = (await client.post(f"/api/v1/decisions/{decision_id}/roll", headers=auth_headers)).json()
+        await client.post(
+            f"/api/v1/decisions/{decision_id}/rolls/{roll['id']}/confirm",
+            json={"followed": True},
+            headers=auth_headers,
+        )
+
+        response = await client.delete(f"/api/v1/decisions/{decision_id}", headers=auth_headers)
+
+        assert response.status_code == 204
+        for model in (Decision, MultiChoiceDecision, Choice, WeightHistory, Roll, RollChoiceWeight):
+            assert (await session.exec(select(func.count()).select_from(model))).one() == 0
+        response = await client.get(f"/api/v1/decisions/{decision_id}", headers=auth_headers)
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_reorder_decisions(self, client, auth_headers):
+        """Test reordering decisions returns only the new orders."""
+        ids = []
+        for title in ["First", "Second", "Third"]:
+            response = await client.post("/api/v1/decisions/", json={**BINARY, "title": title}, headers=auth_headers)
+            ids.append(response.json()["id"])
+
+        orders = [{"id": ids[2], "order": 0}, {"id": ids[0], "order": 1}, {"id": ids[1], "order": 2}]
+        response = await client.post(
+            "/api/v1/decisions/reorder", json={"decision_orders": orders}, headers=auth_headers
+        )
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {"id": ids[2], "display_order": 0},
+            {"id": ids[0], "display_order": 1},
+            {"id": ids[1], "display_order": 2},
+        ]
+
+        response = await client.get("/api/v1/decisions/", headers=auth_headers)
+        assert [d["id"] for d in response.json()] == [ids[2], ids[0], ids[1]]
+
+    @pytest.mark.asyncio
+    async def test_reorder_decisions_unknown_id(self, client, auth_headers, test_binary_decision):
+        """Test that reordering with a foreign or missing decision changes nothing."""
+        decision_id = test_binary_decision.id
+        orders = [{"id": decision_id, "order": 5}, {"id": 9999, "order": 6}]
+        response = await client.post(
+            "/api/v1/decisions/reorder", json={"decision_orders": orders}, headers=auth_headers
+        )
+
+        assert response.status_code == 404
+
+        response = await client.get(f"/api/v1/decisions/{decision_id}", headers=auth_headers)
+        assert response.json()["display_order"] == 0
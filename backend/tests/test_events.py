@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+
+from app.api.v1.events import event_stream, stream_events
+from app.auth import create_stream_ticket, get_stream_user
+from app.events import RESYNC, Event, EventBroker, Subscription, get_event_broker
+from app.settings import get_settings, override_settings
+
+
+@pytest.fixture
+def broker(app):
+    broker = EventBroker()
+    app.dependency_overrides[get_event_broker] = lambda: broker
+    return broker
+
+
+def parse(chunk: bytes) -> tuple[str, dict]:
+    lines = dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+    return lines["event"], orjson.loads(lines["data"])
+
+
+def drain(subscription) -> list[tuple[str, dict]]:
+    events = []
+    while not subscription.queue.empty():
+        event = subscription.queue.get_nowait()
+        events.append((event.type, event.data))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_broker_delivers_to_the_users_subscriptions():
+    broker = EventBroker()
+    with broker.subscribe(1) as first, broker.subscribe(1) as second, broker.subscribe(2) as other:
+        await broker.publish(1, "roll_created", decision_id=5, at=datetime(2025, 1, 1, tzinfo=timezone.utc))
+
+        expected = [("roll_created", {"decision_id": 5, "at": "2025-01-01T00:00:00+00:00"})]
+        assert drain(first) == drain(second) == expected
+        assert drain(other) == []
+        assert broker.subscriber_count() == 3
+    assert broker.subscriber_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_resync():
+    subscription = Subscription(1, maxsize=3)
+    for index in range(4):
+        subscription.put(Event("roll_created", {"roll_id": index}))
+    assert drain(subscription) == [(RESYNC.type, RESYNC.data)]
+
+
+@pytest.mark.asyncio
+async def test_stream_emits_events_and_cooldown_end():
+    broker = EventBroker()
+    cooldown_ends = {7: datetime.now(timezone.utc) + timedelta(milliseconds=50)}
+    stream = event_stream(broker, 1, cooldown_ends, keepalive_seconds=0.02)
+    try:
+        assert await anext(stream) == b"retry: 5000\n\n"
+        assert await anext(stream) == b": keepalive\n\n"
+
+        for _ in range(50):
+            chunk = await anext(stream)
+            if not chunk.startswith(b":"):
+                break
+        assert parse(chunk) == ("cooldown_ended", {"decision_id": 7})
+
+        ends_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        await broker.publish(1, "roll_confirmed", decision_id=8, followed=True, cooldown_ends_at=ends_at)
+        chunk = await anext(stream)
+        while chunk.startswith(b":"):
+            chunk = await anext(stream)
+        assert parse(chunk)[0] == "roll_confirmed"
+        assert cooldown_ends == {8: ends_at}
+    finally:
+        await stream.aclose()
+    assert broker.subscriber_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_endpoints_publish_changes(client, auth_headers, broker, user):
+    decision_data = {"title": "Run?", "type": "binary", "binary_data": {"probability": 50}, "cooldown_hours": 2}
+    with broker.subscribe(user.id) as subscription:
+        decision = (await client.post("/api/v1/decisions/", json=decision_data, headers=auth_headers)).json()
+        roll = (await client.post(f"/api/v1/decisions/{decision['id']}/roll", headers=auth_headers)).json()
+        await client.post(
+            f"/api/v1/decisions/{decision['id']}/rolls/{roll['id']}/confirm",
+            json={"followed": True},
+            headers=auth_headers,
+        )
+        await client.put(f"/api/v1/decisions/{decision['id']}", json={"cooldown_hours": 0}, headers=auth_headers)
+        await client.delete(f"/api/v1/decisions/{decision['id']}", headers=auth_headers)
+
+        events = drain(subscription)
+
+    assert [event_type for event_type, _ in events] == [
+        "decision_created",
+        "roll_created",
+        "roll_confirmed",
+        "decision_updated",
+        "decision_deleted",
+    ]
+    assert events[1][1] == {"decision_id": decision["id"], "roll_id": roll["id"], "result": roll["result"]}
+    confirmed = events[2][1]
+    rolled_at = datetime.fromisoformat(roll["created_at"]).replace(tzinfo=timezone.utc)
+    assert datetime.fromisoformat(confirmed["cooldown_ends_at"]) == rolled_at + timedelta(hours=2)
+    assert events[3][1] == {"decision_id": decision["id"], "cooldown_ends_at": None}
+
+
+@pytest.mark.asyncio
+async def test_stream_requires_a_token(client):
+    assert (await client.get("/api/v1/events")).status_code == 401
+    assert (await client.get("/api/v1/events", params={"ticket": "nonsense"})).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_stream_ticket_only_opens_streams(client, session, auth_headers, user):
+    response = await client.post("/api/v1/events/ticket", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["expires_in"] == 60
+    ticket = response.json()["ticket"]
+
+    settings = get_settings()
+    assert await get_stream_user(credentials=None, ticket=ticket, session=session, settings=settings) == user
+    # Long-lived tokens stay out of query strings, and tickets don't work as access tokens
+    access_token = auth_headers["Authorization"].removeprefix("Bearer ")
+    assert (await client.get("/api/v1/events", params={"ticket": access_token})).status_code == 401
+    assert (await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {ticket}"})).status_code == 401
+
+    with override_settings(events_ticket_seconds=-1) as expired:
+        stale = create_stream_ticket(user, expired)
+    assert (await client.get("/api/v1/events", params={"ticket": stale})).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_stream_response_subscribes_until_closed(session, user, broker):
+    response = await stream_events(current_user=user, session=session, settings=get_settings(), broker=broker)
+    assert response.media_type == "text/event-stream"
+    assert response.headers["x-accel-buffering"] == "no"
+
+    body = response.body_iterator
+    assert await anext(body) == b"retry: 5000\n\n"
+    assert broker.subscriber_count(user.id) == 1
+    await body.aclose()
+    await asyncio.sleep(0)
+    assert broker.subscriber_count(user.id) == 0
@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import col, select
+
+from app.models import Choice, Decision, DecisionType, Roll, RollChoiceWeight, User, WeightHistory
+from generate_test_data import generate
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+async def _generate(engine, **kwargs):
+    options = dict(users=3, decisions_per_user=6, rolls_per_decision=20, batch_size=50, now=NOW)
+    return await generate(engine, **(options | kwargs))
+
+
+@pytest.mark.asyncio
+async def test_generate_writes_consistent_data(engine):
+    counts = await _generate(engine)
+
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(func.count()).select_from(Roll))).scalar() == counts["roll"]
+        types = set((await conn.execute(select(col(Decision.type)))).scalars())
+        assert types == {DecisionType.BINARY, DecisionType.MULTI_CHOICE}
+
+        # At most one pending roll per decision, and it is the latest one
+        pending = (
+            await conn.execute(
+                select(col(Roll.decision_id), func.count())
+                .where(col(Roll.followed).is_(None))
+                .group_by(Roll.decision_id)
+            )
+        ).all()
+        assert pending and all(n == 1 for _, n in pending)
+        for decision_id, _ in pending:
+            latest = (
+                await conn.execute(
+                    select(col(Roll.followed))
+                    .where(Roll.decision_id == decision_id)
+                    .order_by(col(Roll.created_at).desc())
+                )
+            ).first()
+            assert latest == (None,)
+
+        # Every multi-choice roll stores the weight of every choice, and they sum to 100
+        weights = (
+            await conn.execute(
+                select(func.count(), func.sum(RollChoiceWeight.weight)).group_by(RollChoiceWeight.roll_id)
+            )
+        ).all()
+        choices = dict(
+            (await conn.execute(select(col(Choice.decision_id), func.count()).group_by(Choice.decision_id))).all()
+        )
+        multi_rolls = (
+            await conn.execute(select(func.count()).select_from(Roll).where(col(Roll.decision_id).in_(choices)))
+        ).scalar()
+        assert len(weights) == multi_rolls
+        assert all(total == 100 for _, total in weights)
+        assert counts["weighthistory"] >= sum(choices.values())
+
+
+@pytest.mark.asyncio
+async def test_generate_is_deterministic(engine, tmp_path):
+    other = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/other.db")
+    try:
+        await _generate(engine, seed=7)
+        await _generate(other, seed=7)
+
+        query = select(Roll.decision_id, Roll.result, Roll.followed, Roll.created_at).order_by(Roll.id)
+        async with engine.connect() as first, other.connect() as second:
+            assert (await first.execute(query)).all() == (await second.execute(query)).all()
+    finally:
+        await other.dispose()
+
+
+@pytest.mark.asyncio
+async def test_generate_skips_existing_users_and_continues_ids(engine):
+    await _generate(engine, users=1)
+    counts = await _generate(engine, users=2)
+
+    assert counts["user"] == 1
+    async with engine.connect() as conn:
+        emails = (await conn.execute(select(User.email).order_by(User.id))).scalars().all()
+        assert emails == ["test@example.com", "test+1@example.com"]
+        ids = (await conn.execute(select(WeightHistory.id))).scalars().all()
+        assert len(ids) == len(set(ids))
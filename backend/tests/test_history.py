@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import select
+
+from app.history import compact_history, superseded_rows
+from app.models import Choice, Decision, DecisionType, MultiChoiceDecision, ProbabilityHistory, User, WeightHistory
+
+T0 = datetime(2025, 1, 1, 12)
+
+
+def test_superseded_rows_keeps_burst_ends_and_first_rows():
+    seconds = [0, 100, 103, 106, 300, 302]
+    rows = [(index + 1, 1, T0 + timedelta(seconds=offset)) for index, offset in enumerate(seconds)]
+    # Owner 2's first row is within the window of its second one but still kept
+    rows += [(7, 2, T0), (8, 2, T0 + timedelta(seconds=1))]
+
+    assert superseded_rows(rows, timedelta(seconds=10)) == [2, 3, 5]
+    assert superseded_rows(rows, timedelta(0)) == []
+
+
+@pytest.mark.asyncio
+async def test_compact_history(session):
+    user = User(email="history@example.com", hashed_password="x")
+    session.add(user)
+    await session.flush()
+    decision = Decision(user_id=user.id, title="Run?", type=DecisionType.BINARY)
+    session.add(decision)
+    await session.flush()
+    for probability, offset in [(50, 0), (55, 100), (60, 102), (65, 104), (70, 500)]:
+        session.add(
+            ProbabilityHistory(
+                decision_id=decision.id, probability=probability, changed_at=T0 + timedelta(seconds=offset)
+            )
+        )
+    await session.commit()
+
+    assert await compact_history(session, timedelta(seconds=10)) == {"probabilityhistory": 2, "weighthistory": 0}
+
+    result = await session.exec(select(ProbabilityHistory.probability).order_by(ProbabilityHistory.id))
+    assert result.all() == [50, 65, 70]
+
+    # Delta sync and cached responses must see the change
+    result = await session.exec(select(User.data_version, Decision.version).join(Decision))
+    assert result.all() == [(1, 1)]
+
+
+@pytest.mark.asyncio
+async def test_compact_history_pages_through_decisions(session):
+    user = User(email="history@example.com", hashed_password="x")
+    session.add(user)
+    await session.flush()
+    for title in ["Lunch?", "Dinner?", "Dessert?"]:
+        decision = Decision(user_id=user.id, title=title, type=DecisionType.MULTI_CHOICE)
+        session.add(decision)
+        await session.flush()
+        session.add(MultiChoiceDecision(decision_id=decision.id))
+        choice = Choice(decision_id=decision.id, name="Soup", weight=100)
+        session.add(choice)
+        await session.flush()
+        for weight, offset in [(50, 0), (60, 100), (70, 102)]:
+            session.add(WeightHistory(choice_id=choice.id, weight=weight, changed_at=T0 + timedelta(seconds=offset)))
+    await session.commit()
+
+    deleted = await compact_history(session, timedelta(seconds=10), page_size=2)
+
+    assert deleted == {"probabilityhistory": 0, "weighthistory": 3}
+    result = await session.exec(select(WeightHistory.weight).order_by(WeightHistory.id))
+    assert result.all() == [50, 70] * 3
+    # One page of two decisions, then one of one: a version bump each
+    result = await session.exec(select(Decision.version).order_by(Decision.id))
+    assert result.all() == [1, 1, 2]
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.v1 import decisions
+from app.auth import get_password_hash
+from app.db import get_db_session
+from app.models import IdempotencyKey, Roll, User
+from tests.conftest import BINARY, PASSWORD
+
+
+@pytest.mark.asyncio
+async def test_retried_roll_and_confirm_replay_the_original(client, session, auth_headers):
+    decision = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    roll_url = f"/api/v1/decisions/{decision['id']}/roll"
+
+    first = await client.post(roll_url, headers={**auth_headers, "Idempotency-Key": "roll-1"})
+    retry = await client.post(roll_url, headers={**auth_headers, "Idempotency-Key": "roll-1"})
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert (await session.exec(select(func.count(Roll.id)))).one() == 1
+    # The response is kept in the database with the roll, not in the evictable cache
+    stored = (await session.exec(select(IdempotencyKey))).one()
+    assert (stored.key, stored.body) == ("roll-1", first.content)
+
+    # Without a key the retry runs again and finds the pending roll
+    assert (await client.post(roll_url, headers=auth_headers)).status_code == 400
+
+    confirm_url = f"/api/v1/decisions/{decision['id']}/rolls/{first.json()['id']}/confirm"
+    for _ in range(2):
+        response = await client.post(
+            confirm_url, json={"followed": True}, headers={**auth_headers, "Idempotency-Key": "confirm-1"}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"message": "Roll confirmed", "followed": True}
+
+
+@pytest.mark.asyncio
+async def test_key_reused_for_another_request(client, auth_headers):
+    first = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    second = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    headers = {**auth_headers, "Idempotency-Key": "same"}
+
+    assert (await client.post(f"/api/v1/decisions/{first['id']}/roll", headers=headers)).status_code == 200
+    response = await client.post(f"/api/v1/decisions/{second['id']}/roll", headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Idempotency-Key was already used for a different request"
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_replayed(client, auth_headers):
+    decision = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    headers = {**auth_headers, "Idempotency-Key": "roll-1"}
+
+    missing = await client.post("/api/v1/decisions/999/roll", headers=headers)
+    assert missing.status_code == 404
+    missing_retry = await client.post("/api/v1/decisions/999/roll", headers=headers)
+    assert missing_retry.status_code == 404
+    assert "idempotent-replayed" not in missing_retry.headers
+    # A key whose request failed is still free
+    assert (await client.post(f"/api/v1/decisions/{decision['id']}/roll", headers=headers)).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_expired_key_runs_again(client, session, auth_headers):
+    decision = (await client.post("/api/v1/decisions/", json=BINARY, headers=auth_headers)).json()
+    roll_url = f"/api/v1/decisions/{decision['id']}/roll"
+    headers = {**auth_headers, "Idempotency-Key": "roll-1"}
+
+    first = (await client.post(roll_url, headers=headers)).json()
+    confirm_url = f"/api/v1/decisions/{decision['id']}/rolls/{first['id']}/confirm"
+    assert (await client.post(confirm_url, json={"followed": False}, headers=auth_headers)).status_code == 200
+    await session.exec(update(IdempotencyKey).values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    await session.commit()
+
+    retry = await client.post(roll_url, headers=headers)
+    assert retry.status_code == 200
+    assert "idempotent-replayed" not in retry.headers
+    assert retry.json()["id"] != first["id"]
+    # The expired row was replaced, not kept next to the new one
+    assert (await session.exec(select(func.count(IdempotencyKey.id)))).one() == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_retry_waits_for_the_original(app, client, tmp_path, monkeypatch):
+    # Each request gets its own session on a file database, so the two transactions really overlap
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'retry.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def own_session():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db_session] = own_session
+    async with session_maker() as session:
+        session.add(User(email="retry@example.com", hashed_password=get_password_hash(PASSWORD)))
+        await session.commit()
+    login = await client.post("/api/v1/auth/login", data={"username": "retry@example.com", "password": PASSWORD})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    decision = (await client.post("/api/v1/decisions/", json=BINARY, headers=headers)).json()
+
+    # The original is still rolling, uncommitted, when its retry arrives
+    rolling = asyncio.Event()
+    roll_decision = decisions.roll_decision
+
+    async def slow_roll_decision(*args, **kwargs):
+        roll = await roll_decision(*args, **kwargs)
+        rolling.set()
+        await asyncio.sleep(0.2)
+        return roll
+
+    monkeypatch.setattr(decisions, "roll_decision", slow_roll_decision)
+    url = f"/api/v1/decisions/{decision['id']}/roll"
+    keyed = {**headers, "Idempotency-Key": "roll-1"}
+    original = asyncio.create_task(client.post(url, headers=keyed))
+    await rolling.wait()
+    retry = await client.post(url, headers=keyed)
+    original = await original
+
+    assert original.status_code == retry.status_code == 200
+    assert retry.json() == original.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    async with session_maker() as session:
+        assert (await session.exec(select(func.count(Roll.id)))).one() == 1
+    await engine.dispose()
@@ -0,0 +1,36 @@
+import pytest
+
+from app.metrics import Histogram
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Test histogram.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.1, route="/a")
+    histogram.observe(5, route="/a")
+
+    assert histogram.samples() == [
+        'test_seconds_bucket{route="/a",le="0.1"} 2',
+        'test_seconds_bucket{route="/a",le="1"} 2',
+        'test_seconds_bucket{route="/a",le="+Inf"} 3',
+        'test_seconds_sum{route="/a"} 5.15',
+        'test_seconds_count{route="/a"} 3',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client):
+    """Test that requests are recorded per route template, including their database queries."""
+    await client.get("/api/v1/stats/")
+    await client.get("/api/v1/decisions/12345")
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'aleator_http_requests_total{method="GET",route="/api/v1/stats/",status="200"}' in body
+    assert 'route="/api/v1/decisions/{decision_id}"' in body
+    assert "/api/v1/decisions/12345" not in body
+    assert 'aleator_db_queries_total{route="/api/v1/stats/"}' in body
+    assert "# TYPE aleator_http_request_duration_seconds histogram" in body
@@ -0,0 +1,126 @@
+import asyncio
+import os
+from datetime import date, datetime, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Decision, Roll, User
+from app.partitioning import (
+    add_months,
+    convert_roll_table_sql,
+    create_partition_sql,
+    is_roll_table_partitioned,
+    months_between,
+    partition_name,
+    prepare_roll_partitions,
+)
+from app.schemas import DecisionCreate
+from app.services import PENDING_ROLL_ERROR, confirm_roll, create_decision, roll_decision
+from app.settings import get_settings
+from tests.conftest import BINARY
+
+# A disposable PostgreSQL database; its tables are dropped and recreated
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+def test_add_months_wraps_years():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+def test_months_between():
+    assert months_between(date(2025, 11, 20), date(2026, 1, 1)) == [
+        date(2025, 11, 1),
+        date(2025, 12, 1),
+        date(2026, 1, 1),
+    ]
+
+
+def test_create_partition_sql():
+    assert partition_name(date(2025, 12, 1)) == "roll_2025_12"
+    assert create_partition_sql(date(2025, 12, 1)) == (
+        "CREATE TABLE IF NOT EXISTS roll_2025_12 PARTITION OF roll "
+        "FOR VALUES FROM ('2025-12-01 00:00:00+00') TO ('2026-01-01 00:00:00+00')"
+    )
+
+
+def test_partitioned_primary_key_includes_partition_key():
+    assert "ALTER TABLE roll ADD CONSTRAINT roll_pkey PRIMARY KEY (id, created_at)" in convert_roll_table_sql()
+
+
+@pytest.mark.asyncio
+async def test_prepare_roll_partitions_skips_sqlite(engine):
+    settings = get_settings().model_copy(update={"db_partition_rolls": True})
+    await prepare_roll_partitions(engine, settings)
+
+
+@pytest_asyncio.fixture
+async def postgres_engine():
+    if not POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_async_engine(POSTGRES_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield engine
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.postgres
+@pytest.mark.asyncio
+async def test_converted_table_keeps_rows_and_refuses_second_pending_roll(postgres_engine):
+    session_maker = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        user = User(email="partitions@example.com", hashed_password="x")
+        session.add(user)
+        await session.commit()
+        decision_id = (await create_decision(user, DecisionCreate(**BINARY), session)).id
+        old = Roll(
+            decision_id=decision_id, result="yes", followed=True, created_at=datetime(2025, 1, 15, tzinfo=timezone.utc)
+        )
+        session.add(old)
+        await session.commit()
+
+    settings = get_settings().model_copy(update={"db_partition_rolls": True})
+    await prepare_roll_partitions(postgres_engine, settings)
+
+    async with postgres_engine.connect() as conn:
+        assert await is_roll_table_partitioned(conn)
+        rows = await conn.execute(text("SELECT tableoid::regclass::text, id FROM roll"))
+        assert rows.all() == [("roll_2025_01", old.id)]
+
+    async with session_maker() as first, session_maker() as second:
+        decision = await first.get(Decision, decision_id)
+        assert decision is not None
+        roll = await roll_decision(decision, first)
+        await first.commit()
+        # Without the unique index, the NOT EXISTS check alone refuses a second pending roll
+        with pytest.raises(ValueError, match=PENDING_ROLL_ERROR):
+            await roll_decision(decision, first)
+        await first.rollback()
+        decision = await first.get(Decision, decision_id)
+        roll = (await first.exec(select(Roll).where(Roll.id == roll.id))).one()
+        await confirm_roll(roll, False, first)
+        await first.commit()
+
+        # A concurrent roll waits on the user row the first one locked, then sees its pending roll
+        await roll_decision(decision, first)
+        other = await second.get(Decision, decision_id)
+        assert other is not None
+        racing = asyncio.create_task(roll_decision(other, second))
+        await asyncio.sleep(0.2)
+        assert not racing.done()
+        await first.commit()
+        with pytest.raises(ValueError, match=PENDING_ROLL_ERROR):
+            await racing
+
+    async with session_maker() as session:
+        pending = await session.exec(select(Roll).where(Roll.decision_id == decision_id, Roll.followed == None))  # noqa: E711
+        assert len(pending.all()) == 1
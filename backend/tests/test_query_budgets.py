@@ -0,0 +1,103 @@
+import logging
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlmodel import select
+
+from app import create_app
+from app.models import User
+from app.querycount import QueryBudgetExceeded, count_queries, query_budget
+from app.settings import override_settings
+from tests.conftest import MULTI_CHOICE
+
+
+@pytest.mark.asyncio
+async def test_count_queries_detects_repeats(session):
+    with count_queries() as outer:
+        for _ in range(3):
+            await session.exec(select(User))
+        with count_queries() as inner:
+            await session.exec(select(User.id))
+
+    assert outer.count == 4
+    assert inner.count == 1
+    assert list(outer.repeated(3).values()) == [3]
+
+
+@pytest.mark.asyncio
+async def test_query_budget_exceeded(session):
+    @query_budget(1)
+    async def two_queries():
+        await session.exec(select(User))
+        await session.exec(select(User))
+
+    with pytest.raises(QueryBudgetExceeded, match="2 queries executed, budget is 1"):
+        await two_queries()
+
+
+@pytest.mark.asyncio
+async def test_decision_endpoint_budgets(client, auth_headers, max_queries):
+    # Authentication, the version bump, the limit check and the four INSERTs
+    with max_queries(7):
+        response = await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)
+    decision = response.json()
+    choices = decision["multi_choice_decision"]["choices"]
+
+    with max_queries(8):
+        update = {"choices": [{"id": choices[0]["id"], "weight": 60}, {"id": choices[1]["id"], "weight": 40}]}
+        await client.put(f"/api/v1/decisions/{decision['id']}", json=update, headers=auth_headers)
+
+    # Authentication, the data version bump and the UPDATE itself
+    with max_queries(3):
+        orders = {"decision_orders": [{"id": decision["id"], "order": 3}]}
+        await client.post("/api/v1/decisions/reorder", json=orders, headers=auth_headers)
+
+
+@pytest.mark.asyncio
+async def test_list_decisions_query_count_does_not_grow(client, auth_headers):
+    response = await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)
+    await client.post(f"/api/v1/decisions/{response.json()['id']}/roll", headers=auth_headers)
+    with count_queries() as one_decision:
+        await client.get("/api/v1/decisions/", headers=auth_headers)
+
+    for _ in range(4):
+        response = await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)
+        await client.post(f"/api/v1/decisions/{response.json()['id']}/roll", headers=auth_headers)
+    with count_queries() as five_decisions:
+        await client.get("/api/v1/decisions/", headers=auth_headers)
+
+    assert five_decisions.count == one_decision.count
+
+
+@pytest.mark.asyncio
+async def test_export_query_count_does_not_grow(client, auth_headers):
+    response = await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)
+    await client.post(f"/api/v1/decisions/{response.json()['id']}/roll", headers=auth_headers)
+    with count_queries() as one_decision:
+        await client.get("/api/v1/user/export", headers=auth_headers)
+
+    for _ in range(4):
+        response = await client.post("/api/v1/decisions/", json=MULTI_CHOICE, headers=auth_headers)
+        await client.post(f"/api/v1/decisions/{response.json()['id']}/roll", headers=auth_headers)
+    with count_queries() as five_decisions:
+        response = await client.get("/api/v1/user/export", headers=auth_headers)
+
+    assert five_decisions.count == one_decision.count
+    assert [len(decision["rolls"]) for decision in response.json()["decisions"]] == [1] * 5
+
+
+@pytest.mark.asyncio
+async def test_repeated_query_middleware_warns(session, caplog):
+    with override_settings(query_repeat_warning_threshold=2):
+        app = create_app()
+
+    @app.get("/n-plus-one")
+    async def n_plus_one():
+        for _ in range(3):
+            await session.exec(select(User))
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        with caplog.at_level(logging.WARNING, logger="app.querycount"):
+            await client.get("/n-plus-one")
+
+    assert "GET /n-plus-one executed the same statement 3 times" in caplog.text
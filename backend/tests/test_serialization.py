@@ -0,0 +1,113 @@
+"""Contract tests for the trusted serialization path: its output must be what the response models produce."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from pydantic import TypeAdapter
+from sqlalchemy.orm import selectinload
+from sqlmodel import col, select
+
+from app.models import Choice, Decision, MultiChoiceDecision, Roll, User
+from app.responses import TrustedJSONResponse
+from app.schemas import DecisionWithRollsResponse, ProbabilityHistoryResponse
+from generate_test_data import PASSWORD, generate
+
+decisions_adapter = TypeAdapter(list[DecisionWithRollsResponse])
+
+
+async def load_decisions(user: User, session) -> list[Decision]:
+    """The user's decisions with every relationship the response models read, loaded through the ORM."""
+    statement = (
+        select(Decision)
+        .where(Decision.user_id == user.id)
+        .options(
+            selectinload(Decision.binary_decision),
+            selectinload(Decision.multi_choice_decision)
+            .selectinload(MultiChoiceDecision.choices)
+            .selectinload(Choice.weight_history),
+            selectinload(Decision.rolls).selectinload(Roll.choice_weights),
+            selectinload(Decision.probability_history),
+        )
+        .order_by(col(Decision.display_order).asc(), col(Decision.created_at).desc())
+    )
+    result = await session.exec(statement)
+    return list(result.all())
+
+
+@pytest_asyncio.fixture
+async def seeded_user(engine, session):
+    await generate(
+        engine,
+        decisions_per_user=6,
+        rolls_per_decision=15,
+        pending_ratio=0.5,
+        now=datetime(2025, 6, 1, tzinfo=timezone.utc),
+    )
+    result = await session.exec(select(User).where(User.email == "test@example.com"))
+    return result.one()
+
+
+@pytest_asyncio.fixture
+async def seeded_headers(client, seeded_user):
+    response = await client.post("/api/v1/auth/login", data={"username": seeded_user.email, "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.mark.asyncio
+async def test_decision_list_round_trips_through_schema(client, seeded_headers):
+    response = await client.get("/api/v1/decisions/", headers=seeded_headers)
+    assert response.status_code == 200
+
+    # Missing, extra or differently formatted fields all change the re-encoded bytes
+    assert decisions_adapter.dump_json(decisions_adapter.validate_json(response.content)) == response.content
+
+
+@pytest.mark.asyncio
+async def test_decision_list_matches_orm_serialization(client, seeded_headers, seeded_user, session):
+    response = await client.get("/api/v1/decisions/", headers=seeded_headers)
+
+    decisions = await load_decisions(seeded_user, session)
+    expected = decisions_adapter.dump_python(
+        decisions_adapter.validate_python(decisions, from_attributes=True), mode="json"
+    )
+    # The roll state the API computes in SQL, derived from the rolls the way a client would
+    for decision, orm_decision in zip(expected, decisions):
+        pending = [roll for roll in decision["rolls"] if roll["followed"] is None]
+        confirmed = [roll for roll in orm_decision.rolls if roll.followed is not None]
+        last_confirmed_at = max((roll.created_at for roll in confirmed), default=None)
+        cooldown_ends_at = None
+        if decision["cooldown_hours"] and last_confirmed_at is not None:
+            cooldown_ends_at = last_confirmed_at + timedelta(hours=decision["cooldown_hours"])
+        decision["pending_roll"] = pending[0] if pending else None
+        decision["last_confirmed_at"] = last_confirmed_at and last_confirmed_at.isoformat()
+        decision["cooldown_ends_at"] = cooldown_ends_at and cooldown_ends_at.isoformat()
+    assert response.json() == expected
+
+
+@pytest.mark.asyncio
+async def test_single_decision_round_trips_through_schema(client, seeded_headers, seeded_user, session):
+    decisions = await load_decisions(seeded_user, session)
+    multi_choice = next(d for d in decisions if d.multi_choice_decision)
+
+    response = await client.get(f"/api/v1/decisions/{multi_choice.id}", headers=seeded_headers)
+    assert response.status_code == 200
+    decision = DecisionWithRollsResponse.model_validate_json(response.content)
+    assert decision.model_dump_json().encode() == response.content
+    assert decision.rolls and all(roll.choice_weights for roll in decision.rolls)
+
+
+@pytest.mark.asyncio
+async def test_single_decision_not_found(client, seeded_headers):
+    response = await client.get("/api/v1/decisions/999999", headers=seeded_headers)
+    assert response.status_code == 404
+
+
+def test_trusted_response_formats_datetimes_like_pydantic():
+    history = ProbabilityHistoryResponse(
+        id=1, decision_id=1, probability=12.5, changed_at=datetime(2025, 1, 2, 3, 4, 5, 6789, tzinfo=timezone.utc)
+    )
+    offset = history.model_copy(update={"changed_at": history.changed_at.astimezone(timezone(timedelta(hours=2)))})
+
+    for model in (history, offset):
+        assert TrustedJSONResponse(model.model_dump()).body == model.model_dump_json().encode()
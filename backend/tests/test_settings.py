@@ -0,0 +1,59 @@
+import pytest
+from pydantic import ValidationError
+
+from app.settings import get_settings, override_settings, reload_settings
+
+
+def test_settings_snapshot_is_cached():
+    assert get_settings() is get_settings()
+
+
+def test_settings_are_immutable():
+    with pytest.raises(ValidationError):
+        get_settings().jwt_algorithm = "none"
+
+
+def test_reload_settings_replaces_snapshot(monkeypatch):
+    original = get_settings()
+    monkeypatch.setenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+    try:
+        reloaded = reload_settings()
+        assert reloaded is not original
+        assert get_settings() is reloaded
+        assert reloaded.jwt_access_token_expire_minutes == 5
+    finally:
+        monkeypatch.undo()
+        reload_settings()
+
+
+def test_reload_settings_keeps_snapshot_on_invalid_values(monkeypatch):
+    original = get_settings()
+    monkeypatch.setenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "not-a-number")
+
+    assert reload_settings() is original
+
+
+def test_override_settings():
+    original = get_settings()
+    with override_settings(jwt_access_token_expire_minutes=1) as settings:
+        assert get_settings() is settings
+        assert settings.jwt_access_token_expire_minutes == 1
+    assert get_settings() is original
+
+
+@pytest.mark.asyncio
+async def test_reload_settings_endpoint(client, monkeypatch):
+    monkeypatch.setenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+    try:
+        response = await client.post("/admin/reload-settings")
+        assert response.status_code == 200
+        assert response.json() == {"changed": ["jwt_access_token_expire_minutes"]}
+        assert get_settings().jwt_access_token_expire_minutes == 5
+
+        monkeypatch.setenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "not-a-number")
+        response = await client.post("/admin/reload-settings")
+        assert response.status_code == 500
+        assert get_settings().jwt_access_token_expire_minutes == 5
+    finally:
+        monkeypatch.undo()
+        reload_settings()
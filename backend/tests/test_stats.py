@@ -1,4 +1,11 @@
+import asyncio
+
 import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.auth import create_guest_user
+from app.statistics import StatsRefresher
 
 
 @pytest.mark.asyncio
@@ -18,6 +25,8 @@ async def test_stats_endpoint(client):
         "total_rolls",
         "new_users_today",
         "active_users_today",
+        "computed_at",
+        "snapshot_age_seconds",
         "server_uptime",
     ]
 
@@ -48,3 +57,36 @@ async def test_stats_endpoint(client):
     assert data["new_users_today"] >= 0
     assert data["active_users_today"] >= 0
     assert data["server_uptime"]["seconds"] >= 0
+    assert data["snapshot_age_seconds"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_stats_are_served_from_last_snapshot(client, session, stats_refresher):
+    first = (await client.get("/api/v1/stats/")).json()
+    await create_guest_user(session)
+
+    second = (await client.get("/api/v1/stats/")).json()
+    assert second["total_users"] == first["total_users"]
+    assert second["computed_at"] == first["computed_at"]
+
+    # Another worker's refresher reuses the snapshot published through the cache
+    other = StatsRefresher(stats_refresher.cache, interval=600)
+    assert (await other.refresh(session)).computed_at == stats_refresher.snapshot.computed_at
+
+
+@pytest.mark.asyncio
+async def test_refresher_runs_until_closed(engine, session, cache):
+    refresher = StatsRefresher(cache, interval=0.01)
+    refresher.start(async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+
+    async def wait_for_users(count: int) -> None:
+        while refresher.snapshot is None or refresher.snapshot.counts["total_users"] != count:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait_for_users(0), timeout=5)
+    await create_guest_user(session)
+    await asyncio.wait_for(wait_for_users(1), timeout=5)
+
+    task = refresher._task
+    await refresher.close()
+    assert task is not None and task.cancelled()
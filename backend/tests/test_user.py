@@ -0,0 +1,18 @@
+import pytest
+
+from tests.conftest import BINARY
+
+
+@pytest.mark.asyncio
+async def test_export_orders_decisions_by_display_order_then_creation(client, auth_headers):
+    ids = []
+    for title in ["First", "Second", "Third"]:
+        response = await client.post("/api/v1/decisions/", json={**BINARY, "title": title}, headers=auth_headers)
+        ids.append(response.json()["id"])
+    orders = [{"id": ids[2], "order": 0}, {"id": ids[0], "order": 1}, {"id": ids[1], "order": 1}]
+    await client.post("/api/v1/decisions/reorder", json={"decision_orders": orders}, headers=auth_headers)
+
+    response = await client.get("/api/v1/user/export", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [decision["id"] for decision in response.json()["decisions"]] == [ids[2], ids[0], ids[1]]
@@ -101,52 +101,34 @@ export function DecisionCard({
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [decision.id]); // Only depend on decision ID, not the whole object
 
-  // Check for pending roll in existing rolls data and calculate cooldown
+  // Pick up the pending roll and cooldown the server computed for this decision
   useEffect(() => {
-    // Check if there's a pending roll in the existing rolls data
     // There should only ever be one pending roll per decision
-    if (decision.rolls && decision.rolls.length > 0) {
-      const pendingRollFromData = decision.rolls.find(
-        (r) => r.followed === null,
-      );
-      if (pendingRollFromData) {
-        setPendingRoll(pendingRollFromData);
-        
-        // Update local state to match the pending roll's captured values
-        if (decision.type === "binary" && pendingRollFromData.probability !== undefined) {
-          setLocalProbability(pendingRollFromData.probability);
-        } else if (decision.type === "multi_choice" && pendingRollFromData.choice_weights) {
-          const newWeights: Record<number, number> = {};
-          pendingRollFromData.choice_weights.forEach((cw) => {
-            newWeights[cw.choice_id] = cw.weight;
-          });
-          setLocalChoiceWeights(newWeights);
-        }
+    const pendingRollFromData = decision.pending_roll;
+    if (pendingRollFromData) {
+      setPendingRoll(pendingRollFromData);
+
+      // Update local state to match the pending roll's captured values
+      if (decision.type === "binary" && pendingRollFromData.probability !== undefined) {
+        setLocalProbability(pendingRollFromData.probability);
+      } else if (decision.type === "multi_choice" && pendingRollFromData.choice_weights) {
+        const newWeights: Record<number, number> = {};
+        pendingRollFromData.choice_weights.forEach((cw) => {
+          newWeights[cw.choice_id] = cw.weight;
+        });
+        setLocalChoiceWeights(newWeights);
       }
     }
 
-    // Calculate cooldown from last confirmed roll
-    if (
-      decision.cooldown_hours > 0 &&
-      decision.rolls &&
-      decision.rolls.length > 0
-    ) {
-      // Find the most recent confirmed roll
-      const confirmedRolls = decision.rolls.filter((r) => r.followed !== null);
-      if (confirmedRolls.length > 0) {
-        const lastRoll = confirmedRolls[confirmedRolls.length - 1];
-        const lastRollTime = new Date(lastRoll.created_at);
-        const cooldownEnd = new Date(
-          lastRollTime.getTime() + decision.cooldown_hours * 60 * 60 * 1000,
-        );
-
-        if (cooldownEnd > new Date()) {
-          setCooldownEndsAt(cooldownEnd);
-        }
+    // Cooldown ends a fixed time after the last confirmed roll; it may already be over
+    if (decision.cooldown_ends_at) {
+      const cooldownEnd = new Date(decision.cooldown_ends_at);
+      if (cooldownEnd > new Date()) {
+        setCooldownEndsAt(cooldownEnd);
       }
     }
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [decision.id, decision.cooldown_hours, decision.rolls]);
+  }, [decision.id, decision.pending_roll, decision.cooldown_ends_at]);
 
   // Dice roll animation effect
   useEffect(() => {
@@ -75,6 +75,8 @@ class ApiClient {
     const config: RequestInit = {
       ...options,
       headers,
+      // Carries the cookie that sends reads to the primary database right after a write
+      credentials: 'include',
     };
 
     try {
@@ -71,6 +71,9 @@ export interface DecisionWithDetails extends Decision {
   multi_choice_decision?: MultiChoiceDecision;
   rolls?: Roll[];
   probability_history?: ProbabilityHistory[];
+  pending_roll?: Roll | null;
+  last_confirmed_at?: string | null;
+  cooldown_ends_at?: string | null;
 }
 
 // Roll and Tracking Types